@@ -1,5 +1,5 @@
 import streamlit as st
-from services.firebase_service import FirebaseService
+from services.firebase_service import get_healthy_firebase_service
 
 # Configuración de la página
 st.set_page_config(
@@ -13,8 +13,7 @@ st.set_page_config(
 def init_firebase():
     """Inicializa la conexión con Firebase"""
     try:
-        with st.spinner("Conectando con Firebase..."):
-            return FirebaseService()
+        return get_healthy_firebase_service()
     except Exception as e:
         st.error("❌ No se pudo conectar con Firebase")
         st.error(f"Error: {str(e)}")
@@ -37,11 +36,8 @@ def init_firebase():
         """)
         st.stop()
 
-# Inicializar solo una vez
-if 'firebase' not in st.session_state:
-    st.session_state.firebase = init_firebase()
-
-firebase = st.session_state.firebase
+# Instancia compartida por todas las sesiones del proceso
+firebase = init_firebase()
 st.session_state.active_nav_page = 'home'
 
 # Página principal
@@ -59,7 +55,7 @@ st.subheader("📊 Resumen")
 col1, col2, col3 = st.columns(3)
 
 try:
-    projects = firebase.get_all_projects()
+    projects = firebase.get_all_project_summaries()
     active_projects = [p for p in projects if p.get('status') == 'Activo']
     closed_projects = [p for p in projects if p.get('status') == 'Cerrado']
     
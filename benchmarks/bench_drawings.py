@@ -0,0 +1,107 @@
+"""
+Benchmark de los dibujos de la vista gráfica.
+
+Compara, por módulo y sin caché, tres formas de obtener la imagen:
+  - pyplot: `plt.subplots` + `savefig` PNG + `plt.close` (lo que hacía la página),
+  - Agg: `Figure` propia con el backend Agg, sin pyplot (`DrawingService.render_agg`),
+  - SVG: SVG escrito directamente con las mismas funciones de dibujo (`DrawingService.render_svg`).
+Después renderiza los mismos módulos en SVG desde varios hilos y comprueba que el
+resultado es idéntico al secuencial.
+
+Uso (desde la raíz del repositorio):
+    python benchmarks/bench_drawings.py [--modules 50] [--threads 8]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+
+from services.drawing_service import DrawingService
+
+MODULE_FIGSIZE = (7, 4.8)
+
+
+def build_module(rng: random.Random, index: int) -> dict:
+    return {
+        'nombre': f'Módulo {index + 1}',
+        'alto_mm': rng.choice([720, 900, 2000, 2400]),
+        'ancho_mm': rng.choice([400, 600, 800, 1200]),
+        'profundo_mm': rng.choice([350, 560, 600]),
+        'tiene_fondo': rng.random() < 0.7,
+        'tiene_puertas': rng.random() < 0.6,
+        'cantidad_puertas': rng.randint(1, 2),
+        'cantidad_estantes': rng.randint(0, 4),
+        'cantidad_divisiones': rng.randint(0, 2),
+        'cajones': {'enabled': rng.random() < 0.4, 'cantidad_cajones': rng.randint(1, 4)},
+    }
+
+
+def render_pyplot(module: dict, index: int) -> bytes:
+    fig, ax = plt.subplots(figsize=MODULE_FIGSIZE)
+    DrawingService.draw_module(ax, module, index)
+    output = BytesIO()
+    fig.savefig(output, format='png', dpi=DrawingService.RENDER_DPI, bbox_inches='tight')
+    plt.close(fig)
+    return output.getvalue()
+
+
+def render_agg(module: dict, index: int) -> bytes:
+    return DrawingService.render_agg(MODULE_FIGSIZE, lambda ax: DrawingService.draw_module(ax, module, index))
+
+
+def render_svg(module: dict, index: int) -> bytes:
+    return DrawingService.render_svg(MODULE_FIGSIZE, lambda ax: DrawingService.draw_module(ax, module, index))
+
+
+def time_per_module(render, modules) -> float:
+    started = time.perf_counter()
+    for index, module in enumerate(modules):
+        render(module, index)
+    return (time.perf_counter() - started) / len(modules)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark de dibujos de módulos")
+    parser.add_argument('--modules', type=int, default=50)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    modules = [build_module(rng, index) for index in range(args.modules)]
+    # Calentamiento: carga de fuentes y módulos de matplotlib
+    render_pyplot(modules[0], 0)
+    render_agg(modules[0], 0)
+    render_svg(modules[0], 0)
+
+    results = [
+        ('pyplot PNG', time_per_module(render_pyplot, modules)),
+        ('Figure/Agg PNG', time_per_module(render_agg, modules)),
+        ('SVG directo', time_per_module(render_svg, modules)),
+    ]
+    baseline = results[0][1]
+    print(f"Por módulo ({args.modules} módulos, sin caché)")
+    for name, seconds in results:
+        print(f"  {name:<16} {seconds * 1000:8.2f} ms   x{baseline / seconds:6.1f}")
+
+    sequential = [render_svg(module, index) for index, module in enumerate(modules)]
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.threads) as pool:
+        threaded = list(pool.map(render_svg, modules, range(len(modules))))
+    elapsed = time.perf_counter() - started
+    print(f"\nSVG con {args.threads} hilos: {elapsed * 1000:.1f} ms, "
+          f"idéntico al secuencial: {'sí' if threaded == sequential else 'NO'}")
+
+
+if __name__ == '__main__':
+    main()
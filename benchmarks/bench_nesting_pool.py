@@ -0,0 +1,77 @@
+"""
+Benchmark del nesting en paralelo por material.
+
+Genera proyectos sintéticos con varios materiales y mide `nest_materials` en
+secuencial (`max_workers=1`) y sobre el pool de procesos compartido: la primera
+llamada incluye el arranque de los workers ('spawn') y las siguientes reutilizan
+el pool. También comprueba que ambos caminos dan el mismo despiece. La mejora
+depende de los núcleos disponibles: con una sola CPU el pool solo agrega costo.
+
+Uso (desde la raíz del repositorio):
+    python benchmarks/bench_nesting_pool.py [--materials 2 4 8] [--pieces 400] [--workers N] [--repeat 3]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.nesting_service import NestingService
+
+
+def build_case(material_count: int, pieces_per_material: int, seed: int = 7):
+    """Piezas agrupadas por material y catálogo mínimo con `material_count` materiales."""
+    rng = random.Random(seed)
+    materials = {}
+    pieces_by_material = {}
+    for index in range(material_count):
+        key = f'Melamina_Color {index}_18'
+        materials[key] = {'board_height_mm': 2750, 'board_width_mm': 1830, 'grain': index % 2 == 0}
+        grouped = []
+        remaining = pieces_per_material
+        while remaining > 0:
+            quantity = min(remaining, rng.randint(1, 6))
+            grouped.append((rng.choice([300, 450, 560, 720, 900, 2000]),
+                            rng.choice([100, 350, 400, 560, 600]),
+                            quantity, f'Pieza {len(grouped) + 1}'))
+            remaining -= quantity
+        pieces_by_material[key] = grouped
+    return pieces_by_material, materials
+
+
+def time_nesting(pieces_by_material, materials, workers: int, repeat: int):
+    best = None
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = NestingService.nest_materials(pieces_by_material, materials, max_workers=workers,
+                                               time_budget_s=None)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark del nesting en paralelo")
+    parser.add_argument('--materials', type=int, nargs='+', default=[2, 4, 8])
+    parser.add_argument('--pieces', type=int, default=400, help="piezas por material")
+    parser.add_argument('--workers', type=int, default=max(2, os.cpu_count() or 1))
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args(argv)
+
+    print(f"CPUs: {os.cpu_count()}  workers por llamada: {args.workers}  piezas por material: {args.pieces}")
+    print(f"  {'materiales':>10} {'secuencial ms':>14} {'pool 1ª ms':>11} {'pool ms':>9} {'mejora':>7} {'igual':>6}")
+    for material_count in args.materials:
+        pieces_by_material, materials = build_case(material_count, args.pieces)
+        sequential_s, sequential = time_nesting(pieces_by_material, materials, 1, args.repeat)
+        first_s, _ = time_nesting(pieces_by_material, materials, args.workers, 1)
+        pool_s, parallel = time_nesting(pieces_by_material, materials, args.workers, args.repeat)
+        print(f"  {material_count:>10} {sequential_s * 1000:>14.1f} {first_s * 1000:>11.1f} "
+              f"{pool_s * 1000:>9.1f} {sequential_s / pool_s:>6.2f}x {'sí' if sequential == parallel else 'NO':>6}")
+
+
+if __name__ == '__main__':
+    main()
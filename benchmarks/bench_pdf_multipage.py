@@ -0,0 +1,91 @@
+"""
+Benchmark de maquetación del PDF: una página reducida frente a multipágina.
+
+Genera presupuestos sintéticos con 10, 100 y 1.000 filas de detalle (mitad
+materiales, mitad herrajes) y mide `generate_pdf` en los dos formatos: el de una
+sola página (`KeepInFrame` en modo 'shrink', que vuelve a maquetar el contenido
+hasta que cabe) y el multipágina con cabeceras repetidas y sumas por página.
+También indica qué formato elige el modo automático para cada tamaño.
+
+Uso (desde la raíz del repositorio):
+    python benchmarks/bench_pdf_multipage.py [--rows 10 100 1000] [--repeat 3]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.material_catalog import MaterialCatalog
+from services.pdf_service import PDFService
+
+
+def build_case(rows: int):
+    """Proyecto, cálculos y catálogo con `rows` filas de detalle."""
+    material_rows = rows // 2
+    hardware_rows = rows - material_rows
+    materials = [
+        {'id': f'm{index}', 'type': 'Melamina', 'color': f'Color {index}', 'thickness_mm': 18,
+         'board_price': 50.0, 'board_height_mm': 2750, 'board_width_mm': 1830}
+        for index in range(material_rows)
+    ]
+    catalog = MaterialCatalog(materials)
+    material_costs = {
+        MaterialCatalog.key_for(material): {
+            'm2_con_desperdicio': 2.5 + index % 7,
+            'boards_needed': 1 + index % 3,
+            'material_cost': 50.0 * (1 + index % 3),
+        }
+        for index, material in enumerate(materials)
+    }
+    hardwares = [
+        {'type': f'Herraje {index}', 'quantity': 1 + index % 4, 'price_unit': 2.5}
+        for index in range(hardware_rows)
+    ]
+    hardware_total = sum(h['quantity'] * h['price_unit'] for h in hardwares)
+    material_total = sum(cost['material_cost'] for cost in material_costs.values())
+    calculations = {
+        'material_costs': material_costs,
+        'cutting_cost': 120.0,
+        'hardware_total': hardware_total,
+        'labor_for_invoice': 400.0,
+        'discount_for_invoice': 0.0,
+        'final_price': material_total + 120.0 + hardware_total + 400.0,
+    }
+    project = {'name': f'Proyecto {rows} filas', 'client': 'Cliente', 'status': 'Activo',
+               'modules': [], 'hardwares': hardwares}
+    return project, calculations, catalog
+
+
+def time_pdf(project, calculations, catalog, multipage, repeat: int):
+    best = None
+    size = 0
+    for _ in range(repeat):
+        started = time.perf_counter()
+        size = len(PDFService.generate_pdf(project, calculations, catalog, multipage=multipage).getvalue())
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, size
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark de maquetación del PDF")
+    parser.add_argument('--rows', type=int, nargs='+', default=[10, 100, 1000])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args(argv)
+
+    print(f"Umbral multipágina: {PDFService.MULTIPAGE_ROW_THRESHOLD} filas de detalle")
+    print(f"  {'filas':>6} {'1 página ms':>12} {'multipágina ms':>15} {'KB 1 pág.':>10} {'KB multi':>9} {'automático':>12}")
+    for rows in args.rows:
+        project, calculations, catalog = build_case(rows)
+        shrink_s, shrink_size = time_pdf(project, calculations, catalog, False, args.repeat)
+        multi_s, multi_size = time_pdf(project, calculations, catalog, True, args.repeat)
+        auto = 'multipágina' if rows > PDFService.MULTIPAGE_ROW_THRESHOLD else '1 página'
+        print(f"  {rows:>6} {shrink_s * 1000:>12.1f} {multi_s * 1000:>15.1f} "
+              f"{shrink_size / 1024:>10.1f} {multi_size / 1024:>9.1f} {auto:>12}")
+
+
+if __name__ == '__main__':
+    main()
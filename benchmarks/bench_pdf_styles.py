@@ -0,0 +1,135 @@
+"""
+Benchmark del registro de estilos de PDFService.
+
+Compara, por PDF, la construcción de estilos como se hacía antes (hoja de
+ejemplo, ParagraphStyle y TableStyle nuevos en cada llamada) con el registro
+construido al importar, y mide `generate_pdf` completo (con el registro) para
+1, 100 y 1.000 documentos. Todas las cifras son tiempos medidos.
+
+Uso (desde la raíz del repositorio):
+    python benchmarks/bench_pdf_styles.py [--sizes 1 100 1000]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from reportlab.lib import colors
+from reportlab.lib.enums import TA_LEFT, TA_RIGHT
+from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+from reportlab.platypus import TableStyle
+
+from models.material_catalog import MaterialCatalog
+from services.calculation_service import CalculationService
+from services.pdf_service import PARAGRAPH_STYLES, TABLE_STYLES, PDFService
+
+MATERIALS = [
+    {'id': 'mdf', 'type': 'MDF', 'color': 'Blanco', 'thickness_mm': 18, 'waste_factor': 0.1,
+     'board_price': 45.0, 'board_height_mm': 2440, 'board_width_mm': 1220},
+    {'id': 'mel', 'type': 'Melamina', 'color': 'Roble', 'thickness_mm': 18, 'waste_factor': 0.1,
+     'board_price': 60.0, 'board_height_mm': 2750, 'board_width_mm': 1830},
+    {'id': 'fondo', 'type': 'HDF', 'color': 'Blanco', 'thickness_mm': 3, 'waste_factor': 0.05,
+     'board_price': 15.0, 'board_height_mm': 2440, 'board_width_mm': 1220},
+]
+CUTTING_SERVICE = {'price_per_m2': 3.5, 'waste_factor': 0.1, 'price_per_m_canto': 0.8}
+
+
+def build_project(rng: random.Random, index: int) -> dict:
+    keys = [MaterialCatalog.key_for(mat) for mat in MATERIALS]
+    modules = []
+    for module_index in range(rng.randint(2, 8)):
+        modules.append({
+            'nombre': f'Módulo {module_index + 1}',
+            'alto_mm': rng.choice([720, 900, 2000]),
+            'ancho_mm': rng.choice([400, 600, 800]),
+            'profundo_mm': rng.choice([350, 560]),
+            'material': rng.choice(keys[:2]),
+            'material_fondo': keys[2],
+            'tiene_fondo': True,
+            'tiene_puertas': rng.random() < 0.6,
+            'cantidad_puertas': rng.randint(1, 2),
+            'cantidad_estantes': rng.randint(0, 3),
+            'cantidad_modulos': rng.randint(1, 3),
+            'herrajes': [{'type': 'Bisagra', 'quantity': 2, 'price_unit': 1.8}],
+        })
+    return {
+        'name': f'Proyecto {index}',
+        'client': f'Cliente {index % 17}',
+        'status': 'Activo',
+        'modules': modules,
+        'hardwares': [{'type': 'Tirador', 'quantity': rng.randint(0, 6), 'price_unit': 3.2}],
+        'labor_cost_project': 300.0,
+        'extra_complexity': 0.0,
+    }
+
+
+def legacy_style_setup(table_count: int = 4):
+    """Estilos que `generate_pdf` construía en cada llamada antes del registro."""
+    styles = getSampleStyleSheet()
+    normal = ParagraphStyle('CustomNormal', parent=styles['Normal'], fontSize=9, leading=12,
+                            textColor=colors.HexColor('#2C3E50'))
+    ParagraphStyle('CustomTitle', parent=styles['Heading1'], fontSize=20, leading=22,
+                   textColor=colors.HexColor('#12263A'), alignment=TA_LEFT, spaceAfter=3)
+    ParagraphStyle('CustomSubtitle', parent=styles['Normal'], fontSize=9,
+                   textColor=colors.HexColor('#4E5D6C'), alignment=TA_LEFT, spaceAfter=12)
+    ParagraphStyle('SectionTitle', parent=styles['Heading2'], fontSize=11, leading=13,
+                   textColor=colors.HexColor('#1F3A5F'), alignment=TA_LEFT, spaceBefore=8, spaceAfter=6)
+    ParagraphStyle('HR', parent=normal, alignment=TA_RIGHT)
+    for table_style in TABLE_STYLES.values():
+        TableStyle(table_style.getCommands())
+    for _ in range(table_count):
+        TableStyle(TABLE_STYLES['data_alt'].getCommands())
+        TableStyle(TABLE_STYLES['amounts'].getCommands())
+
+
+def registry_style_setup():
+    """Lo que hace ahora cada PDF: leer los estilos del registro."""
+    for name in ('title', 'subtitle', 'section', 'normal', 'header_right'):
+        PARAGRAPH_STYLES[name]
+    for name in ('header', 'client', 'amounts', 'summary', 'data_alt'):
+        TABLE_STYLES[name]
+
+
+def time_per_call(fn, repeat: int) -> float:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - started) / repeat
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark de estilos de PDF")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1, 100, 1000])
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    catalog = MaterialCatalog(MATERIALS)
+    samples = []
+    for index in range(50):
+        project = build_project(rng, index)
+        samples.append((project, CalculationService.calculate_all_project_costs(project, catalog, CUTTING_SERVICE)))
+
+    legacy_s = time_per_call(legacy_style_setup, 500)
+    registry_s = time_per_call(registry_style_setup, 500)
+    print("Estilos por PDF")
+    print(f"  antes (construidos en cada llamada): {legacy_s * 1000:8.3f} ms")
+    print(f"  ahora (registro de módulo):          {registry_s * 1000:8.3f} ms")
+
+    print("\nPDF completo (generate_pdf, con el registro)")
+    print(f"  {'PDFs':>6} {'ms/PDF':>10} {'total s':>10}")
+    for size in args.sizes:
+        started = time.perf_counter()
+        for index in range(size):
+            project, calculations = samples[index % len(samples)]
+            PDFService.generate_pdf(project, calculations, catalog)
+        elapsed = time.perf_counter() - started
+        print(f"  {size:>6} {elapsed / size * 1000:>10.2f} {elapsed:>10.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+"""
+Exporta la lista de corte (CSV) y el despiece por tabla (JSON) de un proyecto.
+
+Uso:
+    python export_cut_list.py PROJECT_ID --csv corte.csv [--json despiece.json]
+                              [--workers N] [--credentials firebase-credentials.json]
+
+'-' escribe en la salida estándar. Los archivos se escriben por fragmentos, sin
+armarlos completos en memoria.
+"""
+
+import argparse
+import sys
+
+import firebase_admin
+from firebase_admin import credentials
+
+from services.cut_list_service import CutListService
+from services.firebase_service import FirebaseService
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Exporta la lista de corte y el despiece de un proyecto")
+    parser.add_argument('project_id', help="ID del proyecto en Firestore")
+    parser.add_argument('--csv', help="Archivo CSV de la lista de corte ('-' para la salida estándar)")
+    parser.add_argument('--json', help="Archivo JSON del despiece por tabla ('-' para la salida estándar)")
+    parser.add_argument('--credentials', default='firebase-credentials.json',
+                        help="Archivo de credenciales de Firebase (cuenta de servicio)")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="Procesos para el despiece (por defecto, uno por CPU)")
+    args = parser.parse_args(argv)
+    if not args.csv and not args.json:
+        parser.error("indicar --csv y/o --json")
+    if args.csv == '-' and args.json == '-':
+        parser.error("solo uno de los archivos puede ir a la salida estándar")
+    return args
+
+
+def write_output(path: str, write) -> int:
+    if path == '-':
+        return write(sys.stdout.buffer)
+    with open(path, 'wb') as f:
+        return write(f)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    log = sys.stderr if '-' in (args.csv, args.json) else sys.stdout
+
+    if not firebase_admin._apps:
+        firebase_admin.initialize_app(credentials.Certificate(args.credentials))
+    firebase_service = FirebaseService(cache_ttl_seconds=0, live_sync=False)
+
+    project = firebase_service.get_project(args.project_id)
+    if not project:
+        print(f"Proyecto no encontrado: {args.project_id}", file=sys.stderr)
+        return 1
+
+    if args.csv:
+        written = write_output(args.csv, lambda stream: CutListService.write_csv(project, stream))
+        print(f"Lista de corte: {CutListService.count_pieces(project)} piezas, {written / 1000:.1f} kB", file=log)
+    if args.json:
+        written = write_output(args.json, lambda stream: CutListService.write_layout_json(
+            project,
+            firebase_service.get_material_catalog(),
+            firebase_service.get_cutting_service() or {},
+            stream,
+            nesting_workers=args.workers,
+        ))
+        print(f"Despiece por tabla: {written / 1000:.1f} kB", file=log)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
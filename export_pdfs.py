@@ -0,0 +1,75 @@
+"""
+Exporta en lote los presupuestos en PDF de los proyectos filtrados.
+
+Uso:
+    python export_pdfs.py --output presupuestos/          # un PDF por proyecto
+    python export_pdfs.py --zip presupuestos.zip          # un ZIP ('-' = salida estándar)
+                          [--status Activo] [--client NOMBRE] [--chunk-size 100]
+                          [--workers N] [--credentials firebase-credentials.json]
+"""
+
+import argparse
+import sys
+
+import firebase_admin
+from firebase_admin import credentials
+
+from services.bulk_export_service import BulkExportService
+from services.firebase_service import FirebaseService
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Exporta presupuestos en PDF en lote")
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument('--output', help="Directorio donde escribir los PDFs")
+    target.add_argument('--zip', help="Archivo ZIP de salida ('-' para la salida estándar)")
+    parser.add_argument('--credentials', default='firebase-credentials.json',
+                        help="Archivo de credenciales de Firebase (cuenta de servicio)")
+    parser.add_argument('--status', default='Activo',
+                        help="Estado de los proyectos a exportar (vacío = todos)")
+    parser.add_argument('--client', default=None, help="Solo proyectos de este cliente")
+    parser.add_argument('--chunk-size', type=int, default=BulkExportService.DEFAULT_CHUNK_SIZE,
+                        help="Proyectos leídos por bloque")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="Procesos de renderizado (por defecto, uno por CPU)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    # Con el ZIP por la salida estándar los mensajes van a stderr
+    log = sys.stderr if args.zip == '-' else sys.stdout
+
+    if not firebase_admin._apps:
+        firebase_admin.initialize_app(credentials.Certificate(args.credentials))
+    firebase_service = FirebaseService(cache_ttl_seconds=0, live_sync=False)
+
+    def report_progress(summary):
+        done = summary['pdfs'] + len(summary['errors'])
+        if done % 50 == 0:
+            print(f"  {done} proyectos", file=log, flush=True)
+
+    pdfs = BulkExportService.pdfs_for_firebase(
+        firebase_service,
+        status=args.status or None,
+        client=args.client,
+        chunk_size=args.chunk_size,
+        max_workers=args.workers,
+    )
+    if args.output:
+        summary = BulkExportService.export_to_directory(pdfs, args.output, report_progress)
+    elif args.zip == '-':
+        summary = BulkExportService.export_to_zip(pdfs, sys.stdout.buffer, report_progress)
+    else:
+        with open(args.zip, 'wb') as f:
+            summary = BulkExportService.export_to_zip(pdfs, f, report_progress)
+
+    print(f"\nPDFs generados: {summary['pdfs']} ({summary['bytes'] / 1_000_000:.1f} MB) "
+          f"en {summary['elapsed_s']:.1f} s · {summary['pdfs_per_s']:.1f} PDF/s", file=log)
+    for error in summary['errors']:
+        print(f"  ❌ {error['file']}: {error['error']}", file=log)
+    return 1 if summary['errors'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,96 @@
+import hashlib
+from collections.abc import Mapping
+from typing import Dict, Iterator, List, Optional, Union
+
+
+class MaterialCatalog(Mapping):
+    """
+    Catálogo de materiales indexado por clave ('tipo_color_espesor') e ID.
+
+    Se construye una vez por versión del catálogo (ver `FirebaseService.get_material_catalog`)
+    y se pasa a los servicios de cálculo y PDF en lugar de la lista de materiales.
+    Se comporta como un dict de solo lectura {clave: material}, así que sirve donde
+    antes se armaba `materials_dict`. Los materiales no deben modificarse: la misma
+    instancia se comparte entre sesiones.
+    """
+
+    def __init__(self, materials: List[Dict], version: Optional[int] = None):
+        self.materials = list(materials)
+        self._version = version
+        self._by_key: Dict[str, Dict] = {}
+        self._by_id: Dict[str, Dict] = {}
+        self._board_m2: Dict[str, float] = {}
+        self._labels: Dict[str, str] = {}
+        for material in self.materials:
+            key = self.key_for(material)
+            self._by_key[key] = material
+            if material.get('id') is not None:
+                self._by_id[material['id']] = material
+            self._board_m2[key] = (material.get('board_height_mm', 0) / 1000) * (material.get('board_width_mm', 0) / 1000)
+            self._labels[key] = f"{material['type']} {material.get('color', '')} {material.get('thickness_mm', '')}mm".strip()
+
+    @staticmethod
+    def key_for(material: Dict) -> str:
+        """Clave del material en módulos, estantes y maderas."""
+        return f"{material['type']}_{material.get('color', '')}_{material.get('thickness_mm', 0)}"
+
+    @staticmethod
+    def version_of(materials: List[Dict]) -> int:
+        """Huella blake2b del repr de la lista (para catálogos armados sin versión; recorre toda la lista)."""
+        digest = hashlib.blake2b(repr(materials).encode('utf-8'), digest_size=8).digest()
+        return int.from_bytes(digest, 'big')
+
+    @staticmethod
+    def coerce(materials: Union['MaterialCatalog', List[Dict], Dict[str, Dict]]) -> 'MaterialCatalog':
+        """Devuelve el catálogo tal cual o lo construye a partir de la lista (o dict por clave) de materiales."""
+        if isinstance(materials, MaterialCatalog):
+            return materials
+        if isinstance(materials, Mapping):
+            return MaterialCatalog(list(materials.values()))
+        return MaterialCatalog(materials or [])
+
+    @property
+    def version(self) -> int:
+        """Versión del catálogo (se calcula al pedirla si no se indicó al construirlo)."""
+        if self._version is None:
+            self._version = self.version_of(self.materials)
+        return self._version
+
+    # ---------- Mapping {clave: material} ----------
+
+    def __getitem__(self, key: str) -> Dict:
+        return self._by_key[key]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._by_key)
+
+    def __len__(self) -> int:
+        return len(self._by_key)
+
+    def __contains__(self, key) -> bool:
+        return key in self._by_key
+
+    def get(self, key: str, default=None):
+        return self._by_key.get(key, default)
+
+    # ---------- Consultas ----------
+
+    def by_id(self, material_id: str) -> Optional[Dict]:
+        return self._by_id.get(material_id)
+
+    def board_m2(self, key: str) -> float:
+        """Superficie de una tabla del material (0 si no está en el catálogo)."""
+        return self._board_m2.get(key, 0.0)
+
+    def label(self, key: str) -> str:
+        """Nombre para mostrar ('MDF Blanco 18mm'); la clave si no está en el catálogo."""
+        return self._labels.get(key, key)
+
+    @property
+    def labels(self) -> Dict[str, str]:
+        return dict(self._labels)
+
+    @property
+    def options(self) -> List[str]:
+        """Claves en el orden del catálogo, para los selectores de material."""
+        return list(self._by_key)
@@ -1,34 +1,42 @@
 import copy
-import json
 
 import streamlit as st
 import streamlit.components.v1 as components
-from services.firebase_service import FirebaseService
+from services.firebase_service import get_healthy_firebase_service
+from services.bulk_export_service import BulkExportService
 from services.calculation_service import CalculationService
+from services.cut_list_service import CutListService
+from services.drawing_service import DrawingService
+from services.incremental_calculation_service import IncrementalCostCalculator
 from services.pdf_service import PDFService
+from services.project_diff_service import ProjectChangeTracker, ProjectDiffService
 from datetime import datetime
-import matplotlib.pyplot as plt
-import matplotlib.patches as patches
-from matplotlib.patches import Polygon
 
 # Inicializar Firebase
 def get_firebase():
-    """Obtiene la instancia de Firebase"""
-    if 'firebase' not in st.session_state:
-        try:
-            with st.spinner("Conectando con Firebase..."):
-                st.session_state.firebase = FirebaseService()
-        except Exception as e:
-            st.error("❌ Error conectando con Firebase")
-            st.error(str(e))
-            st.stop()
-    return st.session_state.firebase
+    """Obtiene la instancia compartida de Firebase"""
+    try:
+        return get_healthy_firebase_service()
+    except Exception as e:
+        st.error("❌ Error conectando con Firebase")
+        st.error(str(e))
+        st.stop()
 
 firebase = get_firebase()
 
 
 
 HARDWARE_CATEGORY_OPTIONS = ["Bisagra", "Corredera", "Item general"]
+PROJECTS_PAGE_SIZE = 20
+PROJECT_EDITOR_TABS = ["📦 Módulos", "📏 Estantes", "🪵 Maderas", "🔩 Herrajes", "💰 Costos", "📈 Resultado", "📊 Vista Gráfica", "📄 PDF"]
+# Sección del proyecto (ver ProjectChangeTracker) que modifican los widgets de cada pestaña
+PROJECT_EDITOR_TAB_SECTIONS = {
+    "📦 Módulos": 'modules',
+    "📏 Estantes": 'shelves',
+    "🪵 Maderas": 'woods',
+    "🔩 Herrajes": 'hardwares',
+    "💰 Costos": 'basics',
+}
 
 
 def normalize_hardware_category(hardware):
@@ -73,17 +81,12 @@ def get_default_drawer_config(base_material=''):
     }
 
 
-def build_material_summary_rows(calculations, materials_db_list):
-    """Construye filas para resumir m2, tablas y valor por madera."""
-    materials_by_key = {
-        f"{mat['type']}_{mat.get('color', '')}_{mat.get('thickness_mm', 0)}": mat
-        for mat in materials_db_list
-    }
-
+def build_material_summary_rows(calculations, material_catalog):
+    """Construye filas para resumir m2, tablas y valor por madera (en el orden de `material_totals`)."""
     rows = []
     for material_key, m2_total in calculations.get('material_totals', {}).items():
         cost_data = calculations.get('material_costs', {}).get(material_key, {})
-        material_info = materials_by_key.get(material_key, {})
+        material_info = material_catalog.get(material_key, {})
 
         rows.append({
             'Madera': material_info.get('type', material_key),
@@ -91,12 +94,26 @@ def build_material_summary_rows(calculations, materials_db_list):
             'Espesor (mm)': material_info.get('thickness_mm', '-'),
             'm² utilizados': round(m2_total, 3),
             'Tablas equivalentes': cost_data.get('boards_needed', 0),
+            'Canto (m)': round(calculations.get('edge_banding_m', {}).get(material_key, 0.0), 2),
             'Valor (€)': round(cost_data.get('material_cost', 0.0), 2)
         })
 
     return rows
 
 
+def build_nesting_rows(layout):
+    """Resume el despiece de un material: una fila por tabla."""
+    return [
+        {
+            'Tabla': board['index'],
+            'Piezas': len(board['placements']),
+            'm² usados': round(board['used_m2'], 3),
+            'Aprovechamiento (%)': round(board['utilization'] * 100, 1)
+        }
+        for board in layout.get('boards', [])
+    ]
+
+
 def build_material_origin_details(project, material_key):
     """Construye detalle de origen por madera para mostrar en acordeón."""
     rows = []
@@ -218,245 +235,112 @@ def get_all_employees_safe(firebase_service):
         rows.append(data)
     return rows
 
-def save_project_data(firebase_service, project_id, project_name, project_client, project_date, project_status, project_data):
-    """Guarda los datos actuales del proyecto"""
-    payload = {
-        'name': project_name,
-        'client': project_client,
-        'date': datetime.combine(project_date, datetime.min.time()),
-        'status': project_status,
+def build_project_payload(project_data):
+    """Campos del proyecto que se guardan en Firestore"""
+    return {
+        'name': project_data.get('name', ''),
+        'client': project_data.get('client', ''),
+        'date': project_data.get('date'),
+        'status': project_data.get('status', 'Activo'),
         'modules': project_data.get('modules', []),
         'shelves': project_data.get('shelves', []),
         'woods': project_data.get('woods', []),
         'hardwares': project_data.get('hardwares', []),
         'labor_cost_project': project_data.get('labor_cost_project', 0.0),
         'extra_complexity': project_data.get('extra_complexity', 0.0),
-        'final_price': project_data.get('final_price', 0.0)
+        'final_price': project_data.get('final_price', 0.0),
+        'total_calculated': project_data.get('total_calculated', 0.0),
+        # Modo de tablas con el que se calculó `total_calculated` (PDF, recálculo y exportación lo respetan)
+        'use_nesting': bool(project_data.get('use_nesting', False))
     }
 
-    if project_id:
-        firebase_service.update_project(project_id, payload)
-        return project_id, "✅ Proyecto actualizado correctamente"
 
-    new_id = firebase_service.create_project(payload)
-    return new_id, "✅ Proyecto creado correctamente"
+def remember_saved_payload(project_id, payload):
+    """Guarda una copia del último estado persistido para calcular diferencias."""
+    st.session_state.saved_project_payload = copy.deepcopy(payload)
+    st.session_state.saved_project_payload_id = project_id
 
 
-def _normalize_project_for_compare(project_data):
-    """Normaliza datos para comparar cambios sin falsos positivos."""
-    normalized = copy.deepcopy(project_data)
-    date_value = normalized.get('date')
-    if hasattr(date_value, 'date'):
-        normalized['date'] = date_value.date().isoformat()
-    elif date_value is not None:
-        normalized['date'] = str(date_value)
-    return normalized
+def get_cost_calculator(project_id, material_catalog, cutting_service, use_nesting=False):
+    """Calculadora incremental del proyecto abierto; se reconstruye si cambia el proyecto, el catálogo o el modo de tablas."""
+    calculator = st.session_state.get('project_cost_calculator')
+    if (
+        calculator is None
+        or st.session_state.get('project_cost_calculator_id') != project_id
+        or calculator.use_nesting != use_nesting
+        or not calculator.matches_catalog(material_catalog, cutting_service)
+    ):
+        calculator = IncrementalCostCalculator(material_catalog, cutting_service, use_nesting=use_nesting)
+        st.session_state.project_cost_calculator = calculator
+        st.session_state.project_cost_calculator_id = project_id
+    return calculator
 
 
-def serialize_project_state(project_data):
-    """Serializa el proyecto para comparar cambios pendientes de guardado."""
-    normalized = _normalize_project_for_compare(project_data)
-    return json.dumps(normalized, sort_keys=True, default=str)
+def request_section(name):
+    """Marca una sección costosa del editor como pedida para el proyecto abierto."""
+    st.session_state[f'{name}_section_project'] = (st.session_state.current_project_id,)
 
 
-def enable_unsaved_changes_guard(enabled):
-    """Controla la alerta nativa solo para cierres reales de pestaña.
+def section_requested(name):
+    """True si la sección se pidió para el proyecto abierto (se vuelve a pedir al cambiar de proyecto)."""
+    return st.session_state.get(f'{name}_section_project') == (st.session_state.current_project_id,)
 
-    En Streamlit, `onbeforeunload` se dispara también al hacer clic en botones
-    (porque la app se recarga), por eso se desactiva para evitar falsos positivos.
-    """
-    components.html("<script>window.onbeforeunload = null;</script>", height=0)
-
-
-def draw_dimension_labels(ax, x, y, width, height, depth, dx, dy):
-    """Imprime medidas sobre el lado correspondiente del módulo."""
-    dim_style = dict(fontsize=8, color='#1B263B', fontweight='bold')
-
-    # Ancho en el frente inferior (más separado del dibujo)
-    ax.annotate('', xy=(x, y - 68), xytext=(x + width, y - 68),
-                arrowprops=dict(arrowstyle='<->', color='#1B263B', lw=1))
-    ax.text(x + width / 2, y - 82, f"A {int(width)} mm", ha='center', va='top', **dim_style)
-
-    # Alto en lateral izquierdo (más separado)
-    ax.annotate('', xy=(x - 68, y), xytext=(x - 68, y + height),
-                arrowprops=dict(arrowstyle='<->', color='#1B263B', lw=1))
-    ax.text(x - 84, y + height / 2, f"H {int(height)} mm", ha='right', va='center', rotation=90, **dim_style)
-
-    # Profundidad desplazada fuera de la arista para no ensuciar
-    ax.annotate('', xy=(x + width + 14, y + height + 14), xytext=(x + width + dx + 22, y + height + dy + 22),
-                arrowprops=dict(arrowstyle='<->', color='#1B263B', lw=1))
-    ax.text(x + width + (dx / 2) + 30, y + height + (dy / 2) + 28, f"P {int(depth)} mm",
-            ha='left', va='bottom', rotation=25, **dim_style)
-
-
-def prepare_grouped_items(items, default_name):
-    """Prepara piezas agrupadas por item: cantidad apilada, items distintos en columnas."""
-    grouped = []
-    for idx, item in enumerate(items):
-        grouped.append({
-            'nombre': item.get('nombre') or f"{default_name} {idx + 1}",
-            'ancho_mm': item.get('ancho_mm', 0),
-            'profundo_mm': item.get('profundo_mm', 0),
-            'cantidad': max(1, int(item.get('cantidad', 1)))
-        })
-    return grouped
 
+def sync_project_totals(firebase_service, project_data):
+    """Actualiza los totales del borrador; la sección Costos puede no haberse ejecutado desde el último cambio."""
+    try:
+        calculator = get_cost_calculator(
+            st.session_state.current_project_id,
+            firebase_service.get_material_catalog(),
+            firebase_service.get_cutting_service(),
+            project_data.get('use_nesting', False)
+        )
+        calculations = calculator.sync(project_data)
+    except Exception:
+        # Se guardan los totales de la última vez que se calcularon
+        return
+    project_data['materiales_total'] = sum(c['material_cost'] for c in calculations['material_costs'].values())
+    project_data['total_calculated'] = calculations['total_calculated']
+    project_data['corte_canto_total'] = calculations['cutting_cost']
+    project_data['herrajes_total'] = calculations['hardware_total']
 
-def draw_isometric_box(ax, x, y, width, height, depth, face_color='#ADD8E6', side_color='#8FB8D8', top_color='#C6E2F5'):
-    """Dibuja una caja en vista isométrica"""
-    dx = depth * 0.45
-    dy = depth * 0.3
 
-    front = Polygon(
-        [(x, y), (x + width, y), (x + width, y + height), (x, y + height)],
-        closed=True,
-        facecolor=face_color,
-        edgecolor='black',
-        linewidth=1.5,
-        alpha=0.8
-    )
-    side = Polygon(
-        [
-            (x + width, y),
-            (x + width + dx, y + dy),
-            (x + width + dx, y + height + dy),
-            (x + width, y + height),
-        ],
-        closed=True,
-        facecolor=side_color,
-        edgecolor='black',
-        linewidth=1.2,
-        alpha=0.8
-    )
-    top = Polygon(
-        [
-            (x, y + height),
-            (x + width, y + height),
-            (x + width + dx, y + height + dy),
-            (x + dx, y + height + dy),
-        ],
-        closed=True,
-        facecolor=top_color,
-        edgecolor='black',
-        linewidth=1.2,
-        alpha=0.8
-    )
+def save_project_data(firebase_service, project_id, project_name, project_client, project_date, project_status, project_data):
+    """Guarda los datos actuales del proyecto (solo los campos modificados si ya existe)"""
+    # Cualquier guardado (general o de una pestaña) refresca `total_calculated` y los subtotales
+    sync_project_totals(firebase_service, project_data)
+    payload = build_project_payload(project_data)
+    payload.update({
+        'name': project_name,
+        'client': project_client,
+        'date': datetime.combine(project_date, datetime.min.time()),
+        'status': project_status,
+    })
 
-    ax.add_patch(front)
-    ax.add_patch(side)
-    ax.add_patch(top)
-
-    return dx, dy
-
-
-def format_dimensions(ancho_mm, alto_mm=None, profundo_mm=None):
-    """Formatea dimensiones de forma consistente para todas las vistas."""
-    if alto_mm is not None and profundo_mm is not None:
-        return f"A {int(ancho_mm)} × H {int(alto_mm)} × P {int(profundo_mm)} mm"
-    if alto_mm is not None:
-        return f"A {int(ancho_mm)} × H {int(alto_mm)} mm"
-    if profundo_mm is not None:
-        return f"A {int(ancho_mm)} × P {int(profundo_mm)} mm"
-    return f"A {int(ancho_mm)} mm"
-
-
-def draw_module_structure(ax, x, y, width, height, depth, has_back=False, door_count=0):
-    """Dibuja un módulo como estructura de 4 maderas, con fondo/puertas opcionales."""
-    dx = depth * 0.35
-    dy = depth * 0.22
-    board_thickness = max(25, min(width, height) * 0.04)
-
-    board_color = '#C49A6C'
-    edge_color = '#5D4037'
-
-    # Estructura frontal (4 maderas)
-    ax.add_patch(patches.Rectangle((x, y), board_thickness, height, facecolor=board_color, edgecolor=edge_color, linewidth=1.2))
-    ax.add_patch(patches.Rectangle((x + width - board_thickness, y), board_thickness, height, facecolor=board_color, edgecolor=edge_color, linewidth=1.2))
-    ax.add_patch(patches.Rectangle((x, y + height - board_thickness), width, board_thickness, facecolor=board_color, edgecolor=edge_color, linewidth=1.2))
-    ax.add_patch(patches.Rectangle((x, y), width, board_thickness, facecolor=board_color, edgecolor=edge_color, linewidth=1.2))
-
-    # Aristas de profundidad para dar forma de cubo
-    ax.plot([x, x + dx], [y + height, y + height + dy], color=edge_color, linewidth=1)
-    ax.plot([x + width, x + width + dx], [y + height, y + height + dy], color=edge_color, linewidth=1)
-    ax.plot([x + width, x + width + dx], [y, y + dy], color=edge_color, linewidth=1)
-
-    ax.plot([x + dx, x + width + dx], [y + height + dy, y + height + dy], color=edge_color, linewidth=1)
-    ax.plot([x + width + dx, x + width + dx], [y + dy, y + height + dy], color=edge_color, linewidth=1)
-    ax.plot([x + width, x + width + dx], [y, y + dy], color=edge_color, linewidth=1)
-
-    # Fondo (cara trasera tapada)
-    if has_back:
-        back = Polygon(
-            [
-                (x + dx, y + dy),
-                (x + width + dx, y + dy),
-                (x + width + dx, y + height + dy),
-                (x + dx, y + height + dy),
-            ],
-            closed=True,
-            facecolor='#E8D3B0',
-            edgecolor=edge_color,
-            linewidth=1,
-            alpha=0.55
-        )
-        ax.add_patch(back)
-
-    # Puertas (cara frontal tapada)
-    if door_count > 0:
-        if door_count >= 2:
-            mid_x = x + width / 2
-            ax.add_patch(patches.Rectangle((x, y), width / 2, height, facecolor='#DCEEFF', edgecolor='#3E6480', linewidth=1, alpha=0.45))
-            ax.add_patch(patches.Rectangle((mid_x, y), width / 2, height, facecolor='#DCEEFF', edgecolor='#3E6480', linewidth=1, alpha=0.45))
-            ax.plot([mid_x, mid_x], [y, y + height], color='#3E6480', linewidth=1.5)
+    if project_id:
+        saved_payload = st.session_state.get('saved_project_payload')
+        if saved_payload is not None and st.session_state.get('saved_project_payload_id') == project_id:
+            updates = ProjectDiffService.compute_update(saved_payload, payload)
         else:
-            ax.add_patch(patches.Rectangle((x, y), width, height, facecolor='#DCEEFF', edgecolor='#3E6480', linewidth=1.2, alpha=0.45))
+            updates = payload
+        if updates:
+            firebase_service.update_project(project_id, updates)
+        remember_saved_payload(project_id, payload)
+        return project_id, "✅ Proyecto actualizado correctamente"
 
-    return dx, dy
+    new_id = firebase_service.create_project(payload)
+    remember_saved_payload(new_id, payload)
+    return new_id, "✅ Proyecto creado correctamente"
 
 
-def draw_module_drawers(ax, x, y, width, height, drawer_qty):
-    """Dibuja cajones en el frente del módulo cuando corresponda."""
-    if drawer_qty <= 0:
-        return
+def enable_unsaved_changes_guard(enabled):
+    """Controla la alerta nativa solo para cierres reales de pestaña.
 
-    qty = max(1, int(drawer_qty))
-    usable_height = height * 0.86
-    start_y = y + (height - usable_height) / 2
-    drawer_height = usable_height / qty
-    side_margin = max(16, width * 0.06)
-    front_width = max(40, width - (2 * side_margin))
-
-    for index in range(qty):
-        drawer_y = start_y + (index * drawer_height) + (drawer_height * 0.08)
-        front_height = drawer_height * 0.76
-
-        ax.add_patch(
-            patches.Rectangle(
-                (x + side_margin, drawer_y),
-                front_width,
-                front_height,
-                facecolor='#F8E7D2',
-                edgecolor='#7A4E2F',
-                linewidth=1.2,
-                alpha=0.9
-            )
-        )
+    En Streamlit, `onbeforeunload` se dispara también al hacer clic en botones
+    (porque la app se recarga), por eso se desactiva para evitar falsos positivos.
+    """
+    components.html("<script>window.onbeforeunload = null;</script>", height=0)
 
-        handle_w = min(80, front_width * 0.24)
-        handle_h = max(4, front_height * 0.08)
-        handle_x = x + side_margin + (front_width - handle_w) / 2
-        handle_y = drawer_y + (front_height - handle_h) / 2
-        ax.add_patch(
-            patches.Rectangle(
-                (handle_x, handle_y),
-                handle_w,
-                handle_h,
-                facecolor='#4B5563',
-                edgecolor='#374151',
-                linewidth=0.8,
-                alpha=0.95
-            )
-        )
 
 st.title("📁 Gestión de Proyectos")
 
@@ -479,7 +363,7 @@ if st.session_state.project_mode == 'list':
     col1, col2, col3 = st.columns([2, 2, 1])
     
     with col1:
-        search_name = st.text_input("🔍 Buscar por nombre", "")
+        search_name = st.text_input("🔍 Buscar por nombre (empieza por)", "")
     
     with col2:
         filter_status = st.selectbox("Estado", ["Todos", "Activo", "Cerrado"], index=1)
@@ -500,22 +384,28 @@ if st.session_state.project_mode == 'list':
             st.session_state.edit_project = None
             st.session_state.edit_project_cache_id = None
             st.rerun()
+
+    # Paginación: se guarda el cursor de inicio de cada página visitada
+    list_filters = (search_name.strip(), filter_status)
+    if st.session_state.get('projects_list_filters') != list_filters:
+        st.session_state.projects_list_filters = list_filters
+        st.session_state.projects_page_cursors = [None]
+    page_cursors = st.session_state.projects_page_cursors
     
-    # Obtener proyectos
+    # Obtener proyectos (filtrados y paginados en Firestore)
     try:
-        projects = firebase.get_all_projects()
-        
-        # Aplicar filtros
-        filtered_projects = projects
-        
-        if search_name:
-            filtered_projects = [p for p in filtered_projects if search_name.lower() in p.get('name', '').lower()]
-        
-        if filter_status != "Todos":
-            filtered_projects = [p for p in filtered_projects if p.get('status') == filter_status]
+        page = firebase.list_projects(
+            status=None if filter_status == "Todos" else filter_status,
+            name_prefix=search_name,
+            limit=PROJECTS_PAGE_SIZE,
+            cursor=page_cursors[-1],
+        )
+        filtered_projects = page['items']
         
         # Mostrar proyectos
-        st.markdown(f"### Proyectos encontrados: {len(filtered_projects)}")
+        st.markdown(f"### Proyectos (página {len(page_cursors)})")
+        if page.get('index_fallback'):
+            st.caption("⚠️ Falta un índice de Firestore (ver `firestore.indexes.json`): la lista se filtra leyendo todos los proyectos.")
         
         if not filtered_projects:
             st.info("No se encontraron proyectos con los filtros aplicados")
@@ -552,10 +442,70 @@ if st.session_state.project_mode == 'list':
                             st.rerun()
                     
                     st.divider()
+
+        col_prev, col_next = st.columns(2)
+        with col_prev:
+            if len(page_cursors) > 1 and st.button("← Anterior", use_container_width=True):
+                page_cursors.pop()
+                st.rerun()
+        with col_next:
+            if page['next_cursor'] is not None and st.button("Siguiente →", use_container_width=True):
+                page_cursors.append(page['next_cursor'])
+                st.rerun()
     
     except Exception as e:
         st.error(f"Error cargando proyectos: {str(e)}")
 
+    # Exportación en lote (p. ej. presupuestos de fin de mes)
+    with st.expander("📦 Exportar presupuestos en PDF"):
+        export_status = None if filter_status == "Todos" else filter_status
+        st.caption(
+            f"Genera un ZIP con el PDF de cada proyecto "
+            f"({'estado ' + filter_status if export_status else 'todos los estados'})."
+        )
+        if st.button("Generar ZIP de presupuestos", key='bulk_pdf_export', use_container_width=True):
+            export_progress = st.empty()
+
+            def show_export_progress(summary):
+                done = summary['pdfs'] + len(summary['errors'])
+                if done % 10 == 0:
+                    export_progress.caption(f"{done} proyecto(s) procesados…")
+
+            try:
+                with st.spinner("Generando presupuestos..."):
+                    zip_file, export_summary = BulkExportService.spool_zip(
+                        BulkExportService.pdfs_for_firebase(firebase, status=export_status),
+                        show_export_progress
+                    )
+                # st.download_button no acepta el archivo temporal: se guardan los bytes del ZIP
+                with zip_file:
+                    zip_bytes = zip_file.read()
+                st.session_state.bulk_pdf_export = {
+                    'data': zip_bytes,
+                    'summary': export_summary,
+                    'status': filter_status,
+                }
+                export_progress.empty()
+            except Exception as e:
+                st.error(f"Error exportando presupuestos: {str(e)}")
+
+        bulk_export = st.session_state.get('bulk_pdf_export')
+        if bulk_export and bulk_export['status'] == filter_status:
+            export_summary = bulk_export['summary']
+            st.caption(
+                f"{export_summary['pdfs']} PDF(s) en {export_summary['elapsed_s']:.1f} s "
+                f"({export_summary['pdfs_per_s']:.1f} PDF/s)"
+            )
+            for error in export_summary['errors']:
+                st.warning(f"{error['file']}: {error['error']}")
+            st.download_button(
+                label="📥 Descargar ZIP",
+                data=bulk_export['data'],
+                file_name=f"Presupuestos_{datetime.now().strftime('%Y%m%d')}.zip",
+                mime="application/zip",
+                use_container_width=True,
+            )
+
 # ========== VISTA EDICIÓN ==========
 elif st.session_state.project_mode == 'edit':
     
@@ -590,12 +540,20 @@ elif st.session_state.project_mode == 'edit':
                 'final_price': 0.0
             }
 
+        # Proyectos guardados antes del interruptor de tablas: estimación por m²
+        loaded_project.setdefault('use_nesting', False)
         st.session_state.edit_project = loaded_project
         st.session_state.edit_project_cache_id = cache_id
-        st.session_state.saved_project_snapshot = serialize_project_state(copy.deepcopy(loaded_project))
+        remember_saved_payload(current_id, build_project_payload(loaded_project))
+        st.session_state.project_change_tracker = ProjectChangeTracker(loaded_project)
+        # La lista de corte y el interruptor de tablas eran del proyecto anterior
+        st.session_state.pop('cut_list_files', None)
+        st.session_state.pop('costs_use_nesting', None)
 
     project = st.session_state.edit_project
-    saved_snapshot = st.session_state.get('saved_project_snapshot', serialize_project_state(copy.deepcopy(project)))
+    if 'project_change_tracker' not in st.session_state:
+        st.session_state.project_change_tracker = ProjectChangeTracker(project)
+    change_tracker = st.session_state.project_change_tracker
     
     # Información básica
     st.subheader("Información del Proyecto")
@@ -616,8 +574,8 @@ elif st.session_state.project_mode == 'edit':
     project['date'] = datetime.combine(project_date, datetime.min.time())
     project['status'] = project_status
 
-    current_snapshot = serialize_project_state(copy.deepcopy(project))
-    has_unsaved_changes = current_snapshot != saved_snapshot
+    # Los datos básicos se acaban de escribir; las secciones se revisan al final de su pestaña
+    has_unsaved_changes = change_tracker.refresh(project, ['basics'])
     enable_unsaved_changes_guard(has_unsaved_changes)
 
     if has_unsaved_changes:
@@ -666,7 +624,7 @@ elif st.session_state.project_mode == 'edit':
                 st.session_state.current_project_id = current_id
                 st.session_state.last_opened_project_id = current_id
                 st.session_state.edit_project_cache_id = current_id
-                st.session_state.saved_project_snapshot = serialize_project_state(copy.deepcopy(project))
+                change_tracker.reset(project)
                 st.success(success_msg)
                 if "creado" in success_msg:
                     st.rerun()
@@ -701,27 +659,28 @@ elif st.session_state.project_mode == 'edit':
     
     st.markdown("---")
     
-    # Tabs para las secciones
-    tabs = st.tabs(["📦 Módulos", "📏 Estantes", "🪵 Maderas", "🔩 Herrajes", "💰 Costos", "📈 Resultado", "📊 Vista Gráfica", "📄 PDF"])
+    # Obtener materiales (los usan módulos, estantes y maderas)
+    try:
+        material_catalog = firebase.get_material_catalog()
+        material_options = material_catalog.options
+        material_labels = material_catalog.labels
+    except:
+        material_options = []
+        material_labels = {}
+
+    # Secciones: solo se ejecuta la activa (st.tabs ejecutaría todas en cada rerun)
+    active_tab = st.radio(
+        "Sección",
+        PROJECT_EDITOR_TABS,
+        horizontal=True,
+        key='project_editor_tab',
+        label_visibility='collapsed',
+    )
     
     # TAB: MÓDULOS
-    with tabs[0]:
+    if active_tab == "📦 Módulos":
         st.subheader("Módulos")
         
-        # Obtener materiales
-        try:
-            materials_list = firebase.get_all_materials()
-            materials_dict = {f"{m['type']}_{m.get('color', '')}_{m.get('thickness_mm', 0)}": m for m in materials_list}
-            material_options = list(materials_dict.keys())
-            material_labels = {
-                key: f"{m['type']} {m.get('color', '')} {m.get('thickness_mm', '')}mm".strip()
-                for key, m in materials_dict.items()
-            }
-        except:
-            material_options = []
-            materials_dict = {}
-            material_labels = {}
-        
         if st.button("➕ Agregar Módulo"):
             if 'modules' not in project:
                 project['modules'] = []
@@ -1001,13 +960,13 @@ elif st.session_state.project_mode == 'edit':
                 st.session_state.current_project_id = current_id
                 st.session_state.last_opened_project_id = current_id
                 st.session_state.edit_project_cache_id = current_id
-                st.session_state.saved_project_snapshot = serialize_project_state(copy.deepcopy(project))
+                change_tracker.reset(project)
                 st.success(success_msg)
             except Exception as e:
                 st.error(f"Error guardando cambios de módulos: {str(e)}")
     
     # TAB: ESTANTES
-    with tabs[1]:
+    if active_tab == "📏 Estantes":
         st.subheader("Estantes Independientes")
         
         if st.button("➕ Agregar Estante"):
@@ -1074,13 +1033,13 @@ elif st.session_state.project_mode == 'edit':
                 st.session_state.current_project_id = current_id
                 st.session_state.last_opened_project_id = current_id
                 st.session_state.edit_project_cache_id = current_id
-                st.session_state.saved_project_snapshot = serialize_project_state(copy.deepcopy(project))
+                change_tracker.reset(project)
                 st.success(success_msg)
             except Exception as e:
                 st.error(f"Error guardando cambios de estantes: {str(e)}")
     
     # TAB: MADERAS
-    with tabs[2]:
+    if active_tab == "🪵 Maderas":
         st.subheader("Maderas Independientes")
         
         if st.button("➕ Agregar Madera"):
@@ -1147,13 +1106,13 @@ elif st.session_state.project_mode == 'edit':
                 st.session_state.current_project_id = current_id
                 st.session_state.last_opened_project_id = current_id
                 st.session_state.edit_project_cache_id = current_id
-                st.session_state.saved_project_snapshot = serialize_project_state(copy.deepcopy(project))
+                change_tracker.reset(project)
                 st.success(success_msg)
             except Exception as e:
                 st.error(f"Error guardando cambios de maderas: {str(e)}")
     
     # TAB: HERRAJES
-    with tabs[3]:
+    if active_tab == "🔩 Herrajes":
         st.subheader("Herrajes")
         st.caption("Aquí puedes agregar bisagras, correderas o items generales.")
         
@@ -1252,13 +1211,13 @@ elif st.session_state.project_mode == 'edit':
                 st.session_state.current_project_id = current_id
                 st.session_state.last_opened_project_id = current_id
                 st.session_state.edit_project_cache_id = current_id
-                st.session_state.saved_project_snapshot = serialize_project_state(copy.deepcopy(project))
+                change_tracker.reset(project)
                 st.success(success_msg)
             except Exception as e:
                 st.error(f"Error guardando cambios de herrajes: {str(e)}")
     
     # TAB: COSTOS
-    with tabs[4]:
+    if active_tab == "💰 Costos":
         st.subheader("💰 Costos Adicionales")
         
         col1, col2 = st.columns(2)
@@ -1281,14 +1240,24 @@ elif st.session_state.project_mode == 'edit':
         
         # Calcular totales
         try:
-            materials_db_list = firebase.get_all_materials()
+            material_catalog = firebase.get_material_catalog()
             cutting_service = firebase.get_cutting_service()
             
-            calculations = CalculationService.calculate_all_project_costs(
-                project,
-                materials_db_list,
-                cutting_service
+            use_nesting = st.toggle(
+                "Calcular tablas con despiece real",
+                value=project.get('use_nesting', False),
+                key='costs_use_nesting',
+                help="Ubica cada pieza en las tablas (con kerf y veta) en lugar de estimar por m²"
             )
+            cost_calculator = get_cost_calculator(
+                st.session_state.current_project_id,
+                material_catalog,
+                cutting_service,
+                use_nesting
+            )
+            # El widget se descarta al cambiar de sección; la preferencia se guarda con el proyecto
+            project['use_nesting'] = use_nesting
+            calculations = cost_calculator.sync(project)
             
             st.subheader("📊 Resumen de Costos")
             
@@ -1300,6 +1269,11 @@ elif st.session_state.project_mode == 'edit':
             
             with col2:
                 st.metric("Corte y canto", f"{calculations['cutting_cost']:.2f} €")
+                edge_banding_total_m = sum(calculations.get('edge_banding_m', {}).values())
+                if edge_banding_total_m > 0:
+                    st.caption(
+                        f"Canto: {edge_banding_total_m:.1f} m · {calculations.get('edge_banding_cost', 0.0):.2f} €"
+                    )
 
             subtotal_materials_cost = material_total + calculations['cutting_cost']
             with col3:
@@ -1312,10 +1286,9 @@ elif st.session_state.project_mode == 'edit':
             st.markdown("---")
             st.subheader("🧾 Resumen de Materiales")
 
-            material_summary_rows = build_material_summary_rows(calculations, materials_db_list)
+            material_summary_rows = build_material_summary_rows(calculations, material_catalog)
             if material_summary_rows:
-                for row in material_summary_rows:
-                    material_key = f"{row['Madera']}_{row['Color']}_{row['Espesor (mm)']}"
+                for material_key, row in zip(calculations['material_totals'], material_summary_rows):
                     with st.expander(f"{row['Madera']} | {row['m² utilizados']} m² | {row['Valor (€)']:.2f} €"):
                         st.dataframe([row], use_container_width=True, hide_index=True)
                         details = build_material_origin_details(project, material_key)
@@ -1323,6 +1296,15 @@ elif st.session_state.project_mode == 'edit':
                             st.dataframe(details, use_container_width=True, hide_index=True)
                         else:
                             st.caption("Sin detalle de origen para esta madera.")
+                        layout = calculations.get('nesting', {}).get(material_key)
+                        if layout:
+                            st.caption(
+                                f"Despiece: {layout['boards_needed']} tabla(s), "
+                                f"aprovechamiento {layout['utilization'] * 100:.1f}%"
+                            )
+                            if layout['unplaced']:
+                                st.warning(f"⚠️ {len(layout['unplaced'])} pieza(s) no entran en la tabla de este material.")
+                            st.dataframe(build_nesting_rows(layout), use_container_width=True, hide_index=True)
             else:
                 st.info("No hay maderas asociadas al proyecto para resumir.")
 
@@ -1348,12 +1330,9 @@ elif st.session_state.project_mode == 'edit':
                     help="Precio editable que se mostrará al cliente"
                 )
 
-            calculations_live = CalculationService.calculate_all_project_costs(
-                project,
-                materials_db_list,
-                cutting_service
-            )
+            calculations_live = cost_calculator.with_final_price(project['final_price'])
             project['materiales_total'] = material_total
+            project['total_calculated'] = calculations['total_calculated']
             project['corte_canto_total'] = calculations['cutting_cost']
             project['herrajes_total'] = calculations['hardware_total']
             st.info(f"💼 Mano de obra en PDF: {calculations_live['labor_for_invoice']:.2f} € | 🏷️ Descuento: {calculations_live.get('discount_for_invoice', 0.0):.2f} €")
@@ -1362,292 +1341,241 @@ elif st.session_state.project_mode == 'edit':
             st.error(f"Error calculando costos: {str(e)}")
     
     # TAB: RESULTADO
-    with tabs[5]:
+    if active_tab == "📈 Resultado":
         st.subheader("📈 Resultado del Proyecto")
-        try:
-            movements = get_economy_movements_safe(firebase)
-            kpis = CalculationService.calculate_project_result_kpis(project, movements)
-
-            c1, c2, c3, c4 = st.columns(4)
-            c1.metric("Monto Presupuestado", f"{kpis['monto_presupuestado']:.2f} €")
-            c2.metric("Gastos Reales", f"{kpis['gastos_reales']:.2f} €")
-            c3.metric("Ganancia Real", f"{kpis['ganancia_real']:.2f} €")
+        # Movimientos y empleados se leen solo al pedirlo
+        if st.button("📈 Cargar resultado", key='load_project_result', use_container_width=True):
+            request_section('result')
+        if not section_requested('result'):
+            st.caption("Lee los movimientos de economía y los empleados para calcular el resultado real.")
+        else:
+            try:
+                movements = get_economy_movements_safe(firebase)
+                kpis = CalculationService.calculate_project_result_kpis(project, movements)
 
-            pct = kpis['porcentaje_real_presupuesto']
-            if pct > 100:
-                c4.markdown(f"<div style='padding:1rem;border-radius:10px;background:#ffe5e5;color:#b00020;text-align:center'><b>% Real del Presupuesto</b><br><span style='font-size:1.6rem'>{pct:.1f}%</span></div>", unsafe_allow_html=True)
-            else:
-                c4.markdown(f"<div style='padding:1rem;border-radius:10px;background:#e7f7ed;color:#146c2e;text-align:center'><b>% Real del Presupuesto</b><br><span style='font-size:1.6rem'>{pct:.1f}%</span></div>", unsafe_allow_html=True)
+                c1, c2, c3, c4 = st.columns(4)
+                c1.metric("Monto Presupuestado", f"{kpis['monto_presupuestado']:.2f} €")
+                c2.metric("Gastos Reales", f"{kpis['gastos_reales']:.2f} €")
+                c3.metric("Ganancia Real", f"{kpis['ganancia_real']:.2f} €")
 
-            st.caption("Fórmula: (Gastos reales / (Materiales + Corte y canto + Herrajes y extras)) * 100")
+                pct = kpis['porcentaje_real_presupuesto']
+                if pct > 100:
+                    c4.markdown(f"<div style='padding:1rem;border-radius:10px;background:#ffe5e5;color:#b00020;text-align:center'><b>% Real del Presupuesto</b><br><span style='font-size:1.6rem'>{pct:.1f}%</span></div>", unsafe_allow_html=True)
+                else:
+                    c4.markdown(f"<div style='padding:1rem;border-radius:10px;background:#e7f7ed;color:#146c2e;text-align:center'><b>% Real del Presupuesto</b><br><span style='font-size:1.6rem'>{pct:.1f}%</span></div>", unsafe_allow_html=True)
 
-            st.markdown("---")
-            st.markdown("### 👷 Participación de empleados")
+                st.caption("Fórmula: (Gastos reales / (Materiales + Corte y canto + Herrajes y extras)) * 100")
 
-            all_employees = sorted(
-                [emp for emp in get_all_employees_safe(firebase) if (emp.get('nombre') or '').strip()],
-                key=lambda x: (x.get('nombre') or '').lower()
-            )
-            existing_participation = project.get('employee_participation', [])
-            existing_by_name = {
-                (row.get('employee_name') or '').strip(): float(row.get('percentage', 0.0) or 0.0)
-                for row in existing_participation
-                if row.get('employee_name')
-            }
+                st.markdown("---")
+                st.markdown("### 👷 Participación de empleados")
 
-            with st.popover("✏️ Configurar participación", use_container_width=False):
-                st.caption("Asigna porcentaje de participación para cada empleado.")
-                participation_rows = []
-                cols = st.columns(2)
-                for idx, emp in enumerate(all_employees):
-                    employee_name = (emp.get('nombre') or '').strip()
-                    default_pct = existing_by_name.get(employee_name, 0.0)
-                    with cols[idx % 2]:
-                        pct_value = st.number_input(
-                            f"{employee_name} (%)",
-                            min_value=0.0,
-                            max_value=100.0,
-                            value=float(default_pct),
-                            step=5.0,
-                            key=f"employee_pct_{project.get('id', 'new')}_{idx}"
-                        )
-                    participation_rows.append({'employee_name': employee_name, 'percentage': pct_value})
-
-                if st.button("💾 Guardar participación", type="primary", key=f"save_participation_{project.get('id', 'new')}"):
-                    payload_rows = [
-                        {'employee_name': row['employee_name'], 'percentage': float(row['percentage'])}
-                        for row in participation_rows
-                        if float(row.get('percentage', 0.0) or 0.0) > 0
-                    ]
-                    project['employee_participation'] = payload_rows
-                    if project.get('id'):
-                        firebase.update_project(project['id'], {'employee_participation': payload_rows})
-                    st.success("Participación actualizada")
-                    st.rerun()
+                all_employees = sorted(
+                    [emp for emp in get_all_employees_safe(firebase) if (emp.get('nombre') or '').strip()],
+                    key=lambda x: (x.get('nombre') or '').lower()
+                )
+                existing_participation = project.get('employee_participation', [])
+                existing_by_name = {
+                    (row.get('employee_name') or '').strip(): float(row.get('percentage', 0.0) or 0.0)
+                    for row in existing_participation
+                    if row.get('employee_name')
+                }
+
+                with st.popover("✏️ Configurar participación", use_container_width=False):
+                    st.caption("Asigna porcentaje de participación para cada empleado.")
+                    participation_rows = []
+                    cols = st.columns(2)
+                    for idx, emp in enumerate(all_employees):
+                        employee_name = (emp.get('nombre') or '').strip()
+                        default_pct = existing_by_name.get(employee_name, 0.0)
+                        with cols[idx % 2]:
+                            pct_value = st.number_input(
+                                f"{employee_name} (%)",
+                                min_value=0.0,
+                                max_value=100.0,
+                                value=float(default_pct),
+                                step=5.0,
+                                key=f"employee_pct_{project.get('id', 'new')}_{idx}"
+                            )
+                        participation_rows.append({'employee_name': employee_name, 'percentage': pct_value})
+
+                    if st.button("💾 Guardar participación", type="primary", key=f"save_participation_{project.get('id', 'new')}"):
+                        payload_rows = [
+                            {'employee_name': row['employee_name'], 'percentage': float(row['percentage'])}
+                            for row in participation_rows
+                            if float(row.get('percentage', 0.0) or 0.0) > 0
+                        ]
+                        project['employee_participation'] = payload_rows
+                        if project.get('id'):
+                            firebase.update_project(project['id'], {'employee_participation': payload_rows})
+                        st.success("Participación actualizada")
+                        st.rerun()
 
-            participation_saved = project.get('employee_participation', [])
-            if participation_saved:
-                project_name_normalized = (project.get('name') or '').strip().lower()
-                rows = []
-                for row in participation_saved:
-                    employee_name = (row.get('employee_name') or '').strip()
-                    pct_participation = float(row.get('percentage', 0.0) or 0.0)
-                    gastos_employee = 0.0
-                    for mov in movements:
-                        mov_project = (mov.get('project_name') or '').strip().lower()
-                        if mov_project != project_name_normalized:
-                            continue
-                        if mov.get('tipo') != 'Egreso':
-                            continue
-                        if (mov.get('origen_categoria') or '').strip().lower() != 'empleado':
-                            continue
-                        if (mov.get('origen_nombre') or '').strip().lower() != employee_name.lower():
-                            continue
-                        gastos_employee += float(mov.get('monto', 0.0) or 0.0)
-
-                    ganancia_total = kpis['ganancia_real'] * (pct_participation / 100.0)
-                    ganancia_final = ganancia_total - gastos_employee
-                    rows.append({
-                        'Empleado': employee_name,
-                        '% Participación': round(pct_participation, 2),
-                        'Gastos': round(gastos_employee, 2),
-                        'Ganancia total': round(ganancia_total, 2),
-                        'Ganancia final': round(ganancia_final, 2),
-                    })
-
-                st.dataframe(rows, use_container_width=True, hide_index=True)
-            else:
-                st.info("No hay participación asignada todavía.")
+                participation_saved = project.get('employee_participation', [])
+                if participation_saved:
+                    project_name_normalized = (project.get('name') or '').strip().lower()
+                    rows = []
+                    for row in participation_saved:
+                        employee_name = (row.get('employee_name') or '').strip()
+                        pct_participation = float(row.get('percentage', 0.0) or 0.0)
+                        gastos_employee = 0.0
+                        for mov in movements:
+                            mov_project = (mov.get('project_name') or '').strip().lower()
+                            if mov_project != project_name_normalized:
+                                continue
+                            if mov.get('tipo') != 'Egreso':
+                                continue
+                            if (mov.get('origen_categoria') or '').strip().lower() != 'empleado':
+                                continue
+                            if (mov.get('origen_nombre') or '').strip().lower() != employee_name.lower():
+                                continue
+                            gastos_employee += float(mov.get('monto', 0.0) or 0.0)
+
+                        ganancia_total = kpis['ganancia_real'] * (pct_participation / 100.0)
+                        ganancia_final = ganancia_total - gastos_employee
+                        rows.append({
+                            'Empleado': employee_name,
+                            '% Participación': round(pct_participation, 2),
+                            'Gastos': round(gastos_employee, 2),
+                            'Ganancia total': round(ganancia_total, 2),
+                            'Ganancia final': round(ganancia_final, 2),
+                        })
+
+                    st.dataframe(rows, use_container_width=True, hide_index=True)
+                else:
+                    st.info("No hay participación asignada todavía.")
 
-        except Exception as e:
-            st.error(f"No fue posible calcular resultado: {str(e)}")
+            except Exception as e:
+                st.error(f"No fue posible calcular resultado: {str(e)}")
 
     # TAB: VISTA GRÁFICA
-    with tabs[6]:
+    if active_tab == "📊 Vista Gráfica":
         st.subheader("📊 Vista Gráfica")
 
-        # Dibujar cada módulo por separado
-        if project.get('modules'):
-            st.markdown("### Módulos")
-
-            for idx, module in enumerate(project['modules']):
-                alto = module.get('alto_mm', 2000)
-                ancho = module.get('ancho_mm', 1000)
-                profundo = module.get('profundo_mm', 400)
-                fig, ax = plt.subplots(figsize=(7, 4.8))
-
-                puertas = module.get('cantidad_puertas', 0) if module.get('tiene_puertas') else 0
-                dx, dy = draw_module_structure(
-                    ax,
-                    0,
-                    0,
-                    ancho,
-                    alto,
-                    profundo,
-                    has_back=module.get('tiene_fondo', False),
-                    door_count=puertas
-                )
-                draw_dimension_labels(ax, 0, 0, ancho, alto, profundo, dx, dy)
-
-                estantes = module.get('cantidad_estantes', 0)
-                if estantes > 0:
-                    spacing = alto / (estantes + 1)
-                    for i in range(1, estantes + 1):
-                        y_pos = i * spacing
-                        ax.plot([25, ancho - 25], [y_pos, y_pos], linestyle='--', color='#C62828', linewidth=1)
-
-                divisiones = module.get('cantidad_divisiones', 0)
-                if divisiones > 0:
-                    spacing = ancho / (divisiones + 1)
-                    for i in range(1, divisiones + 1):
-                        x_pos = i * spacing
-                        ax.plot([x_pos, x_pos], [25, alto - 25], linestyle='--', color='#2E7D32', linewidth=1)
-
-                drawer_config = module.get('cajones', {})
-                drawer_qty = int(drawer_config.get('cantidad_cajones', 0)) if drawer_config.get('enabled', False) else 0
-                if drawer_qty > 0:
-                    draw_module_drawers(ax, 0, 0, ancho, alto, drawer_qty)
-
-                label = module.get('nombre', f'Módulo {idx + 1}')
-                ax.text(ancho / 2, alto + (profundo * 0.35) + 45, label, ha='center', va='bottom', fontsize=11, fontweight='bold', color='#0B132B')
-
-                ax.set_xlim(-140, ancho + (profundo * 0.35) + 140)
-                ax.set_ylim(-140, alto + (profundo * 0.35) + 120)
-                ax.set_aspect('equal')
-                ax.axis('off')
-
-                st.pyplot(fig)
-                plt.close()
-
-        # Dibujar estantes: cantidades del mismo item apiladas, items distintos en columnas
-        if project.get('shelves'):
-            st.markdown("### Estantes Independientes")
-
-            shelves_grouped = prepare_grouped_items(project['shelves'], 'Estante')
-            max_prof = max([piece['profundo_mm'] for piece in shelves_grouped]) if shelves_grouped else 300
-            max_qty = max([piece['cantidad'] for piece in shelves_grouped]) if shelves_grouped else 1
-            fig, ax = plt.subplots(figsize=(max(8, min(16, len(shelves_grouped) * 2.4)), max(4.8, 3.8 + max_qty * 0.5)))
-
-            x_cursor = 0
-            shelf_height = 45
-            stack_gap = 68
-
-            for piece in shelves_grouped:
-                ancho = piece.get('ancho_mm', 800)
-                profundo = piece.get('profundo_mm', 300)
-                nombre = piece.get('nombre', 'Estante')
-                qty = piece.get('cantidad', 1)
-                dx = profundo * 0.45
-
-                for level in range(qty):
-                    y_pos = level * stack_gap
-                    draw_isometric_box(
-                        ax,
-                        x_cursor,
-                        y_pos,
-                        ancho,
-                        shelf_height,
-                        profundo,
-                        face_color='wheat',
-                        side_color='#D2B48C',
-                        top_color='#F5DEB3'
-                    )
+        if st.button("🖼️ Renderizar vista", key='render_project_view', use_container_width=True):
+            request_section('graphics')
+        if not section_requested('graphics'):
+            st.caption("Dibuja los módulos, estantes y maderas del proyecto.")
+        else:
+            # SVG vectorial; cada figura sale de la caché de imágenes si su geometría no cambió
+            elevation_svg = DrawingService.render_project_elevation(project, 'svg')
+            if elevation_svg is None:
+                st.info("El proyecto no tiene módulos, estantes ni maderas para dibujar.")
+            else:
+                st.markdown("### Alzado del proyecto")
+                st.image(elevation_svg.decode('utf-8'))
 
-                top_y = (qty - 1) * stack_gap + shelf_height + (profundo * 0.30)
-                ax.text(x_cursor + ancho / 2, top_y + 30, nombre, ha='center', va='bottom', fontsize=8.5, fontweight='bold')
-                suffix = f" (x{qty})" if qty > 1 else ''
-                ax.text(x_cursor + ancho / 2, -34, f"{format_dimensions(ancho, profundo_mm=profundo)}{suffix}", ha='center', va='top', fontsize=7.5)
-                x_cursor += ancho + dx + max(120, ancho * 0.14)
-
-            ax.set_xlim(-40, x_cursor)
-            ax.set_ylim(-72, (max_qty - 1) * stack_gap + shelf_height + (max_prof * 0.42) + 95)
-            ax.set_aspect('equal')
-            ax.axis('off')
-
-            st.pyplot(fig)
-            plt.close()
-
-        # Dibujar maderas: cantidades del mismo item apiladas, items distintos en columnas
-        if project.get('woods'):
-            st.markdown("### Maderas Independientes")
-
-            woods_grouped = prepare_grouped_items(project['woods'], 'Madera')
-            max_qty = max([piece['cantidad'] for piece in woods_grouped]) if woods_grouped else 1
-            fig, ax = plt.subplots(figsize=(max(8, min(16, len(woods_grouped) * 2.2)), max(4.0, 3.0 + max_qty * 0.45)))
-
-            x_cursor = 0
-            stack_gap = 58
-
-            for piece in woods_grouped:
-                ancho = piece.get('ancho_mm', 500)
-                alto = piece.get('profundo_mm', 200)
-                nombre = piece.get('nombre', 'Madera')
-                qty = piece.get('cantidad', 1)
-
-                for level in range(qty):
-                    y_pos = level * stack_gap
-                    rect = patches.Rectangle(
-                        (x_cursor, y_pos),
-                        ancho,
-                        alto,
-                        linewidth=1.2,
-                        edgecolor='saddlebrown',
-                        facecolor='burlywood',
-                        alpha=0.75
-                    )
-                    ax.add_patch(rect)
+            show_pieces = st.toggle("Ver cada pieza por separado", key='graphics_show_pieces')
+            if show_pieces and project.get('modules'):
+                st.markdown("### Módulos")
 
-                top_y = (qty - 1) * stack_gap + alto
-                ax.text(x_cursor + ancho / 2, top_y + 22, nombre, ha='center', va='bottom', fontsize=8.5, fontweight='bold')
-                suffix = f" (x{qty})" if qty > 1 else ''
-                ax.text(x_cursor + ancho / 2, -24, f"{format_dimensions(ancho, alto_mm=alto)}{suffix}", ha='center', va='top', fontsize=7.5)
-                x_cursor += ancho + max(120, ancho * 0.16)
+                for idx, module in enumerate(project['modules']):
+                    st.image(DrawingService.render_module(module, idx, 'svg').decode('utf-8'))
 
-            ax.set_xlim(-40, x_cursor)
-            max_alto = max([piece.get('profundo_mm', 200) for piece in woods_grouped]) if woods_grouped else 200
-            ax.set_ylim(-55, (max_qty - 1) * stack_gap + max_alto + 70)
-            ax.set_aspect('equal')
-            ax.axis('off')
+            if show_pieces and project.get('shelves'):
+                st.markdown("### Estantes Independientes")
+                st.image(DrawingService.render_shelves(project['shelves'], 'svg').decode('utf-8'))
 
-            st.pyplot(fig)
-            plt.close()
+            if show_pieces and project.get('woods'):
+                st.markdown("### Maderas Independientes")
+                st.image(DrawingService.render_woods(project['woods'], 'svg').decode('utf-8'))
 
     # TAB: PDF
-    with tabs[7]:
+    if active_tab == "📄 PDF":
         st.subheader("📄 Generar PDF")
         
         try:
-            materials_db_list = firebase.get_all_materials()
+            material_catalog = firebase.get_material_catalog()
             cutting_service = firebase.get_cutting_service()
 
-            materials_dict_for_pdf = {
-                f"{m['type']}_{m.get('color', '')}_{m.get('thickness_mm', 0)}": m
-                for m in materials_db_list
-            }
-
-            calculations = CalculationService.calculate_all_project_costs(
-                project,
-                materials_db_list,
-                cutting_service
+            # Mismo cálculo (y modo de tablas) que la pestaña Costos
+            calculations = get_cost_calculator(
+                st.session_state.current_project_id,
+                material_catalog,
+                cutting_service,
+                project.get('use_nesting', False)
+            ).sync(project)
+
+            pdf_logo = firebase.get_pdf_logo()
+            include_elevation = st.checkbox(
+                "Incluir alzado del proyecto",
+                key='pdf_include_elevation',
+                help="Agrega al presupuesto un dibujo con todos los módulos, estantes y maderas"
             )
 
-            logo_base64 = firebase.get_logo_base64()
-
-            pdf_buffer = PDFService.generate_pdf(
-                project,
-                calculations,
-                materials_dict_for_pdf,
-                logo_base64
+            # El PDF se genera al pedirlo y se reutiliza mientras no cambie su contenido
+            pdf_cache_key = PDFService.pdf_cache_key(
+                project, calculations, material_catalog, logo_image=pdf_logo, include_elevation=include_elevation
             )
+            pdf_bytes = PDFService.get_cached_pdf(pdf_cache_key)
+            if pdf_bytes is None and st.button("📄 Preparar PDF", key='prepare_pdf', type="primary", use_container_width=True):
+                with st.spinner("Generando PDF..."):
+                    pdf_bytes = PDFService.generate_pdf_cached(
+                        project,
+                        calculations,
+                        material_catalog,
+                        cache_key=pdf_cache_key,
+                        logo_image=pdf_logo,
+                        include_elevation=include_elevation
+                    )
 
-            file_name = f"Presupuesto_{project_name.replace(' ', '_')}_{datetime.now().strftime('%Y%m%d')}.pdf"
-            st.download_button(
-                label="📥 Descargar PDF",
-                data=pdf_buffer.getvalue(),
-                file_name=file_name,
-                mime="application/pdf",
-                type="primary",
-                use_container_width=True,
-            )
+            if pdf_bytes is not None:
+                file_name = f"Presupuesto_{project_name.replace(' ', '_')}_{datetime.now().strftime('%Y%m%d')}.pdf"
+                st.download_button(
+                    label="📥 Descargar PDF",
+                    data=pdf_bytes,
+                    file_name=file_name,
+                    mime="application/pdf",
+                    type="primary",
+                    use_container_width=True,
+                )
+            else:
+                st.caption("El PDF se vuelve a generar solo si cambió el presupuesto.")
         except Exception as e:
             st.error(f"Error generando PDF: {str(e)}")
+
+        st.markdown("---")
+        st.subheader("✂️ Lista de corte")
+        st.caption(f"{CutListService.count_pieces(project)} pieza(s) individuales")
+
+        if st.button("Preparar lista de corte", key='prepare_cut_list', use_container_width=True):
+            # Los archivos se generan una vez por clic; las recargas solo reusan los bytes
+            try:
+                with st.spinner("Generando lista de corte..."):
+                    st.session_state.cut_list_files = {
+                        'file_stem': f"{project_name.replace(' ', '_')}_{datetime.now().strftime('%Y%m%d')}",
+                        'csv': CutListService.csv_download_bytes(project),
+                        'json': CutListService.layout_json_download_bytes(
+                            project,
+                            firebase.get_material_catalog(),
+                            firebase.get_cutting_service(),
+                            project_name
+                        ),
+                    }
+            except Exception as e:
+                st.session_state.pop('cut_list_files', None)
+                st.error(f"Error generando lista de corte: {str(e)}")
+
+        cut_list_files = st.session_state.get('cut_list_files')
+        if cut_list_files:
+            col_csv, col_json = st.columns(2)
+            with col_csv:
+                st.download_button(
+                    label="📥 Lista de corte (CSV)",
+                    data=cut_list_files['csv'],
+                    file_name=f"Corte_{cut_list_files['file_stem']}.csv",
+                    mime="text/csv",
+                    use_container_width=True,
+                )
+            with col_json:
+                st.download_button(
+                    label="📥 Despiece por tabla (JSON)",
+                    data=cut_list_files['json'],
+                    file_name=f"Despiece_{cut_list_files['file_stem']}.json",
+                    mime="application/json",
+                    use_container_width=True,
+                )
+            st.caption("Si modificas el proyecto, vuelve a preparar la lista.")
+
+    # Solo la pestaña activa pudo modificar el borrador en esta ejecución
+    if active_tab in PROJECT_EDITOR_TAB_SECTIONS:
+        change_tracker.refresh(project, [PROJECT_EDITOR_TAB_SECTIONS[active_tab]])
@@ -1,19 +1,18 @@
 import streamlit as st
 import streamlit.components.v1 as components
-from services.firebase_service import FirebaseService
+from services.firebase_service import get_healthy_firebase_service
+from services.edge_banding_service import EdgeBandingService
+from services.repricing_service import RepricingService
 
 # Inicializar Firebase
 def get_firebase():
-    """Obtiene la instancia de Firebase"""
-    if 'firebase' not in st.session_state:
-        try:
-            with st.spinner("Conectando con Firebase..."):
-                st.session_state.firebase = FirebaseService()
-        except Exception as e:
-            st.error("❌ Error conectando con Firebase")
-            st.error(str(e))
-            st.stop()
-    return st.session_state.firebase
+    """Obtiene la instancia compartida de Firebase"""
+    try:
+        return get_healthy_firebase_service()
+    except Exception as e:
+        st.error("❌ Error conectando con Firebase")
+        st.error(str(e))
+        st.stop()
 
 firebase = get_firebase()
 st.session_state.active_nav_page = 'references'
@@ -92,7 +91,8 @@ with tabs[0]:
                 'waste_factor': 0.10,
                 'board_price': 0.0,
                 'board_height_mm': 2440,
-                'board_width_mm': 1220
+                'board_width_mm': 1220,
+                'grain': False
             }
             firebase.create_material(new_material)
             st.success("Material agregado")
@@ -157,6 +157,26 @@ with tabs[0]:
                             value=material.get('board_width_mm', 1220),
                             key=f"mat_width_{material['id']}"
                         )
+                        
+                        material['grain'] = st.checkbox(
+                            "Con veta (no girar piezas)",
+                            value=material.get('grain', False),
+                            key=f"mat_grain_{material['id']}",
+                            help="Las piezas se colocan con su largo a lo alto de la tabla en el despiece"
+                        )
+                    
+                    st.caption("Canto por tipo de pieza (lados largos / cortos con canto)")
+                    banding_rules = EdgeBandingService.rules_for(material)
+                    banding_rows = st.data_editor(
+                        [
+                            {'Pieza': piece_type, 'Lados largos': edges[0], 'Lados cortos': edges[1]}
+                            for piece_type, edges in banding_rules.items()
+                        ],
+                        disabled=['Pieza'],
+                        hide_index=True,
+                        use_container_width=True,
+                        key=f"mat_banding_{material['id']}"
+                    )
                     
                     col_save, col_delete = st.columns([3, 1])
                     
@@ -170,7 +190,15 @@ with tabs[0]:
                                     'waste_factor': material['waste_factor'],
                                     'board_price': material['board_price'],
                                     'board_height_mm': material['board_height_mm'],
-                                    'board_width_mm': material['board_width_mm']
+                                    'board_width_mm': material['board_width_mm'],
+                                    'grain': material['grain'],
+                                    # Solo se guardan las reglas que difieren de las por defecto
+                                    'edge_banding': {
+                                        row['Pieza']: [int(row['Lados largos'] or 0), int(row['Lados cortos'] or 0)]
+                                        for row in banding_rows
+                                        if (int(row['Lados largos'] or 0), int(row['Lados cortos'] or 0))
+                                        != EdgeBandingService.DEFAULT_RULES.get(row['Pieza'])
+                                    }
                                 }
                                 firebase.update_material(material['id'], material_data)
                                 st.success("✅ Material actualizado")
@@ -201,6 +229,56 @@ with tabs[0]:
     except Exception as e:
         st.error(f"Error cargando materiales: {str(e)}")
 
+    # Recálculo de presupuestos activos tras cambiar precios
+    st.divider()
+    st.markdown("#### 🔄 Recalcular presupuestos activos")
+    st.caption(
+        "Recalcula todos los proyectos en estado Activo con los precios actuales y guarda un "
+        "informe con el total anterior y el nuevo de cada proyecto afectado. Los proyectos no se modifican."
+    )
+    if st.button("Recalcular presupuestos activos", key="reprice_active_projects"):
+        progress_text = st.empty()
+
+        def show_repricing_progress(summary):
+            progress_text.caption(f"{summary['projects']} proyectos recalculados, {summary['changed']} con cambios…")
+
+        try:
+            with st.spinner("Recalculando presupuestos..."):
+                st.session_state.repricing_summary = RepricingService.run_for_firebase(
+                    firebase, progress_callback=show_repricing_progress
+                )
+            progress_text.empty()
+        except Exception as e:
+            st.error(f"Error recalculando presupuestos: {str(e)}")
+
+    repricing_summary = st.session_state.get('repricing_summary')
+    if repricing_summary:
+        col1, col2, col3 = st.columns(3)
+        col1.metric("Proyectos", repricing_summary['projects'])
+        col2.metric("Con cambios", repricing_summary['changed'])
+        col3.metric("Diferencia total", f"{repricing_summary['delta']:+,.2f} €")
+        if repricing_summary['without_previous_total']:
+            st.caption(f"{repricing_summary['without_previous_total']} proyecto(s) sin total guardado (o a 0) no se comparan.")
+        if repricing_summary['top_changes']:
+            st.dataframe(
+                [
+                    {
+                        'Proyecto': row['name'],
+                        'Cliente': row['client'],
+                        'Total anterior (€)': round(row['old_total'], 2),
+                        'Total nuevo (€)': round(row['new_total'], 2),
+                        'Diferencia (€)': round(row['delta'], 2),
+                    }
+                    for row in repricing_summary['top_changes']
+                ],
+                use_container_width=True,
+                hide_index=True,
+            )
+        st.caption(
+            f"Tiempo: {repricing_summary['elapsed_s']:.1f} s con {repricing_summary['workers']} proceso(s)"
+            + (f" · Informe: {repricing_summary['report_id']}" if repricing_summary.get('report_id') else "")
+        )
+
 # ========== TAB: HERRAJES ==========
 with tabs[1]:
     st.subheader("Herrajes")
@@ -406,7 +484,7 @@ with tabs[3]:
     try:
         cutting_service = firebase.get_cutting_service()
         
-        col1, col2 = st.columns(2)
+        col1, col2, col3, col4 = st.columns(4)
         
         with col1:
             price_per_m2 = st.number_input(
@@ -425,11 +503,32 @@ with tabs[3]:
                 help="Desperdicio adicional para el servicio de corte"
             )
         
+        with col3:
+            kerf_mm = st.number_input(
+                "Grosor de corte / kerf (mm)",
+                value=float(cutting_service.get('kerf_mm', 4.0)),
+                min_value=0.0,
+                max_value=20.0,
+                step=0.5,
+                help="Material que se pierde en cada corte de la sierra (usado en el despiece)"
+            )
+        
+        with col4:
+            price_per_m_canto = st.number_input(
+                "Precio canto por metro (€)",
+                value=float(cutting_service.get('price_per_m_canto', 0.0)),
+                min_value=0.0,
+                step=0.1,
+                help="Se cobra por metro lineal de canto según las reglas de cada material"
+            )
+        
         if st.button("💾 Guardar Configuración", type="primary"):
             try:
                 cutting_data = {
                     'price_per_m2': price_per_m2,
-                    'waste_factor': waste_factor
+                    'waste_factor': waste_factor,
+                    'kerf_mm': kerf_mm,
+                    'price_per_m_canto': price_per_m_canto
                 }
                 firebase.update_cutting_service(cutting_data)
                 st.success("✅ Configuración actualizada")
@@ -451,6 +550,13 @@ with tabs[3]:
         - Desperdicio: 10% (0.10)
         
         Resultado: 10 × 5 × 1.10 = 55€
+        
+        Si hay precio de canto por metro, se suma:
+        ```
+        costo_canto = metros_de_canto × precio_canto_por_metro
+        ```
+        Los metros salen de las reglas de canto de cada material (por ejemplo,
+        puertas con los 4 lados y laterales solo con el frente).
         """)
     
     except Exception as e:
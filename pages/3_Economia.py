@@ -5,14 +5,16 @@ import pandas as pd
 import streamlit as st
 
 from services.calculation_service import CalculationService
-from services.firebase_service import FirebaseService
+from services.firebase_service import get_healthy_firebase_service
 
 
 def get_firebase():
-    if 'firebase' not in st.session_state:
-        with st.spinner("Conectando con Firebase..."):
-            st.session_state.firebase = FirebaseService()
-    return st.session_state.firebase
+    try:
+        return get_healthy_firebase_service()
+    except Exception as e:
+        st.error("❌ Error conectando con Firebase")
+        st.error(str(e))
+        st.stop()
 
 
 def get_all_employees_safe(firebase):
@@ -28,9 +30,9 @@ def get_all_employees_safe(firebase):
     return employees
 
 
-def get_economy_movements_safe(firebase):
+def get_economy_movements_safe(firebase, limit=None):
     if hasattr(firebase, 'get_economy_movements'):
-        return firebase.get_economy_movements()
+        return firebase.get_economy_movements(limit=limit)
 
     rows = []
     docs = firebase.db.collection('economia_movimientos').stream(timeout=20.0)
@@ -38,7 +40,14 @@ def get_economy_movements_safe(firebase):
         data = doc.to_dict()
         data['id'] = doc.id
         rows.append(data)
-    return sorted(rows, key=lambda x: x.get('fecha') or datetime.min, reverse=True)
+    rows = sorted(rows, key=lambda x: x.get('fecha') or datetime.min, reverse=True)
+    return rows[:limit] if limit else rows
+
+
+def get_economy_totals_safe(firebase):
+    if hasattr(firebase, 'get_economy_totals'):
+        return firebase.get_economy_totals()
+    return CalculationService.compute_economy_totals(get_economy_movements_safe(firebase))
 
 
 def create_economy_movement_safe(firebase, movement):
@@ -81,14 +90,16 @@ firebase = get_firebase()
 st.session_state.active_nav_page = 'economy'
 st.title("💹 Economía")
 
-projects = firebase.get_all_projects()
+projects = firebase.get_all_project_summaries()
 employees = get_all_employees_safe(firebase)
-movements = get_economy_movements_safe(firebase)
+# Movimientos recientes que se listan si no hay filtros (se amplía con "Cargar más")
+MOVEMENTS_PAGE_SIZE = 50
 
-balances = CalculationService.compute_economy_balances(movements)
+# Balances desde el documento de agregados: no hace falta leer todo el libro
+totals = get_economy_totals_safe(firebase)
 col1, col2 = st.columns(2)
-col1.metric("Balance Taller", f"{balances['balance_taller']:.2f} €")
-col2.metric("Fondos Reales", f"{balances['fondos_reales']:.2f} €")
+col1.metric("Balance Taller", f"{totals['balance_taller']:.2f} €")
+col2.metric("Fondos Reales", f"{totals['fondos_reales']:.2f} €")
 
 st.markdown("---")
 st.subheader("➕ Movimientos")
@@ -113,25 +124,16 @@ permanent_employees = sorted(
 )
 
 
-def signed_amount_without_pending(movement):
-    movement_type = movement.get('tipo', '')
-    amount = float(movement.get('monto', 0.0) or 0.0)
-    if movement_type == 'Pendiente de pago':
-        return 0.0
-    if movement_type == 'Ingreso':
-        return amount
-    return -amount
+def names_with_movements(group):
+    return sorted(name for name, entry in (totals.get(group) or {}).items() if (entry or {}).get('movimientos', 0) > 0)
 
 
 if permanent_employees:
     st.subheader("👥 Balance empleados permanentes")
     permanent_employee_names = [emp.get('nombre') for emp in permanent_employees if emp.get('nombre')]
+    employee_totals = totals.get('empleados') or {}
     employee_balance_map = {
-        employee_name: sum(
-            signed_amount_without_pending(mov)
-            for mov in movements
-            if mov.get('origen_categoria') == 'Empleado' and mov.get('origen_nombre') == employee_name
-        )
+        employee_name: float((employee_totals.get(employee_name.strip()) or {}).get('fondos', 0.0) or 0.0)
         for employee_name in permanent_employee_names
     }
 
@@ -226,12 +228,17 @@ with col1:
     use_date_filter = st.checkbox("Filtrar por fecha")
     filter_date = st.date_input("Fecha", value=date.today(), key="economy_filter_date") if use_date_filter else None
 with col2:
-    filter_project = st.selectbox("Proyecto", ["Todos"] + sorted({m.get('project_name') for m in movements if m.get('project_name')}))
+    filter_project = st.selectbox("Proyecto", ["Todos"] + names_with_movements('proyectos'))
 with col3:
-    filter_client = st.selectbox("Cliente", ["Todos"] + sorted({m.get('origen_nombre') for m in movements if m.get('origen_categoria') == 'Cliente'}))
+    filter_client = st.selectbox("Cliente", ["Todos"] + names_with_movements('clientes'))
 with col4:
     filter_type = st.selectbox("Tipo", ["Todos", "Ingreso", "Egreso", "Pendiente de pago"])
 
+# Con filtros se busca en todo el libro; sin ellos basta con la página de movimientos recientes
+has_filters = bool(filter_date) or filter_project != 'Todos' or filter_client != 'Todos' or filter_type != 'Todos'
+movements_limit = None if has_filters else st.session_state.get('economy_movements_limit', MOVEMENTS_PAGE_SIZE)
+movements = get_economy_movements_safe(firebase, limit=movements_limit)
+
 filtered = []
 for mov in movements:
     mov_date = mov.get('fecha')
@@ -295,4 +302,8 @@ for mov in filtered:
 if not filtered:
     st.info("No hay movimientos con los filtros seleccionados.")
 if movements:
-    st.caption(f"Movimientos mostrados: {len(pd.DataFrame(filtered))}")
+    st.caption(f"Movimientos mostrados: {len(pd.DataFrame(filtered))} de {int(totals.get('movimientos', 0) or 0)}")
+if movements_limit and len(movements) >= movements_limit:
+    if st.button("Cargar más movimientos", key="economy_load_more"):
+        st.session_state.economy_movements_limit = movements_limit + MOVEMENTS_PAGE_SIZE
+        st.rerun()
@@ -0,0 +1,73 @@
+"""
+Recalcula los presupuestos activos con el catálogo actual de materiales.
+
+Uso:
+    python reprice_projects.py [--credentials firebase-credentials.json]
+                               [--status Activo] [--chunk-size 200]
+                               [--workers N] [--dry-run]
+
+Escribe un informe en `repricing_reports` (salvo con --dry-run) con el total
+anterior y el nuevo de cada proyecto afectado.
+"""
+
+import argparse
+import sys
+
+import firebase_admin
+from firebase_admin import credentials
+
+from services.firebase_service import FirebaseService
+from services.repricing_service import RepricingService
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Recalcula los presupuestos activos con el catálogo actual")
+    parser.add_argument('--credentials', default='firebase-credentials.json',
+                        help="Archivo de credenciales de Firebase (cuenta de servicio)")
+    parser.add_argument('--status', default='Activo',
+                        help="Estado de los proyectos a recalcular (vacío = todos)")
+    parser.add_argument('--chunk-size', type=int, default=RepricingService.DEFAULT_CHUNK_SIZE,
+                        help="Proyectos leídos por bloque")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="Procesos de cálculo (por defecto, uno por CPU)")
+    parser.add_argument('--dry-run', action='store_true',
+                        help="Solo muestra el resumen, no escribe el informe")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+
+    # Se inicializa con el archivo indicado; FirebaseService reutiliza la app existente
+    if not firebase_admin._apps:
+        firebase_admin.initialize_app(credentials.Certificate(args.credentials))
+    firebase_service = FirebaseService(cache_ttl_seconds=0, live_sync=False)
+
+    def report_progress(summary):
+        print(f"  {summary['projects']} proyectos, {summary['changed']} con cambios", flush=True)
+
+    summary = RepricingService.run_for_firebase(
+        firebase_service,
+        status=args.status or None,
+        chunk_size=args.chunk_size,
+        max_workers=args.workers,
+        write_report=not args.dry_run,
+        progress_callback=report_progress,
+    )
+
+    print(f"\nProyectos recalculados: {summary['projects']} en {summary['elapsed_s']:.1f} s "
+          f"({summary['workers']} procesos)")
+    print(f"Con cambios: {summary['changed']} (suben {summary['increased']}, bajan {summary['decreased']})")
+    if summary['without_previous_total']:
+        print(f"Sin total anterior (no se comparan): {summary['without_previous_total']}")
+    print(f"Total anterior: {summary['total_old']:,.2f} €  Diferencia: {summary['delta']:+,.2f} €")
+    for row in summary['top_changes']:
+        print(f"  {row['name'] or row['project_id']:<30} {row['old_total']:>12,.2f} € -> "
+              f"{row['new_total']:>12,.2f} € ({row['delta']:+,.2f} €)")
+    if summary['report_id']:
+        print(f"\nInforme: repricing_reports/{summary['report_id']}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,194 @@
+import multiprocessing
+import os
+import re
+import tempfile
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import BinaryIO, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from models.material_catalog import MaterialCatalog
+from services.logo_service import PreparedLogo
+from services.pdf_service import PDFService
+from services.vector_calculation_service import VectorCalculationService
+
+
+class BulkExportService:
+    """
+    Exportación en lote de presupuestos en PDF.
+
+    Los proyectos llegan por bloques (`FirebaseService.iter_project_chunks`) y cada
+    bloque se calcula y se renderiza en procesos worker que reciben el catálogo, el
+    servicio de corte y el logo una sola vez. Cada PDF se escribe en cuanto llega
+    (a un directorio o a un ZIP en streaming), así en memoria solo están los PDFs
+    del bloque en curso.
+    """
+
+    DEFAULT_CHUNK_SIZE = 100
+    # Campos del proyecto que se leen para el PDF
+    EXPORT_FIELDS = [
+        'name', 'client', 'date', 'status', 'total_calculated', 'final_price',
+        'modules', 'shelves', 'woods', 'hardwares', 'labor_cost_project', 'extra_complexity', 'use_nesting',
+    ]
+    # Tamaño hasta el que el ZIP de la interfaz se mantiene en memoria antes de pasar a disco
+    SPOOL_MAX_BYTES = 16 * 1024 * 1024
+
+    _UNSAFE_CHARS = re.compile(r'[^\w\-]+')
+
+    @staticmethod
+    def file_name(project: Dict) -> str:
+        """Nombre de archivo único por proyecto: 'Presupuesto_<nombre>_<id>.pdf'."""
+        name = BulkExportService._UNSAFE_CHARS.sub('_', project.get('name') or 'proyecto').strip('_')
+        return f"Presupuesto_{name or 'proyecto'}_{project['id']}.pdf"
+
+    @staticmethod
+    def render_project(project: Dict,
+                       materials_db: MaterialCatalog,
+                       cutting_service: Dict,
+                       logo_image: Optional[PreparedLogo] = None) -> Tuple[str, Optional[bytes], Optional[str]]:
+        """Calcula y renderiza un proyecto; devuelve (nombre de archivo, PDF, error)."""
+        file_name = BulkExportService.file_name(project)
+        try:
+            # Tablas con el mismo modo que la pestaña Costos del proyecto
+            calculations = VectorCalculationService.calculate_all_project_costs(
+                project, materials_db, cutting_service, include_surfaces=False,
+                use_nesting=bool(project.get('use_nesting', False)), nesting_workers=1
+            )
+            pdf = PDFService.generate_pdf(project, calculations, materials_db, logo_image=logo_image)
+            return file_name, pdf.getvalue(), None
+        except Exception as e:
+            # Un proyecto con datos incompletos no detiene la exportación
+            return file_name, None, str(e)
+
+    @staticmethod
+    def _resolve_workers(max_workers: Optional[int]) -> int:
+        if max_workers is None:
+            max_workers = os.cpu_count() or 1
+        return max(1, int(max_workers))
+
+    @staticmethod
+    def iter_pdfs(chunks: Iterable[List[Dict]],
+                  materials_db: Union[MaterialCatalog, List[Dict]],
+                  cutting_service: Dict,
+                  logo_image: Optional[PreparedLogo] = None,
+                  max_workers: Optional[int] = None) -> Iterator[Tuple[str, Optional[bytes], Optional[str]]]:
+        """Genera (nombre, PDF, error) en el orden de los proyectos; `max_workers=1` usa el proceso actual."""
+        materials_db = MaterialCatalog.coerce(materials_db)
+        workers = BulkExportService._resolve_workers(max_workers)
+        pool = None
+        if workers > 1:
+            try:
+                # 'spawn': el proceso de Streamlit tiene hilos y fork podría bloquearse
+                pool = ProcessPoolExecutor(
+                    max_workers=workers,
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=_init_worker,
+                    initargs=(materials_db, cutting_service, logo_image),
+                )
+            except (OSError, RuntimeError):
+                pool = None
+
+        try:
+            for chunk in chunks:
+                if pool is not None:
+                    try:
+                        # Se consumen todos antes de escribir: si el pool cae, el bloque se repite completo
+                        results = list(pool.map(_render_task, chunk, chunksize=max(1, len(chunk) // (4 * workers))))
+                    except (BrokenProcessPool, OSError, RuntimeError):
+                        pool.shutdown(wait=False, cancel_futures=True)
+                        pool = None
+                    else:
+                        yield from results
+                        continue
+                for project in chunk:
+                    yield BulkExportService.render_project(project, materials_db, cutting_service, logo_image)
+        finally:
+            if pool is not None:
+                pool.shutdown(wait=True)
+
+    @staticmethod
+    def _export(pdfs: Iterable[Tuple[str, Optional[bytes], Optional[str]]],
+                write: Callable[[str, bytes], None],
+                progress_callback: Optional[Callable[[Dict], None]] = None) -> Dict:
+        started = time.perf_counter()
+        summary = {'pdfs': 0, 'bytes': 0, 'errors': []}
+        for file_name, data, error in pdfs:
+            if data is None:
+                summary['errors'].append({'file': file_name, 'error': error})
+            else:
+                write(file_name, data)
+                summary['pdfs'] += 1
+                summary['bytes'] += len(data)
+            if progress_callback is not None:
+                progress_callback(dict(summary))
+        summary['elapsed_s'] = time.perf_counter() - started
+        summary['pdfs_per_s'] = summary['pdfs'] / summary['elapsed_s'] if summary['elapsed_s'] > 0 else 0.0
+        return summary
+
+    @staticmethod
+    def export_to_directory(pdfs: Iterable[Tuple[str, Optional[bytes], Optional[str]]],
+                            directory: str,
+                            progress_callback: Optional[Callable[[Dict], None]] = None) -> Dict:
+        """Escribe cada PDF como archivo en `directory` (se crea si no existe)."""
+        os.makedirs(directory, exist_ok=True)
+
+        def write(file_name: str, data: bytes):
+            with open(os.path.join(directory, file_name), 'wb') as f:
+                f.write(data)
+
+        summary = BulkExportService._export(pdfs, write, progress_callback)
+        summary['target'] = directory
+        return summary
+
+    @staticmethod
+    def export_to_zip(pdfs: Iterable[Tuple[str, Optional[bytes], Optional[str]]],
+                      stream: BinaryIO,
+                      progress_callback: Optional[Callable[[Dict], None]] = None) -> Dict:
+        """Escribe los PDFs en un ZIP sobre `stream` (admite streams no posicionables, p. ej. stdout)."""
+        with zipfile.ZipFile(stream, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+            summary = BulkExportService._export(pdfs, archive.writestr, progress_callback)
+        return summary
+
+    @staticmethod
+    def spool_zip(pdfs: Iterable[Tuple[str, Optional[bytes], Optional[str]]],
+                  progress_callback: Optional[Callable[[Dict], None]] = None) -> Tuple[BinaryIO, Dict]:
+        """ZIP en un archivo temporal (en memoria hasta SPOOL_MAX_BYTES) rebobinado, para descargar."""
+        spooled = tempfile.SpooledTemporaryFile(max_size=BulkExportService.SPOOL_MAX_BYTES, mode='w+b')
+        summary = BulkExportService.export_to_zip(pdfs, spooled, progress_callback)
+        spooled.seek(0)
+        return spooled, summary
+
+    @staticmethod
+    def pdfs_for_firebase(firebase_service,
+                          status: Optional[str] = 'Activo',
+                          client: Optional[str] = None,
+                          chunk_size: int = DEFAULT_CHUNK_SIZE,
+                          max_workers: Optional[int] = None) -> Iterator[Tuple[str, Optional[bytes], Optional[str]]]:
+        """PDFs de los proyectos filtrados; catálogo, corte y logo se leen una vez para todo el lote."""
+        return BulkExportService.iter_pdfs(
+            firebase_service.iter_project_chunks(
+                status, chunk_size, client=client, fields=BulkExportService.EXPORT_FIELDS
+            ),
+            firebase_service.get_material_catalog(),
+            firebase_service.get_cutting_service() or {},
+            firebase_service.get_pdf_logo(),
+            max_workers,
+        )
+
+
+_worker_materials: Optional[MaterialCatalog] = None
+_worker_cutting_service: Dict = {}
+_worker_logo: Optional[PreparedLogo] = None
+
+
+def _init_worker(materials_db: MaterialCatalog, cutting_service: Dict, logo_image: Optional[PreparedLogo]):
+    """Catálogo, corte y logo se envían una vez por worker, no con cada proyecto."""
+    global _worker_materials, _worker_cutting_service, _worker_logo
+    _worker_materials = materials_db
+    _worker_cutting_service = cutting_service
+    _worker_logo = logo_image
+
+
+def _render_task(project: Dict) -> Tuple[str, Optional[bytes], Optional[str]]:
+    return BulkExportService.render_project(project, _worker_materials, _worker_cutting_service, _worker_logo)
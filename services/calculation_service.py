@@ -1,5 +1,9 @@
 import math
-from typing import List, Dict, Tuple
+from typing import List, Dict, Optional, Tuple, Union
+
+from models.material_catalog import MaterialCatalog
+from services.edge_banding_service import EdgeBandingService
+from services.nesting_service import NestingService
 
 class CalculationService:
     """Servicio para todos los cálculos del proyecto"""
@@ -14,6 +18,7 @@ class CalculationService:
         """
         Calcula las superficies de un módulo
         NO descuenta espesores
+        Cada pieza incluye largo_mm (sentido de la veta) y ancho_mm para el despiece
         """
         surfaces = []
         
@@ -36,7 +41,9 @@ class CalculationService:
             'material': material,
             'm2_unitario': CalculationService.mm_to_m2(alto, profundo),
             'm2_total': CalculationService.mm_to_m2(alto, profundo) * 2 * cantidad_modulos,
-            'cantidad': 2 * cantidad_modulos
+            'cantidad': 2 * cantidad_modulos,
+            'largo_mm': alto,
+            'ancho_mm': profundo
         })
         
         # 2 horizontales: ancho × profundo
@@ -45,7 +52,9 @@ class CalculationService:
             'material': material,
             'm2_unitario': CalculationService.mm_to_m2(ancho, profundo),
             'm2_total': CalculationService.mm_to_m2(ancho, profundo) * 2 * cantidad_modulos,
-            'cantidad': 2 * cantidad_modulos
+            'cantidad': 2 * cantidad_modulos,
+            'largo_mm': ancho,
+            'ancho_mm': profundo
         })
         
         # Fondo: ancho × alto
@@ -55,7 +64,9 @@ class CalculationService:
                 'material': material_fondo,
                 'm2_unitario': CalculationService.mm_to_m2(ancho, alto),
                 'm2_total': CalculationService.mm_to_m2(ancho, alto) * cantidad_modulos,
-                'cantidad': 1 * cantidad_modulos
+                'cantidad': 1 * cantidad_modulos,
+                'largo_mm': alto,
+                'ancho_mm': ancho
             })
         
         # Puertas: ancho × alto × cantidad
@@ -65,7 +76,9 @@ class CalculationService:
                 'material': material_puerta,
                 'm2_unitario': CalculationService.mm_to_m2(ancho, alto),
                 'm2_total': CalculationService.mm_to_m2(ancho, alto) * cantidad_puertas * cantidad_modulos,
-                'cantidad': cantidad_puertas * cantidad_modulos
+                'cantidad': cantidad_puertas * cantidad_modulos,
+                'largo_mm': alto,
+                'ancho_mm': ancho
             })
         
         # Estantes: ancho × profundo × cantidad
@@ -75,7 +88,9 @@ class CalculationService:
                 'material': material,
                 'm2_unitario': CalculationService.mm_to_m2(ancho, profundo),
                 'm2_total': CalculationService.mm_to_m2(ancho, profundo) * cantidad_estantes * cantidad_modulos,
-                'cantidad': cantidad_estantes * cantidad_modulos
+                'cantidad': cantidad_estantes * cantidad_modulos,
+                'largo_mm': ancho,
+                'ancho_mm': profundo
             })
         
         # Divisiones: alto × profundo × cantidad
@@ -85,7 +100,9 @@ class CalculationService:
                 'material': material,
                 'm2_unitario': CalculationService.mm_to_m2(alto, profundo),
                 'm2_total': CalculationService.mm_to_m2(alto, profundo) * cantidad_divisiones * cantidad_modulos,
-                'cantidad': cantidad_divisiones * cantidad_modulos
+                'cantidad': cantidad_divisiones * cantidad_modulos,
+                'largo_mm': alto,
+                'ancho_mm': profundo
             })
         
         return surfaces
@@ -116,7 +133,9 @@ class CalculationService:
             'material': material,
             'm2_unitario': CalculationService.mm_to_m2(ancho, alto),
             'm2_total': CalculationService.mm_to_m2(ancho, alto) * 2 * cantidad_cajones * cantidad_modulos,
-            'cantidad': 2 * cantidad_cajones * cantidad_modulos
+            'cantidad': 2 * cantidad_cajones * cantidad_modulos,
+            'largo_mm': ancho,
+            'ancho_mm': alto
         })
 
         # Base: ancho x profundo x1
@@ -125,7 +144,9 @@ class CalculationService:
             'material': material,
             'm2_unitario': CalculationService.mm_to_m2(ancho, profundo),
             'm2_total': CalculationService.mm_to_m2(ancho, profundo) * cantidad_cajones * cantidad_modulos,
-            'cantidad': cantidad_cajones * cantidad_modulos
+            'cantidad': cantidad_cajones * cantidad_modulos,
+            'largo_mm': ancho,
+            'ancho_mm': profundo
         })
 
         # Laterales solo para cajón completo: alto x profundo x2
@@ -135,7 +156,9 @@ class CalculationService:
                 'material': material,
                 'm2_unitario': CalculationService.mm_to_m2(alto, profundo),
                 'm2_total': CalculationService.mm_to_m2(alto, profundo) * 2 * cantidad_cajones * cantidad_modulos,
-                'cantidad': 2 * cantidad_cajones * cantidad_modulos
+                'cantidad': 2 * cantidad_cajones * cantidad_modulos,
+                'largo_mm': alto,
+                'ancho_mm': profundo
             })
 
         return surfaces
@@ -155,7 +178,9 @@ class CalculationService:
             'material': material,
             'm2_unitario': m2_unitario,
             'm2_total': m2_unitario * cantidad,
-            'cantidad': cantidad
+            'cantidad': cantidad,
+            'largo_mm': ancho,
+            'ancho_mm': profundo
         }
     
     @staticmethod
@@ -173,7 +198,9 @@ class CalculationService:
             'material': material,
             'm2_unitario': m2_unitario,
             'm2_total': m2_unitario * cantidad,
-            'cantidad': cantidad
+            'cantidad': cantidad,
+            'largo_mm': ancho,
+            'ancho_mm': profundo
         }
     
     @staticmethod
@@ -312,17 +339,20 @@ class CalculationService:
     
     @staticmethod
     def calculate_all_project_costs(project_data: Dict, 
-                                    materials_db: List[Dict],
-                                    cutting_service: Dict) -> Dict:
+                                    materials_db: Union[MaterialCatalog, List[Dict]],
+                                    cutting_service: Dict,
+                                    use_nesting: bool = False,
+                                    nesting_heuristic: str = NestingService.DEFAULT_HEURISTIC,
+                                    nesting_workers: Optional[int] = None) -> Dict:
         """
         Calcula todos los costos del proyecto
         Retorna un diccionario completo con todos los cálculos
+        Con use_nesting las tablas salen del despiece real (ver NestingService)
+        en lugar de la estimación por m² y el resultado incluye 'nesting';
+        nesting_workers=1 evita el pool de procesos
         """
-        # Crear diccionario de materiales por tipo-color-espesor
-        materials_dict = {}
-        for mat in materials_db:
-            key = f"{mat['type']}_{mat.get('color', '')}_{mat.get('thickness_mm', 0)}"
-            materials_dict[key] = mat
+        # Materiales por tipo-color-espesor (se reutiliza el catálogo si ya viene armado)
+        materials_dict = MaterialCatalog.coerce(materials_db)
         
         # Recolectar todas las superficies
         all_surfaces = []
@@ -363,12 +393,54 @@ class CalculationService:
                 material_costs[material_key] = cost_data
                 total_m2_con_desperdicio += cost_data['m2_con_desperdicio']
         
-        # Calcular costo de corte
+        # Tablas según despiece real
+        layouts = None
+        if use_nesting:
+            layouts = NestingService.nest_materials(
+                NestingService.pieces_from_surfaces(all_surfaces),
+                materials_dict,
+                cutting_service.get('kerf_mm'),
+                nesting_heuristic,
+                nesting_workers
+            )
+            NestingService.apply_to_material_costs(material_costs, layouts)
+        
+        results = CalculationService.finalize_project_costs(
+            project_data,
+            cutting_service,
+            all_surfaces,
+            material_totals,
+            material_costs,
+            total_m2_con_desperdicio,
+            EdgeBandingService.metres_from_surfaces(all_surfaces, materials_dict),
+        )
+        if layouts is not None:
+            results['nesting'] = layouts
+        return results
+
+    @staticmethod
+    def finalize_project_costs(project_data: Dict,
+                               cutting_service: Dict,
+                               all_surfaces: List[Dict],
+                               material_totals: Dict[str, float],
+                               material_costs: Dict[str, Dict],
+                               total_m2_con_desperdicio: float,
+                               edge_banding_m: Optional[Dict[str, float]] = None) -> Dict:
+        """
+        Completa el cálculo a partir de los costos de materiales
+        (corte y canto, herrajes, total, mano de obra y descuento para factura)
+        """
+        # Calcular costo de corte (por m²) y canto (por metro lineal)
+        edge_banding_m = edge_banding_m or {}
+        edge_banding_cost = EdgeBandingService.calculate_cost(
+            edge_banding_m,
+            cutting_service.get('price_per_m_canto', 0.0)
+        )
         cutting_cost = CalculationService.calculate_cutting_cost(
             total_m2_con_desperdicio,
             cutting_service.get('price_per_m2', 0.0),
             cutting_service.get('waste_factor', 0.0)
-        )
+        ) + edge_banding_cost
         
         # Calcular total de herrajes
         hardware_total = (
@@ -408,20 +480,26 @@ class CalculationService:
             'final_price': final_price,
             'labor_for_invoice': labor_for_invoice,
             'discount_for_invoice': discount_for_invoice,
-            'total_m2_con_desperdicio': total_m2_con_desperdicio
+            'total_m2_con_desperdicio': total_m2_con_desperdicio,
+            'edge_banding_m': edge_banding_m,
+            'edge_banding_cost': edge_banding_cost
         }
 
+    @staticmethod
+    def economy_signed_amount(movement: Dict, include_pending: bool = True) -> float:
+        """Monto con signo: los ingresos suman y el resto resta; 'Pendiente de pago' opcional."""
+        tipo = movement.get('tipo', '')
+        amount = float(movement.get('monto', 0.0) or 0.0)
+        if tipo == 'Pendiente de pago' and not include_pending:
+            return 0.0
+        if tipo == 'Ingreso':
+            return amount
+        return -amount
+
     @staticmethod
     def compute_economy_balances(movements: List[Dict]) -> Dict[str, float]:
         """Calcula balances principales de economía."""
-        def signed_amount(movement: Dict, include_pending: bool = True) -> float:
-            tipo = movement.get('tipo', '')
-            amount = float(movement.get('monto', 0.0) or 0.0)
-            if tipo == 'Pendiente de pago' and not include_pending:
-                return 0.0
-            if tipo == 'Ingreso':
-                return amount
-            return -amount
+        signed_amount = CalculationService.economy_signed_amount
 
         balance_taller = sum(signed_amount(mov, include_pending=True) for mov in movements)
         fondos_reales = sum(signed_amount(mov, include_pending=False) for mov in movements)
@@ -436,6 +514,68 @@ class CalculationService:
             'fondos_reales': fondos_reales,
         }
 
+    @staticmethod
+    def empty_economy_totals() -> Dict:
+        """Agregados de economía sin movimientos (misma forma que `economy_movement_deltas`)."""
+        return {
+            'movimientos': 0,
+            'balance_taller': 0.0,
+            'fondos_reales': 0.0,
+            'balance_empleados_permanentes': 0.0,
+            'empleados': {},
+            'proyectos': {},
+            'clientes': {},
+        }
+
+    @staticmethod
+    def economy_movement_deltas(movement: Dict) -> Dict:
+        """
+        Aporte de un movimiento a los agregados de economía.
+
+        Totales del taller como en `compute_economy_balances`, y por empleado
+        (origen 'Empleado'), proyecto (`project_name`) y cliente (origen 'Cliente')
+        un mapa {'balance', 'fondos', 'movimientos'}: 'balance' incluye los pendientes
+        de pago y 'fondos' no.
+        """
+        balance = CalculationService.economy_signed_amount(movement, include_pending=True)
+        fondos = CalculationService.economy_signed_amount(movement, include_pending=False)
+        entry = {'balance': balance, 'fondos': fondos, 'movimientos': 1}
+        origen = movement.get('origen_categoria')
+        origen_nombre = (movement.get('origen_nombre') or '').strip()
+        project_name = (movement.get('project_name') or '').strip()
+
+        deltas = CalculationService.empty_economy_totals()
+        deltas['movimientos'] = 1
+        deltas['balance_taller'] = balance
+        deltas['fondos_reales'] = fondos
+        if origen == 'Empleado' and movement.get('empleado_tipo') == 'Permanente':
+            deltas['balance_empleados_permanentes'] = fondos
+        if origen == 'Empleado' and origen_nombre:
+            deltas['empleados'][origen_nombre] = dict(entry)
+        if origen == 'Cliente' and origen_nombre:
+            deltas['clientes'][origen_nombre] = dict(entry)
+        if project_name:
+            deltas['proyectos'][project_name] = dict(entry)
+        return deltas
+
+    @staticmethod
+    def add_economy_deltas(totals: Dict, deltas: Dict, factor: int = 1) -> Dict:
+        """Suma `deltas` (por `factor`, -1 para restar) sobre `totals`, en el lugar."""
+        for key, value in deltas.items():
+            if isinstance(value, dict):
+                CalculationService.add_economy_deltas(totals.setdefault(key, {}), value, factor)
+            else:
+                totals[key] = totals.get(key, 0) + value * factor
+        return totals
+
+    @staticmethod
+    def compute_economy_totals(movements: List[Dict]) -> Dict:
+        """Agregados completos del libro de movimientos (para regenerarlos desde cero)."""
+        totals = CalculationService.empty_economy_totals()
+        for mov in movements:
+            CalculationService.add_economy_deltas(totals, CalculationService.economy_movement_deltas(mov))
+        return totals
+
     @staticmethod
     def split_amount_by_percentages(total_amount: float, distributions: List[Dict]) -> List[Dict]:
         """Divide un monto por porcentajes y corrige redondeo al final."""
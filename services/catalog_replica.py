@@ -0,0 +1,170 @@
+import copy
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+
+class CatalogReplica:
+    """Réplica en memoria de colecciones de catálogo sincronizada con `on_snapshot`.
+
+    Cada colección registrada recibe los cambios de documentos (ADDED, MODIFIED,
+    REMOVED) desde Firestore, de modo que las lecturas se resuelven en memoria y el
+    tráfico depende de los cambios y no de las visitas a las páginas.
+    """
+
+    # Espera mínima entre reintentos de un listener cerrado (errores de red/permisos persistentes)
+    RESTART_INTERVAL_S = 30.0
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._documents: Dict[str, Dict[str, Dict]] = {}
+        self._ready: Dict[str, bool] = {}
+        self._watches: Dict[str, Any] = {}
+        self._collections: Dict[str, Any] = {}
+        # Identifica el listener vigente; los eventos de uno anterior se descartan
+        self._attach_ids: Dict[str, int] = {}
+        self._attached_at: Dict[str, float] = {}
+        # Contador de cambios por colección (snapshots y escrituras propias)
+        self._revisions: Dict[str, int] = {}
+
+    def attach(self, name: str, collection_ref):
+        """Registra un listener sobre la colección si no hay uno activo (el cerrado se cancela)."""
+        with self._lock:
+            watch = self._watches.get(name)
+            if watch is not None and self._is_watch_active(watch):
+                return
+            stale_watch = self._watches.pop(name, None)
+            self._collections[name] = collection_ref
+            self._documents[name] = {}
+            self._ready[name] = False
+            self._revisions[name] = self._revisions.get(name, 0) + 1
+            attach_id = self._attach_ids.get(name, 0) + 1
+            self._attach_ids[name] = attach_id
+            self._attached_at[name] = time.monotonic()
+        if stale_watch is not None:
+            self._unsubscribe(stale_watch)
+
+        def on_snapshot(docs, changes, read_time):
+            self._apply_changes(name, changes, attach_id)
+
+        watch = collection_ref.on_snapshot(on_snapshot)
+        with self._lock:
+            current = self._attach_ids.get(name) == attach_id
+            if current:
+                self._watches[name] = watch
+        if not current:
+            # Otro `attach` (o `detach_all`) ganó mientras se abría el stream
+            self._unsubscribe(watch)
+
+    def restart_if_closed(self, name: str) -> bool:
+        """
+        Vuelve a adjuntar el listener de `name` si su stream se cerró.
+
+        Se reintenta como mucho cada `RESTART_INTERVAL_S`; mientras tanto (y hasta
+        la primera instantánea del nuevo listener) `is_ready` sigue en False.
+        """
+        with self._lock:
+            watch = self._watches.get(name)
+            collection_ref = self._collections.get(name)
+            if watch is None or collection_ref is None or self._is_watch_active(watch):
+                return False
+            if time.monotonic() - self._attached_at.get(name, 0.0) < self.RESTART_INTERVAL_S:
+                return False
+        self.attach(name, collection_ref)
+        return True
+
+    def detach_all(self):
+        """Cancela todos los listeners y vacía la réplica."""
+        with self._lock:
+            watches = list(self._watches.values())
+            for name in self._watches:
+                self._attach_ids[name] = self._attach_ids.get(name, 0) + 1
+            self._watches.clear()
+            self._collections.clear()
+            self._documents.clear()
+            self._ready.clear()
+        for watch in watches:
+            self._unsubscribe(watch)
+
+    def is_ready(self, name: str) -> bool:
+        """Indica si la colección recibió su primera instantánea y el listener sigue vivo."""
+        with self._lock:
+            watch = self._watches.get(name)
+            if watch is None or not self._ready.get(name, False):
+                return False
+            if not self._is_watch_active(watch):
+                # El stream se cerró (error de red/permisos): se vuelve a leer de Firestore
+                self._ready[name] = False
+                return False
+            return True
+
+    def revision(self, name: str) -> int:
+        """Número que cambia con cada modificación de la colección en la réplica."""
+        with self._lock:
+            return self._revisions.get(name, 0)
+
+    def get_all(self, name: str) -> Optional[List[Dict]]:
+        """Devuelve copias de todos los documentos (con `id`) o None si no está lista."""
+        if not self.is_ready(name):
+            return None
+        with self._lock:
+            documents = self._documents.get(name, {})
+            return [
+                {**copy.deepcopy(documents[doc_id]), 'id': doc_id}
+                for doc_id in sorted(documents)
+            ]
+
+    def get_document(self, name: str, doc_id: str) -> Optional[Dict]:
+        """Devuelve una copia del documento o None si no existe o no está lista."""
+        if not self.is_ready(name):
+            return None
+        with self._lock:
+            data = self._documents.get(name, {}).get(doc_id)
+            return copy.deepcopy(data) if data is not None else None
+
+    def apply_local_write(self, name: str, doc_id: str, data: Optional[Dict], merge: bool = False):
+        """Aplica una escritura propia antes de que llegue el evento del listener."""
+        with self._lock:
+            if name not in self._documents:
+                return
+            documents = self._documents[name]
+            self._revisions[name] = self._revisions.get(name, 0) + 1
+            if data is None:
+                documents.pop(doc_id, None)
+            elif merge and doc_id in documents:
+                documents[doc_id] = {**documents[doc_id], **copy.deepcopy(data)}
+            else:
+                documents[doc_id] = copy.deepcopy(data)
+
+    def _apply_changes(self, name: str, changes, attach_id: int):
+        with self._lock:
+            if self._attach_ids.get(name) != attach_id:
+                return
+            documents = self._documents.setdefault(name, {})
+            for change in changes:
+                doc = change.document
+                if change.type.name == 'REMOVED':
+                    documents.pop(doc.id, None)
+                else:
+                    documents[doc.id] = doc.to_dict() or {}
+            self._revisions[name] = self._revisions.get(name, 0) + 1
+            self._ready[name] = True
+
+    @staticmethod
+    def _unsubscribe(watch):
+        try:
+            watch.unsubscribe()
+        except Exception:
+            pass
+
+    @staticmethod
+    def _is_watch_active(watch) -> bool:
+        return getattr(watch, 'is_active', True)
+
+
+_process_replica = CatalogReplica()
+
+
+def get_catalog_replica() -> CatalogReplica:
+    """Réplica compartida por todo el proceso (todas las sesiones de Streamlit)."""
+    return _process_replica
@@ -0,0 +1,259 @@
+import csv
+import io
+import json
+import re
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from models.material_catalog import MaterialCatalog
+from services.calculation_service import CalculationService
+from services.nesting_service import NestingService
+
+
+class CutListService:
+    """
+    Lista de corte: cada pieza individual con medidas, material y origen.
+
+    Las piezas se generan de forma perezosa (un módulo con `cantidad_modulos` = 50 no
+    crea 50 listas) y las exportaciones a CSV y JSON se producen por fragmentos,
+    así un trabajo grande se puede escribir a disco sin armar todo en memoria
+    (`write_csv`, `write_layout_json`, ver export_cut_list.py). Solo los botones de
+    descarga de la interfaz arman el archivo completo en bytes.
+    """
+
+    CSV_COLUMNS = ['pieza', 'material', 'largo_mm', 'ancho_mm', 'descripcion', 'origen', 'copia']
+    LAYOUT_FORMAT = 'mueble-cutlist'
+    LAYOUT_VERSION = 1
+
+    _COUNT_SUFFIX = re.compile(r'\s*\(x\d+\)$')
+
+    @staticmethod
+    def piece_label(description: str) -> str:
+        """'Lateral (x2)' -> 'Lateral' (en la lista de corte cada fila es una pieza)."""
+        return CutListService._COUNT_SUFFIX.sub('', description)
+
+    @staticmethod
+    def _module_pieces(module: Dict) -> List[Tuple[Dict, int]]:
+        """Superficies del módulo con la cantidad de piezas por cada copia del módulo."""
+        copies = max(1, int(module.get('cantidad_modulos', 1)))
+        surfaces = CalculationService.calculate_module_surfaces(module)
+        surfaces.extend(CalculationService.calculate_drawer_surfaces(module))
+        return [(surface, int(surface['cantidad']) // copies) for surface in surfaces]
+
+    @staticmethod
+    def iter_pieces(project_data: Dict) -> Iterator[Dict]:
+        """Genera una fila por pieza física, numeradas en orden de módulos, estantes y maderas."""
+        number = 0
+        for idx, module in enumerate(project_data.get('modules', [])):
+            origin = module.get('nombre') or f'Módulo {idx + 1}'
+            copies = max(1, int(module.get('cantidad_modulos', 1)))
+            per_copy = CutListService._module_pieces(module)
+            for copy_number in range(1, copies + 1):
+                for surface, count in per_copy:
+                    label = CutListService.piece_label(surface['descripcion'])
+                    for _ in range(count):
+                        number += 1
+                        yield {
+                            'pieza': number,
+                            'material': surface['material'],
+                            'largo_mm': surface['largo_mm'],
+                            'ancho_mm': surface['ancho_mm'],
+                            'descripcion': label,
+                            'origen': origin,
+                            'copia': copy_number,
+                        }
+
+        for section, default_name, surface_fn in (
+            ('shelves', 'Estante', CalculationService.calculate_shelf_surface),
+            ('woods', 'Madera', CalculationService.calculate_wood_surface),
+        ):
+            for idx, item in enumerate(project_data.get(section, [])):
+                origin = item.get('nombre') or f'{default_name} {idx + 1}'
+                surface = surface_fn(item)
+                label = CutListService.piece_label(surface['descripcion'])
+                for copy_number in range(1, int(surface['cantidad'] or 0) + 1):
+                    number += 1
+                    yield {
+                        'pieza': number,
+                        'material': surface['material'],
+                        'largo_mm': surface['largo_mm'],
+                        'ancho_mm': surface['ancho_mm'],
+                        'descripcion': label,
+                        'origen': origin,
+                        'copia': copy_number,
+                    }
+
+    @staticmethod
+    def count_pieces(project_data: Dict) -> int:
+        """Cantidad de piezas sin expandirlas."""
+        total = 0
+        for module in project_data.get('modules', []):
+            copies = max(1, int(module.get('cantidad_modulos', 1)))
+            total += copies * sum(count for _, count in CutListService._module_pieces(module))
+        for shelf in project_data.get('shelves', []):
+            total += int(CalculationService.calculate_shelf_surface(shelf)['cantidad'] or 0)
+        for wood in project_data.get('woods', []):
+            total += int(CalculationService.calculate_wood_surface(wood)['cantidad'] or 0)
+        return total
+
+    # ---------- CSV ----------
+
+    @staticmethod
+    def iter_csv(project_data: Dict) -> Iterator[str]:
+        """Genera el CSV línea a línea (cabecera incluida)."""
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=CutListService.CSV_COLUMNS)
+        writer.writeheader()
+        yield buffer.getvalue()
+        for piece in CutListService.iter_pieces(project_data):
+            buffer.seek(0)
+            buffer.truncate(0)
+            writer.writerow(piece)
+            yield buffer.getvalue()
+
+    # ---------- Layout JSON ----------
+
+    @staticmethod
+    def _number(value: float):
+        """Medidas enteras sin '.0' para un JSON más compacto."""
+        return int(value) if float(value).is_integer() else round(float(value), 2)
+
+    @staticmethod
+    def iter_layout_json(project_data: Dict,
+                         materials_db: Union[MaterialCatalog, List[Dict]],
+                         cutting_service: Dict,
+                         project_name: Optional[str] = None,
+                         heuristic: str = NestingService.DEFAULT_HEURISTIC,
+                         nesting_workers: Optional[int] = None) -> Iterator[str]:
+        """
+        Genera el despiece por tabla en JSON compacto para la seccionadora.
+
+        Estructura (medidas en mm):
+        {"format", "version", "project", "kerf",
+         "materials": [{"material", "board": [alto, ancho], "grain",
+                        "parts": [[id, largo, ancho, cantidad, "descripción"], ...],
+                        "boards": [[[id, x, y, girada], ...], ...],
+                        "unplaced": [[id, cantidad], ...]}]}
+        Las tablas se serializan de a una, sin armar el documento completo en memoria.
+        """
+        materials_dict = MaterialCatalog.coerce(materials_db)
+        kerf = cutting_service.get('kerf_mm', NestingService.DEFAULT_KERF_MM)
+        counts: Dict[str, Dict[Tuple[float, float, str], int]] = {}
+        for piece in CutListService.iter_pieces(project_data):
+            # Agrupadas por medida y descripción: el nesting no necesita cada fila por separado
+            parts = counts.setdefault(piece['material'], {})
+            key = (float(piece['largo_mm']), float(piece['ancho_mm']), piece['descripcion'])
+            parts[key] = parts.get(key, 0) + 1
+        grouped_by_material = {
+            material: [(largo, ancho, count, label) for (largo, ancho, label), count in parts.items()]
+            for material, parts in counts.items()
+        }
+        layouts = NestingService.nest_materials(
+            grouped_by_material, materials_dict, kerf, heuristic, nesting_workers
+        )
+
+        dumps = json.dumps
+        header = {
+            'format': CutListService.LAYOUT_FORMAT,
+            'version': CutListService.LAYOUT_VERSION,
+            'project': project_name if project_name is not None else project_data.get('name', ''),
+            'kerf': CutListService._number(kerf),
+        }
+        yield dumps(header, ensure_ascii=False, separators=(',', ':'))[:-1] + ',"materials":['
+
+        for material_index, material_key in enumerate(layouts):
+            layout = layouts[material_key]
+            part_ids: Dict[Tuple[float, float, str], int] = {}
+            parts = []
+            for largo, ancho, quantity, label in grouped_by_material[material_key]:
+                part_ids[(largo, ancho, label)] = len(parts) + 1
+                parts.append([len(parts) + 1, CutListService._number(largo), CutListService._number(ancho), quantity, label])
+
+            prefix = ',' if material_index else ''
+            yield prefix + dumps({
+                'material': material_key,
+                'board': [CutListService._number(layout['board_height_mm']), CutListService._number(layout['board_width_mm'])],
+                'grain': bool(materials_dict[material_key].get('grain', False)),
+                'parts': parts,
+            }, ensure_ascii=False, separators=(',', ':'))[:-1] + ',"boards":['
+
+            for board_index, board in enumerate(layout['boards']):
+                yield (',' if board_index else '') + dumps([
+                    [
+                        part_ids[(placement['largo_mm'], placement['ancho_mm'], placement['descripcion'])],
+                        CutListService._number(placement['x_mm']),
+                        CutListService._number(placement['y_mm']),
+                        1 if placement['girada'] else 0,
+                    ]
+                    for placement in board['placements']
+                ], separators=(',', ':'))
+
+            unplaced_counts: Dict[int, int] = {}
+            for piece in layout['unplaced']:
+                part_id = part_ids[(piece['largo_mm'], piece['ancho_mm'], piece['descripcion'])]
+                unplaced_counts[part_id] = unplaced_counts.get(part_id, 0) + 1
+            yield '],"unplaced":' + dumps(sorted(unplaced_counts.items()), separators=(',', ':')) + '}'
+
+        yield ']}'
+
+    # ---------- Archivos ----------
+
+    @staticmethod
+    def write_chunks(chunks: Iterable[str], stream) -> int:
+        """Escribe fragmentos de texto en un archivo de texto o binario; devuelve los bytes escritos."""
+        written = 0
+        binary = not isinstance(stream, io.TextIOBase)
+        for chunk in chunks:
+            data = chunk.encode('utf-8') if binary else chunk
+            stream.write(data)
+            written += len(data)
+        return written
+
+    @staticmethod
+    def write_csv(project_data: Dict, stream) -> int:
+        """Escribe el CSV en `stream` por fragmentos (trabajos grandes y CLI); devuelve los bytes escritos."""
+        return CutListService.write_chunks(CutListService.iter_csv(project_data), stream)
+
+    @staticmethod
+    def write_layout_json(project_data: Dict,
+                          materials_db: Union[MaterialCatalog, List[Dict]],
+                          cutting_service: Dict,
+                          stream,
+                          project_name: Optional[str] = None,
+                          nesting_workers: Optional[int] = None) -> int:
+        """Escribe el despiece JSON en `stream` tabla por tabla (trabajos grandes y CLI)."""
+        return CutListService.write_chunks(
+            CutListService.iter_layout_json(
+                project_data, materials_db, cutting_service, project_name, nesting_workers=nesting_workers
+            ),
+            stream,
+        )
+
+    # ---------- Descargas de la interfaz ----------
+
+    @staticmethod
+    def to_bytes(chunks: Iterable[str]) -> bytes:
+        """Une los fragmentos en bytes UTF-8 (lo que acepta `st.download_button`)."""
+        buffer = io.BytesIO()
+        CutListService.write_chunks(chunks, buffer)
+        return buffer.getvalue()
+
+    @staticmethod
+    def csv_download_bytes(project_data: Dict) -> bytes:
+        """
+        CSV completo en memoria, solo para `st.download_button` (que necesita el archivo
+        entero). Para trabajos grandes o la CLI usar `write_csv` / `iter_csv`.
+        """
+        return CutListService.to_bytes(CutListService.iter_csv(project_data))
+
+    @staticmethod
+    def layout_json_download_bytes(project_data: Dict,
+                                   materials_db: Union[MaterialCatalog, List[Dict]],
+                                   cutting_service: Dict,
+                                   project_name: Optional[str] = None) -> bytes:
+        """
+        Despiece JSON completo en memoria, solo para `st.download_button`. Para trabajos
+        grandes o la CLI usar `write_layout_json` / `iter_layout_json`.
+        """
+        return CutListService.to_bytes(
+            CutListService.iter_layout_json(project_data, materials_db, cutting_service, project_name)
+        )
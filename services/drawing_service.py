@@ -0,0 +1,853 @@
+import hashlib
+import json
+import math
+import threading
+from io import BytesIO
+from typing import Callable, Dict, List, Optional, Tuple, Union
+from xml.sax.saxutils import escape
+
+import matplotlib.patches as patches
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.colors import to_hex, to_rgba
+from matplotlib.figure import Figure
+from matplotlib.patches import Polygon
+from reportlab.graphics.shapes import Drawing, Group, Line, PolyLine, String, mmult, rotate, scale, translate
+from reportlab.graphics.shapes import Polygon as RLPolygon
+from reportlab.lib import colors as rl_colors
+
+from services.byte_lru_cache import ByteLRUCache
+
+
+def draw_dimension_labels(ax, x, y, width, height, depth, dx, dy):
+    """Imprime medidas sobre el lado correspondiente del módulo."""
+    dim_style = dict(fontsize=8, color='#1B263B', fontweight='bold')
+
+    # Ancho en el frente inferior (más separado del dibujo)
+    ax.annotate('', xy=(x, y - 68), xytext=(x + width, y - 68),
+                arrowprops=dict(arrowstyle='<->', color='#1B263B', lw=1))
+    ax.text(x + width / 2, y - 82, f"A {int(width)} mm", ha='center', va='top', **dim_style)
+
+    # Alto en lateral izquierdo (más separado)
+    ax.annotate('', xy=(x - 68, y), xytext=(x - 68, y + height),
+                arrowprops=dict(arrowstyle='<->', color='#1B263B', lw=1))
+    ax.text(x - 84, y + height / 2, f"H {int(height)} mm", ha='right', va='center', rotation=90, **dim_style)
+
+    # Profundidad desplazada fuera de la arista para no ensuciar
+    ax.annotate('', xy=(x + width + 14, y + height + 14), xytext=(x + width + dx + 22, y + height + dy + 22),
+                arrowprops=dict(arrowstyle='<->', color='#1B263B', lw=1))
+    ax.text(x + width + (dx / 2) + 30, y + height + (dy / 2) + 28, f"P {int(depth)} mm",
+            ha='left', va='bottom', rotation=25, **dim_style)
+
+
+def prepare_grouped_items(items, default_name):
+    """Prepara piezas agrupadas por item: cantidad apilada, items distintos en columnas."""
+    grouped = []
+    for idx, item in enumerate(items):
+        grouped.append({
+            'nombre': item.get('nombre') or f"{default_name} {idx + 1}",
+            'ancho_mm': item.get('ancho_mm', 0),
+            'profundo_mm': item.get('profundo_mm', 0),
+            'cantidad': max(1, int(item.get('cantidad', 1)))
+        })
+    return grouped
+
+
+def draw_isometric_box(ax, x, y, width, height, depth, face_color='#ADD8E6', side_color='#8FB8D8', top_color='#C6E2F5'):
+    """Dibuja una caja en vista isométrica"""
+    dx = depth * 0.45
+    dy = depth * 0.3
+
+    front = Polygon(
+        [(x, y), (x + width, y), (x + width, y + height), (x, y + height)],
+        closed=True,
+        facecolor=face_color,
+        edgecolor='black',
+        linewidth=1.5,
+        alpha=0.8
+    )
+    side = Polygon(
+        [
+            (x + width, y),
+            (x + width + dx, y + dy),
+            (x + width + dx, y + height + dy),
+            (x + width, y + height),
+        ],
+        closed=True,
+        facecolor=side_color,
+        edgecolor='black',
+        linewidth=1.2,
+        alpha=0.8
+    )
+    top = Polygon(
+        [
+            (x, y + height),
+            (x + width, y + height),
+            (x + width + dx, y + height + dy),
+            (x + dx, y + height + dy),
+        ],
+        closed=True,
+        facecolor=top_color,
+        edgecolor='black',
+        linewidth=1.2,
+        alpha=0.8
+    )
+
+    ax.add_patch(front)
+    ax.add_patch(side)
+    ax.add_patch(top)
+
+    return dx, dy
+
+
+def format_dimensions(ancho_mm, alto_mm=None, profundo_mm=None):
+    """Formatea dimensiones de forma consistente para todas las vistas."""
+    if alto_mm is not None and profundo_mm is not None:
+        return f"A {int(ancho_mm)} × H {int(alto_mm)} × P {int(profundo_mm)} mm"
+    if alto_mm is not None:
+        return f"A {int(ancho_mm)} × H {int(alto_mm)} mm"
+    if profundo_mm is not None:
+        return f"A {int(ancho_mm)} × P {int(profundo_mm)} mm"
+    return f"A {int(ancho_mm)} mm"
+
+
+def draw_module_structure(ax, x, y, width, height, depth, has_back=False, door_count=0):
+    """Dibuja un módulo como estructura de 4 maderas, con fondo/puertas opcionales."""
+    dx = depth * 0.35
+    dy = depth * 0.22
+    board_thickness = max(25, min(width, height) * 0.04)
+
+    board_color = '#C49A6C'
+    edge_color = '#5D4037'
+
+    # Estructura frontal (4 maderas)
+    ax.add_patch(patches.Rectangle((x, y), board_thickness, height, facecolor=board_color, edgecolor=edge_color, linewidth=1.2))
+    ax.add_patch(patches.Rectangle((x + width - board_thickness, y), board_thickness, height, facecolor=board_color, edgecolor=edge_color, linewidth=1.2))
+    ax.add_patch(patches.Rectangle((x, y + height - board_thickness), width, board_thickness, facecolor=board_color, edgecolor=edge_color, linewidth=1.2))
+    ax.add_patch(patches.Rectangle((x, y), width, board_thickness, facecolor=board_color, edgecolor=edge_color, linewidth=1.2))
+
+    # Aristas de profundidad para dar forma de cubo
+    ax.plot([x, x + dx], [y + height, y + height + dy], color=edge_color, linewidth=1)
+    ax.plot([x + width, x + width + dx], [y + height, y + height + dy], color=edge_color, linewidth=1)
+    ax.plot([x + width, x + width + dx], [y, y + dy], color=edge_color, linewidth=1)
+
+    ax.plot([x + dx, x + width + dx], [y + height + dy, y + height + dy], color=edge_color, linewidth=1)
+    ax.plot([x + width + dx, x + width + dx], [y + dy, y + height + dy], color=edge_color, linewidth=1)
+    ax.plot([x + width, x + width + dx], [y, y + dy], color=edge_color, linewidth=1)
+
+    # Fondo (cara trasera tapada)
+    if has_back:
+        back = Polygon(
+            [
+                (x + dx, y + dy),
+                (x + width + dx, y + dy),
+                (x + width + dx, y + height + dy),
+                (x + dx, y + height + dy),
+            ],
+            closed=True,
+            facecolor='#E8D3B0',
+            edgecolor=edge_color,
+            linewidth=1,
+            alpha=0.55
+        )
+        ax.add_patch(back)
+
+    # Puertas (cara frontal tapada)
+    if door_count > 0:
+        if door_count >= 2:
+            mid_x = x + width / 2
+            ax.add_patch(patches.Rectangle((x, y), width / 2, height, facecolor='#DCEEFF', edgecolor='#3E6480', linewidth=1, alpha=0.45))
+            ax.add_patch(patches.Rectangle((mid_x, y), width / 2, height, facecolor='#DCEEFF', edgecolor='#3E6480', linewidth=1, alpha=0.45))
+            ax.plot([mid_x, mid_x], [y, y + height], color='#3E6480', linewidth=1.5)
+        else:
+            ax.add_patch(patches.Rectangle((x, y), width, height, facecolor='#DCEEFF', edgecolor='#3E6480', linewidth=1.2, alpha=0.45))
+
+    return dx, dy
+
+
+def draw_module_drawers(ax, x, y, width, height, drawer_qty):
+    """Dibuja cajones en el frente del módulo cuando corresponda."""
+    if drawer_qty <= 0:
+        return
+
+    qty = max(1, int(drawer_qty))
+    usable_height = height * 0.86
+    start_y = y + (height - usable_height) / 2
+    drawer_height = usable_height / qty
+    side_margin = max(16, width * 0.06)
+    front_width = max(40, width - (2 * side_margin))
+
+    for index in range(qty):
+        drawer_y = start_y + (index * drawer_height) + (drawer_height * 0.08)
+        front_height = drawer_height * 0.76
+
+        ax.add_patch(
+            patches.Rectangle(
+                (x + side_margin, drawer_y),
+                front_width,
+                front_height,
+                facecolor='#F8E7D2',
+                edgecolor='#7A4E2F',
+                linewidth=1.2,
+                alpha=0.9
+            )
+        )
+
+        handle_w = min(80, front_width * 0.24)
+        handle_h = max(4, front_height * 0.08)
+        handle_x = x + side_margin + (front_width - handle_w) / 2
+        handle_y = drawer_y + (front_height - handle_h) / 2
+        ax.add_patch(
+            patches.Rectangle(
+                (handle_x, handle_y),
+                handle_w,
+                handle_h,
+                facecolor='#4B5563',
+                edgecolor='#374151',
+                linewidth=0.8,
+                alpha=0.95
+            )
+        )
+
+
+_SVG_FONT_FAMILY = "DejaVu Sans, Verdana, Arial, sans-serif"
+# Desplazamiento de la línea base según la alineación vertical de matplotlib (en fracciones del tamaño)
+_BASELINE_SHIFT = {'top': 0.76, 'center': 0.36, 'center_baseline': 0.0, 'baseline': 0.0, 'bottom': -0.22}
+_TEXT_ANCHOR = {'left': 'start', 'center': 'middle', 'right': 'end'}
+_ZORDER = {'polygon': 1, 'polyline': 2, 'arrow': 3}
+# Parámetros de subplot por defecto de matplotlib: el área de los ejes dentro de la figura
+_AXES_FRACTION = (0.9 - 0.125, 0.88 - 0.11)
+
+
+class _VectorAxes:
+    """
+    Eje mínimo compatible con las funciones de dibujo (`add_patch`, `plot`, `text`,
+    `annotate`, límites y `axis('off')`) que genera SVG o un dibujo de ReportLab.
+
+    Reproduce la escala de una figura de matplotlib con aspecto 'equal' del mismo
+    tamaño, así que las fuentes y los grosores de línea se expresan en puntos igual
+    que en matplotlib. No usa pyplot ni estado global: cada llamada tiene su instancia.
+    """
+
+    def __init__(self, figsize: Tuple[float, float]):
+        self.figsize = figsize
+        self.xlim = (0.0, 1.0)
+        self.ylim = (0.0, 1.0)
+        # Elementos en coordenadas de datos; se convierten al escribir, cuando ya se conocen los límites
+        self._shapes: List[Tuple] = []
+        self._texts: List[Tuple] = []
+
+    # ---------- API de matplotlib usada por las funciones de dibujo ----------
+
+    def add_patch(self, patch):
+        if isinstance(patch, patches.Rectangle):
+            x, y = patch.get_xy()
+            width, height = patch.get_width(), patch.get_height()
+            points = [(x, y), (x + width, y), (x + width, y + height), (x, y + height)]
+        else:
+            points = [tuple(point) for point in patch.get_xy()]
+        self._shapes.append((
+            'polygon', points, patch.get_facecolor(), patch.get_edgecolor(), patch.get_linewidth(), None,
+        ))
+        return patch
+
+    def plot(self, xs, ys, color='black', linewidth=1.5, linestyle='-', **kwargs):
+        self._shapes.append((
+            'polyline', list(zip(xs, ys)), None, to_rgba(color), linewidth, linestyle,
+        ))
+
+    def text(self, x, y, label, ha='left', va='baseline', fontsize=10, color='black',
+             fontweight='normal', rotation=0, **kwargs):
+        self._texts.append((x, y, str(label), ha, va, fontsize, to_rgba(color), fontweight, rotation))
+
+    def annotate(self, label, xy, xytext, arrowprops=None, **kwargs):
+        if label:
+            self.text(xytext[0], xytext[1], label, **kwargs)
+        if arrowprops:
+            self._shapes.append((
+                'arrow', [tuple(xytext), tuple(xy)], None, to_rgba(arrowprops.get('color', 'black')),
+                arrowprops.get('lw', arrowprops.get('linewidth', 1.0)), arrowprops.get('arrowstyle', '->'),
+            ))
+
+    def set_xlim(self, left, right):
+        self.xlim = (left, right)
+
+    def set_ylim(self, bottom, top):
+        self.ylim = (bottom, top)
+
+    def get_xlim(self) -> Tuple[float, float]:
+        return self.xlim
+
+    def get_ylim(self) -> Tuple[float, float]:
+        return self.ylim
+
+    def set_aspect(self, aspect):
+        pass
+
+    def axis(self, option):
+        pass
+
+    # ---------- Maquetación en puntos ----------
+
+    def _scale(self) -> float:
+        """Puntos por unidad de datos, como en una figura de matplotlib de `figsize` con aspecto 'equal'."""
+        data_width = max(self.xlim[1] - self.xlim[0], 1e-9)
+        data_height = max(self.ylim[1] - self.ylim[0], 1e-9)
+        return 72.0 * min(self.figsize[0] * _AXES_FRACTION[0] / data_width,
+                          self.figsize[1] * _AXES_FRACTION[1] / data_height)
+
+    def _layout(self) -> Tuple[List[Tuple], List[Tuple], Tuple[float, float, float, float]]:
+        """
+        Primitivas en puntos (y hacia abajo, origen en la esquina superior izquierda de
+        los ejes) y su recuadro (min_x, min_y, max_x, max_y).
+        """
+        scale = self._scale()
+        x0, y1 = self.xlim[0], self.ylim[1]
+
+        def point(x, y):
+            return (x - x0) * scale, (y1 - y) * scale
+
+        primitives = []
+        # Recuadro visible: los límites de los ejes, ampliados con los textos (como bbox_inches='tight')
+        min_x, min_y = 0.0, 0.0
+        max_x, max_y = (self.xlim[1] - x0) * scale, (y1 - self.ylim[0]) * scale
+
+        # Mismo orden que matplotlib: parches (zorder 1), líneas (2) y anotaciones (3); textos al final
+        for kind, points, face, edge, linewidth, style in sorted(self._shapes, key=lambda shape: _ZORDER[shape[0]]):
+            coords = [point(x, y) for x, y in points]
+            if kind == 'polygon':
+                primitives.append(('polygon', coords, face, edge, linewidth, None))
+                continue
+            if kind == 'polyline':
+                dash = (3.7 * linewidth, 1.6 * linewidth) if style in ('--', 'dashed') else None
+                primitives.append(('polyline', coords, None, edge, linewidth, dash))
+                continue
+            # Flecha de cota: línea con cabezas abiertas en los extremos que indique el estilo
+            (start_x, start_y), (end_x, end_y) = coords
+            length = math.hypot(end_x - start_x, end_y - start_y) or 1.0
+            ux, uy = (end_x - start_x) / length, (end_y - start_y) / length
+            # matplotlib recorta 2 pt en cada extremo (shrinkA/shrinkB)
+            start_x, start_y, end_x, end_y = start_x + 2 * ux, start_y + 2 * uy, end_x - 2 * ux, end_y - 2 * uy
+            primitives.append(('line', [(start_x, start_y), (end_x, end_y)], None, edge, linewidth, None))
+            heads = []
+            if style.startswith('<'):
+                heads.append((start_x, start_y, ux, uy))
+            if style.endswith('>'):
+                heads.append((end_x, end_y, -ux, -uy))
+            for hx, hy, dx_, dy_ in heads:
+                # Cabeza de 4 pt de largo y 2 pt de semiancho (mutation_scale 10 de annotate)
+                left = (hx + 4 * dx_ - 2 * dy_, hy + 4 * dy_ + 2 * dx_)
+                right = (hx + 4 * dx_ + 2 * dy_, hy + 4 * dy_ - 2 * dx_)
+                primitives.append(('polyline', [left, (hx, hy), right], None, edge, linewidth, None))
+
+        texts = []
+        for x, y, label, ha, va, size, color, weight, rotation in self._texts:
+            tx, ty = point(x, y)
+            anchor = _TEXT_ANCHOR.get(ha, 'start')
+            shift = _BASELINE_SHIFT.get(va, 0.0) * size
+            texts.append((tx, ty, label, anchor, shift, size, color, weight == 'bold', rotation))
+            # Extensión aproximada del texto (0,6 em por carácter) para el recuadro
+            width = 0.6 * size * len(label)
+            start = {'start': 0.0, 'middle': -width / 2, 'end': -width}[anchor]
+            top = shift - 0.8 * size
+            angle = math.radians(-rotation)
+            cos_a, sin_a = math.cos(angle), math.sin(angle)
+            for cx, cy in ((start, top), (start + width, top), (start, shift + 0.25 * size), (start + width, shift + 0.25 * size)):
+                px, py = tx + cx * cos_a - cy * sin_a, ty + cx * sin_a + cy * cos_a
+                min_x, max_x = min(min_x, px), max(max_x, px)
+                min_y, max_y = min(min_y, py), max(max_y, py)
+
+        pad = 7.2  # 0,1 pulgadas, el margen de bbox_inches='tight'
+        return primitives, texts, (min_x - pad, min_y - pad, max_x + pad, max_y + pad)
+
+    # ---------- SVG ----------
+
+    @staticmethod
+    def _paint(attribute: str, rgba) -> str:
+        if rgba is None or rgba[3] == 0:
+            return f'{attribute}="none"'
+        paint = f'{attribute}="{to_hex(rgba[:3])}"'
+        if rgba[3] < 1:
+            paint += f' {attribute}-opacity="{rgba[3]:.3g}"'
+        return paint
+
+    def to_svg(self) -> bytes:
+        primitives, texts, (min_x, min_y, max_x, max_y) = self._layout()
+        body = []
+        for kind, coords, face, edge, linewidth, dash in primitives:
+            stroke = f'{self._paint("stroke", edge)} stroke-width="{linewidth:.3g}"'
+            if kind == 'line':
+                (start_x, start_y), (end_x, end_y) = coords
+                body.append(
+                    f'<line x1="{start_x:.2f}" y1="{start_y:.2f}" x2="{end_x:.2f}" y2="{end_y:.2f}" fill="none" {stroke}/>'
+                )
+                continue
+            path = ' '.join(f'{x:.2f},{y:.2f}' for x, y in coords)
+            if kind == 'polygon':
+                body.append(f'<polygon points="{path}" {self._paint("fill", face)} {stroke} stroke-linejoin="miter"/>')
+            else:
+                dash_attr = f' stroke-dasharray="{dash[0]:.2f},{dash[1]:.2f}"' if dash else ''
+                body.append(f'<polyline points="{path}" fill="none" {stroke}{dash_attr} stroke-linecap="butt"/>')
+
+        for tx, ty, label, anchor, shift, size, color, bold, rotation in texts:
+            weight_attr = ' font-weight="bold"' if bold else ''
+            body.append(
+                f'<text transform="translate({tx:.2f},{ty:.2f}) rotate({-rotation:.3g})" y="{shift:.2f}" '
+                f'font-size="{size:.3g}" text-anchor="{anchor}"{weight_attr} {self._paint("fill", color)}>'
+                f'{escape(label)}</text>'
+            )
+
+        width, height = max_x - min_x, max_y - min_y
+        header = (
+            f'<svg xmlns="http://www.w3.org/2000/svg" width="{width:.2f}pt" height="{height:.2f}pt" '
+            f'viewBox="{min_x:.2f} {min_y:.2f} {width:.2f} {height:.2f}" font-family="{_SVG_FONT_FAMILY}">'
+        )
+        return '\n'.join([header, *body, '</svg>']).encode('utf-8')
+
+    # ---------- ReportLab ----------
+
+    @staticmethod
+    def _rl_color(rgba):
+        if rgba is None or rgba[3] == 0:
+            return None
+        return rl_colors.Color(rgba[0], rgba[1], rgba[2], alpha=rgba[3])
+
+    def to_drawing(self, max_width: Optional[float] = None, max_height: Optional[float] = None) -> Drawing:
+        """Dibujo vectorial de ReportLab (para el PDF), reducido si supera `max_width`/`max_height` puntos."""
+        primitives, texts, (min_x, min_y, max_x, max_y) = self._layout()
+        width, height = max_x - min_x, max_y - min_y
+
+        def flip(coords):
+            # ReportLab tiene la y hacia arriba y el origen abajo a la izquierda
+            flat = []
+            for x, y in coords:
+                flat.extend((x - min_x, max_y - y))
+            return flat
+
+        content = Group()
+        for kind, coords, face, edge, linewidth, dash in primitives:
+            stroke = self._rl_color(edge)
+            if kind == 'polygon':
+                content.add(RLPolygon(flip(coords), fillColor=self._rl_color(face), strokeColor=stroke,
+                                      strokeWidth=linewidth, strokeLineJoin=0))
+            elif kind == 'line':
+                x1, y1, x2, y2 = flip(coords)
+                content.add(Line(x1, y1, x2, y2, strokeColor=stroke, strokeWidth=linewidth))
+            else:
+                content.add(PolyLine(flip(coords), strokeColor=stroke, strokeWidth=linewidth,
+                                     strokeDashArray=list(dash) if dash else None))
+
+        for tx, ty, label, anchor, shift, size, color, bold, rotation in texts:
+            content.add(Group(
+                String(0, -shift, label, fontName='Helvetica-Bold' if bold else 'Helvetica',
+                       fontSize=size, fillColor=self._rl_color(color), textAnchor=anchor),
+                transform=mmult(translate(tx - min_x, max_y - ty), rotate(rotation)),
+            ))
+
+        factor = 1.0
+        if max_width:
+            factor = min(factor, max_width / width)
+        if max_height:
+            factor = min(factor, max_height / height)
+        if factor < 1.0:
+            content.transform = scale(factor, factor)
+        drawing = Drawing(width * factor, height * factor)
+        drawing.add(content)
+        return drawing
+
+
+class DrawingService:
+    """
+    Dibujos de la vista gráfica (módulos, estantes y maderas).
+
+    Cada figura se guarda como imagen (PNG o SVG) en una caché LRU compartida,
+    indexada por un hash de los campos que intervienen en el dibujo: en cada
+    rerun solo se vuelven a dibujar los módulos que cambiaron.
+
+    El SVG se escribe directamente a partir de las mismas funciones de dibujo
+    (`_VectorAxes`), sin matplotlib de por medio; el PNG usa la API de objetos de
+    matplotlib (Figure + Agg), no pyplot. Los dos se pueden llamar desde varios hilos.
+    """
+
+    # Presupuesto de memoria de la caché de imágenes (compartida por todas las sesiones)
+    RENDER_CACHE_MAX_BYTES = 24 * 1024 * 1024
+    # Resolución de los PNG (la misma que usaba st.pyplot)
+    RENDER_DPI = 200
+    # Se incrementa al cambiar el dibujo para no servir imágenes viejas de la caché
+    RENDER_VERSION = 2
+    # Campos del módulo que intervienen en su dibujo
+    MODULE_DRAWING_FIELDS = (
+        'alto_mm', 'ancho_mm', 'profundo_mm', 'tiene_fondo', 'tiene_puertas',
+        'cantidad_puertas', 'cantidad_estantes', 'cantidad_divisiones',
+    )
+    # Alzado del proyecto: separación entre piezas (mm) y ancho de figura por mm de dibujo,
+    # acotado para que un proyecto chico no quede enorme ni uno largo ilegible
+    ELEVATION_GAP_MM = 380
+    ELEVATION_INCHES_PER_MM = 7 / 2200
+    ELEVATION_WIDTH_RANGE_IN = (7.0, 24.0)
+
+    @staticmethod
+    def _hash(kind: str, fmt: str, content) -> str:
+        payload = json.dumps(
+            [kind, fmt, DrawingService.RENDER_VERSION, content],
+            sort_keys=True, default=str, ensure_ascii=False,
+        )
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def module_label(module: Dict, index: int) -> str:
+        return module.get('nombre', f'Módulo {index + 1}')
+
+    @staticmethod
+    def module_drawing_key(module: Dict, index: int = 0, fmt: str = 'png') -> str:
+        """Huella del dibujo de un módulo: medidas, puertas, fondo, estantes, divisiones, cajones y nombre."""
+        drawer_config = module.get('cajones') or {}
+        content = {field: module.get(field) for field in DrawingService.MODULE_DRAWING_FIELDS}
+        content['cajones'] = [drawer_config.get('enabled', False), drawer_config.get('cantidad_cajones', 0)]
+        content['nombre'] = DrawingService.module_label(module, index)
+        return DrawingService._hash('module', fmt, content)
+
+    @staticmethod
+    def grouped_drawing_key(kind: str, grouped: List[Dict], fmt: str = 'png') -> str:
+        """Huella del dibujo de estantes o maderas (ya agrupados con `prepare_grouped_items`)."""
+        return DrawingService._hash(kind, fmt, grouped)
+
+    @staticmethod
+    def project_elevation_key(project: Dict, fmt: str = 'svg') -> str:
+        """Huella del alzado completo: la de cada módulo (más su cantidad), estantes y maderas."""
+        content = {
+            'modules': [
+                [DrawingService.module_drawing_key(module, idx, fmt), module.get('cantidad_modulos', 1)]
+                for idx, module in enumerate(project.get('modules') or [])
+            ],
+            'shelves': prepare_grouped_items(project.get('shelves') or [], 'Estante'),
+            'woods': prepare_grouped_items(project.get('woods') or [], 'Madera'),
+        }
+        return DrawingService._hash('elevation', fmt, content)
+
+    # ---------- Dibujo sobre un eje ----------
+
+    @staticmethod
+    def draw_module(ax, module: Dict, index: int = 0):
+        """Dibuja un módulo completo (estructura, medidas, estantes, divisiones y cajones)."""
+        alto = module.get('alto_mm', 2000)
+        ancho = module.get('ancho_mm', 1000)
+        profundo = module.get('profundo_mm', 400)
+
+        DrawingService.draw_module_at(ax, module, DrawingService.module_label(module, index))
+
+        ax.set_xlim(-140, ancho + (profundo * 0.35) + 140)
+        ax.set_ylim(-140, alto + (profundo * 0.35) + 120)
+        ax.set_aspect('equal')
+        ax.axis('off')
+
+    @staticmethod
+    def draw_module_at(ax, module: Dict, label: str, x: float = 0.0):
+        """Dibuja el módulo con su esquina inferior izquierda en (x, 0), sin tocar los límites del eje."""
+        alto = module.get('alto_mm', 2000)
+        ancho = module.get('ancho_mm', 1000)
+        profundo = module.get('profundo_mm', 400)
+
+        puertas = module.get('cantidad_puertas', 0) if module.get('tiene_puertas') else 0
+        dx, dy = draw_module_structure(
+            ax,
+            x,
+            0,
+            ancho,
+            alto,
+            profundo,
+            has_back=module.get('tiene_fondo', False),
+            door_count=puertas
+        )
+        draw_dimension_labels(ax, x, 0, ancho, alto, profundo, dx, dy)
+
+        estantes = module.get('cantidad_estantes', 0)
+        if estantes > 0:
+            spacing = alto / (estantes + 1)
+            for i in range(1, estantes + 1):
+                y_pos = i * spacing
+                ax.plot([x + 25, x + ancho - 25], [y_pos, y_pos], linestyle='--', color='#C62828', linewidth=1)
+
+        divisiones = module.get('cantidad_divisiones', 0)
+        if divisiones > 0:
+            spacing = ancho / (divisiones + 1)
+            for i in range(1, divisiones + 1):
+                x_pos = x + i * spacing
+                ax.plot([x_pos, x_pos], [25, alto - 25], linestyle='--', color='#2E7D32', linewidth=1)
+
+        drawer_config = module.get('cajones', {})
+        drawer_qty = int(drawer_config.get('cantidad_cajones', 0)) if drawer_config.get('enabled', False) else 0
+        if drawer_qty > 0:
+            draw_module_drawers(ax, x, 0, ancho, alto, drawer_qty)
+
+        ax.text(x + ancho / 2, alto + (profundo * 0.35) + 45, label, ha='center', va='bottom', fontsize=11, fontweight='bold', color='#0B132B')
+
+    @staticmethod
+    def shelves_figsize(shelves_grouped: List[Dict]) -> Tuple[float, float]:
+        max_qty = max([piece['cantidad'] for piece in shelves_grouped]) if shelves_grouped else 1
+        return max(8, min(16, len(shelves_grouped) * 2.4)), max(4.8, 3.8 + max_qty * 0.5)
+
+    @staticmethod
+    def draw_shelves(ax, shelves_grouped: List[Dict]):
+        """Estantes: cantidades del mismo item apiladas, items distintos en columnas."""
+        x_cursor, top = DrawingService.draw_shelf_groups(ax, shelves_grouped)
+
+        ax.set_xlim(-40, x_cursor)
+        ax.set_ylim(-72, top)
+        ax.set_aspect('equal')
+        ax.axis('off')
+
+    @staticmethod
+    def draw_shelf_groups(ax, shelves_grouped: List[Dict], x_start: float = 0.0) -> Tuple[float, float]:
+        """Dibuja los estantes desde `x_start`; devuelve la x final y la altura ocupada (con rótulos)."""
+        max_prof = max([piece['profundo_mm'] for piece in shelves_grouped]) if shelves_grouped else 300
+        max_qty = max([piece['cantidad'] for piece in shelves_grouped]) if shelves_grouped else 1
+
+        x_cursor = x_start
+        shelf_height = 45
+        stack_gap = 68
+
+        for piece in shelves_grouped:
+            ancho = piece.get('ancho_mm', 800)
+            profundo = piece.get('profundo_mm', 300)
+            nombre = piece.get('nombre', 'Estante')
+            qty = piece.get('cantidad', 1)
+            dx = profundo * 0.45
+
+            for level in range(qty):
+                y_pos = level * stack_gap
+                draw_isometric_box(
+                    ax,
+                    x_cursor,
+                    y_pos,
+                    ancho,
+                    shelf_height,
+                    profundo,
+                    face_color='wheat',
+                    side_color='#D2B48C',
+                    top_color='#F5DEB3'
+                )
+
+            top_y = (qty - 1) * stack_gap + shelf_height + (profundo * 0.30)
+            ax.text(x_cursor + ancho / 2, top_y + 30, nombre, ha='center', va='bottom', fontsize=8.5, fontweight='bold')
+            suffix = f" (x{qty})" if qty > 1 else ''
+            ax.text(x_cursor + ancho / 2, -34, f"{format_dimensions(ancho, profundo_mm=profundo)}{suffix}", ha='center', va='top', fontsize=7.5)
+            x_cursor += ancho + dx + max(120, ancho * 0.14)
+
+        return x_cursor, (max_qty - 1) * stack_gap + shelf_height + (max_prof * 0.42) + 95
+
+    @staticmethod
+    def woods_figsize(woods_grouped: List[Dict]) -> Tuple[float, float]:
+        max_qty = max([piece['cantidad'] for piece in woods_grouped]) if woods_grouped else 1
+        return max(8, min(16, len(woods_grouped) * 2.2)), max(4.0, 3.0 + max_qty * 0.45)
+
+    @staticmethod
+    def draw_woods(ax, woods_grouped: List[Dict]):
+        """Maderas: cantidades del mismo item apiladas, items distintos en columnas."""
+        x_cursor, top = DrawingService.draw_wood_groups(ax, woods_grouped)
+
+        ax.set_xlim(-40, x_cursor)
+        ax.set_ylim(-55, top)
+        ax.set_aspect('equal')
+        ax.axis('off')
+
+    @staticmethod
+    def draw_wood_groups(ax, woods_grouped: List[Dict], x_start: float = 0.0) -> Tuple[float, float]:
+        """Dibuja las maderas desde `x_start`; devuelve la x final y la altura ocupada (con rótulos)."""
+        max_qty = max([piece['cantidad'] for piece in woods_grouped]) if woods_grouped else 1
+
+        x_cursor = x_start
+        stack_gap = 58
+
+        for piece in woods_grouped:
+            ancho = piece.get('ancho_mm', 500)
+            alto = piece.get('profundo_mm', 200)
+            nombre = piece.get('nombre', 'Madera')
+            qty = piece.get('cantidad', 1)
+
+            for level in range(qty):
+                y_pos = level * stack_gap
+                rect = patches.Rectangle(
+                    (x_cursor, y_pos),
+                    ancho,
+                    alto,
+                    linewidth=1.2,
+                    edgecolor='saddlebrown',
+                    facecolor='burlywood',
+                    alpha=0.75
+                )
+                ax.add_patch(rect)
+
+            top_y = (qty - 1) * stack_gap + alto
+            ax.text(x_cursor + ancho / 2, top_y + 22, nombre, ha='center', va='bottom', fontsize=8.5, fontweight='bold')
+            suffix = f" (x{qty})" if qty > 1 else ''
+            ax.text(x_cursor + ancho / 2, -24, f"{format_dimensions(ancho, alto_mm=alto)}{suffix}", ha='center', va='top', fontsize=7.5)
+            x_cursor += ancho + max(120, ancho * 0.16)
+
+        max_alto = max([piece.get('profundo_mm', 200) for piece in woods_grouped]) if woods_grouped else 200
+        return x_cursor, (max_qty - 1) * stack_gap + max_alto + 70
+
+    @staticmethod
+    def has_drawing(project: Dict) -> bool:
+        return bool(project.get('modules') or project.get('shelves') or project.get('woods'))
+
+    @staticmethod
+    def draw_project_elevation(ax, project: Dict):
+        """
+        Alzado de todo el proyecto en un solo eje: los módulos en fila, como un frente
+        de pared, seguidos de los estantes y las maderas, todo a la misma escala.
+        """
+        gap = DrawingService.ELEVATION_GAP_MM
+        x_cursor = 0.0
+        top = 0.0
+        bottom = -72
+
+        modules = project.get('modules') or []
+        front_mm = 0
+        for idx, module in enumerate(modules):
+            ancho = module.get('ancho_mm', 1000)
+            alto = module.get('alto_mm', 2000)
+            profundo = module.get('profundo_mm', 400)
+            qty = max(1, int(module.get('cantidad_modulos', 1)))
+            label = DrawingService.module_label(module, idx)
+            if qty > 1:
+                label = f"{label} (x{qty})"
+            DrawingService.draw_module_at(ax, module, label, x_cursor)
+            front_mm += ancho * qty
+            top = max(top, alto + (profundo * 0.35) + 120)
+            x_cursor += ancho + (profundo * 0.35) + gap
+        if modules:
+            ax.text(0, -150, f"Frente total: {int(front_mm)} mm", ha='left', va='top', fontsize=9, fontweight='bold', color='#1B263B')
+            bottom = -210
+
+        shelves = project.get('shelves') or []
+        if shelves:
+            x_cursor, shelves_top = DrawingService.draw_shelf_groups(ax, prepare_grouped_items(shelves, 'Estante'), x_cursor)
+            top = max(top, shelves_top)
+            x_cursor += gap / 2
+
+        woods = project.get('woods') or []
+        if woods:
+            x_cursor, woods_top = DrawingService.draw_wood_groups(ax, prepare_grouped_items(woods, 'Madera'), x_cursor)
+            top = max(top, woods_top)
+
+        ax.set_xlim(-140, max(x_cursor, 1.0))
+        ax.set_ylim(bottom, max(top, 1.0))
+        ax.set_aspect('equal')
+        ax.axis('off')
+
+    @staticmethod
+    def elevation_figsize(xlim: Tuple[float, float], ylim: Tuple[float, float]) -> Tuple[float, float]:
+        """Tamaño de figura proporcional al largo del alzado, con el alto que pide el aspecto 'equal'."""
+        data_width = max(xlim[1] - xlim[0], 1.0)
+        data_height = max(ylim[1] - ylim[0], 1.0)
+        low, high = DrawingService.ELEVATION_WIDTH_RANGE_IN
+        width = min(high, max(low, data_width * DrawingService.ELEVATION_INCHES_PER_MM))
+        height = width * _AXES_FRACTION[0] / data_width * data_height / _AXES_FRACTION[1]
+        return width, height
+
+    # ---------- Imágenes con caché ----------
+
+    @staticmethod
+    def render_svg(figsize: Union[Tuple[float, float], Callable], draw: Callable) -> bytes:
+        """
+        Dibuja con `draw(ax)` y devuelve el SVG, sin pasar por matplotlib.
+
+        `figsize` puede ser una función de los límites del eje, para figuras cuyo
+        tamaño solo se conoce después de dibujar (el alzado del proyecto).
+        """
+        ax = _VectorAxes((1.0, 1.0) if callable(figsize) else figsize)
+        draw(ax)
+        if callable(figsize):
+            ax.figsize = figsize(ax.get_xlim(), ax.get_ylim())
+        return ax.to_svg()
+
+    @staticmethod
+    def render_agg(figsize: Union[Tuple[float, float], Callable], draw: Callable, fmt: str = 'png') -> bytes:
+        """Dibuja con `draw(ax)` en una Figure propia (sin pyplot) y la guarda en `fmt`."""
+        # Las fuentes FreeType que cachea matplotlib no admiten uso concurrente
+        with _agg_lock:
+            fig = Figure(figsize=(1.0, 1.0) if callable(figsize) else figsize)
+            FigureCanvasAgg(fig)
+            ax = fig.add_subplot()
+            draw(ax)
+            if callable(figsize):
+                fig.set_size_inches(figsize(ax.get_xlim(), ax.get_ylim()))
+            output = BytesIO()
+            fig.savefig(output, format=fmt, dpi=DrawingService.RENDER_DPI, bbox_inches='tight')
+        return output.getvalue()
+
+    @staticmethod
+    def _render(cache_key: str, figsize: Union[Tuple[float, float], Callable], draw: Callable, fmt: str) -> bytes:
+        data = _render_cache.get(cache_key)
+        if data is not None:
+            return data
+        if fmt == 'svg':
+            data = DrawingService.render_svg(figsize, draw)
+        else:
+            data = DrawingService.render_agg(figsize, draw, fmt)
+        _render_cache.put(cache_key, data)
+        return data
+
+    @staticmethod
+    def render_module(module: Dict, index: int = 0, fmt: str = 'png') -> bytes:
+        """Imagen ('png' o 'svg') de un módulo; se dibuja solo si cambió desde la última vez."""
+        return DrawingService._render(
+            DrawingService.module_drawing_key(module, index, fmt),
+            (7, 4.8),
+            lambda ax: DrawingService.draw_module(ax, module, index),
+            fmt,
+        )
+
+    @staticmethod
+    def render_shelves(shelves: List[Dict], fmt: str = 'png') -> bytes:
+        """Imagen de los estantes independientes del proyecto."""
+        grouped = prepare_grouped_items(shelves, 'Estante')
+        return DrawingService._render(
+            DrawingService.grouped_drawing_key('shelves', grouped, fmt),
+            DrawingService.shelves_figsize(grouped),
+            lambda ax: DrawingService.draw_shelves(ax, grouped),
+            fmt,
+        )
+
+    @staticmethod
+    def render_woods(woods: List[Dict], fmt: str = 'png') -> bytes:
+        """Imagen de las maderas independientes del proyecto."""
+        grouped = prepare_grouped_items(woods, 'Madera')
+        return DrawingService._render(
+            DrawingService.grouped_drawing_key('woods', grouped, fmt),
+            DrawingService.woods_figsize(grouped),
+            lambda ax: DrawingService.draw_woods(ax, grouped),
+            fmt,
+        )
+
+    @staticmethod
+    def render_project_elevation(project: Dict, fmt: str = 'svg') -> Optional[bytes]:
+        """Imagen única con todo el proyecto (ver `draw_project_elevation`); None si no hay nada que dibujar."""
+        if not DrawingService.has_drawing(project):
+            return None
+        return DrawingService._render(
+            DrawingService.project_elevation_key(project, fmt),
+            DrawingService.elevation_figsize,
+            lambda ax: DrawingService.draw_project_elevation(ax, project),
+            fmt,
+        )
+
+    @staticmethod
+    def project_elevation_drawing(project: Dict,
+                                  max_width: Optional[float] = None,
+                                  max_height: Optional[float] = None) -> Optional[Drawing]:
+        """Alzado del proyecto como dibujo vectorial de ReportLab, para insertarlo en el PDF."""
+        if not DrawingService.has_drawing(project):
+            return None
+        ax = _VectorAxes((1.0, 1.0))
+        DrawingService.draw_project_elevation(ax, project)
+        ax.figsize = DrawingService.elevation_figsize(ax.get_xlim(), ax.get_ylim())
+        return ax.to_drawing(max_width, max_height)
+
+    @staticmethod
+    def clear_render_cache():
+        _render_cache.clear()
+
+
+_render_cache = ByteLRUCache(DrawingService.RENDER_CACHE_MAX_BYTES)
+_agg_lock = threading.Lock()
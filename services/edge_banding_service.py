@@ -0,0 +1,148 @@
+import re
+from functools import lru_cache
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+
+
+class EdgeBandingService:
+    """
+    Metros lineales de canto por material.
+
+    Cada tipo de pieza tiene una regla (lados largos, lados cortos) con canto; el
+    lado largo es `largo_mm` de la superficie y el corto `ancho_mm`. Las reglas por
+    defecto se pueden reemplazar por material con el campo `edge_banding`
+    ({"Puerta": [2, 2], "Fondo": [0, 0], ...}). El total se calcula en bloque con
+    NumPy y se agrupa por material con `np.bincount`.
+    """
+
+    # Tipo de pieza: (lados largos, lados cortos) con canto
+    DEFAULT_RULES: Dict[str, Tuple[int, int]] = {
+        'Lateral': (1, 0),
+        'Horizontal': (1, 0),
+        'Fondo': (0, 0),
+        'Puerta': (2, 2),
+        'Estante': (1, 0),
+        'División': (1, 0),
+        'Cajón frente/fondo': (1, 0),
+        'Cajón base': (0, 0),
+        'Cajón lateral': (0, 1),
+        'Estante independiente': (1, 0),
+        'Madera': (0, 0),
+    }
+    PIECE_TYPES = tuple(DEFAULT_RULES)
+
+    @staticmethod
+    def piece_type(description: str) -> str:
+        """Tipo de pieza a partir de la descripción de la superficie ('Cajón Magic base (x2)' -> 'Cajón base')."""
+        return _piece_type(description)
+
+    @staticmethod
+    def rules_for(material: Dict) -> Dict[str, Tuple[int, int]]:
+        """Reglas del material: las por defecto con lo configurado en `edge_banding` encima."""
+        rules = dict(EdgeBandingService.DEFAULT_RULES)
+        for piece_type, edges in (material.get('edge_banding') or {}).items():
+            try:
+                rules[piece_type] = (max(0, int(edges[0])), max(0, int(edges[1])))
+            except (TypeError, ValueError, IndexError):
+                continue
+        return rules
+
+    @staticmethod
+    def metres_by_material(materials: Sequence[str],
+                           piece_types: Sequence[str],
+                           largo_mm: Sequence[float],
+                           ancho_mm: Sequence[float],
+                           quantities: Sequence[int],
+                           materials_dict: Dict[str, Dict]) -> Dict[str, float]:
+        """
+        Metros de canto por material a partir de columnas (una fila por superficie).
+
+        Solo se cuentan materiales del catálogo, igual que el costo de corte.
+        """
+        material_codes: Dict[str, int] = {}
+        type_codes: Dict[str, int] = {}
+        material_index = [material_codes.setdefault(material, len(material_codes)) for material in materials]
+        type_index = [type_codes.setdefault(piece_type, len(type_codes)) for piece_type in piece_types]
+        return EdgeBandingService.metres_by_codes(
+            list(material_codes), material_index, list(type_codes), type_index,
+            largo_mm, ancho_mm, quantities, materials_dict
+        )
+
+    @staticmethod
+    def metres_by_codes(material_names: List[str],
+                        material_index: Sequence[int],
+                        type_names: List[str],
+                        type_index: Sequence[int],
+                        largo_mm: Sequence[float],
+                        ancho_mm: Sequence[float],
+                        quantities: Sequence[int],
+                        materials_dict: Dict[str, Dict]) -> Dict[str, float]:
+        """Igual que `metres_by_material` con materiales y tipos ya codificados como enteros."""
+        if len(material_index) == 0:
+            return {}
+
+        # Las reglas quedan en una tabla material × tipo de pieza
+        long_table = np.zeros((len(material_names), len(type_names)), dtype=np.float64)
+        short_table = np.zeros_like(long_table)
+        for material_code, material in enumerate(material_names):
+            mat = materials_dict.get(material)
+            if mat is None:
+                continue
+            rules = EdgeBandingService.rules_for(mat)
+            for type_code, piece_type in enumerate(type_names):
+                long_table[material_code, type_code], short_table[material_code, type_code] = rules.get(piece_type, (0, 0))
+
+        materials_array = np.asarray(material_index, dtype=np.intp)
+        types_array = np.asarray(type_index, dtype=np.intp)
+        long_edges = long_table[materials_array, types_array]
+        short_edges = short_table[materials_array, types_array]
+        metres = np.asarray(quantities, dtype=np.float64) * (
+            long_edges * np.asarray(largo_mm, dtype=np.float64)
+            + short_edges * np.asarray(ancho_mm, dtype=np.float64)
+        ) / 1000
+        sums = np.bincount(materials_array, weights=metres, minlength=len(material_names))
+        banded = np.bincount(materials_array, weights=(long_edges + short_edges) > 0, minlength=len(material_names))
+        return {
+            material: float(sums[code])
+            for code, material in enumerate(material_names)
+            if banded[code] > 0
+        }
+
+    @staticmethod
+    def metres_from_surfaces(all_surfaces: List[Dict], materials_dict: Dict[str, Dict]) -> Dict[str, float]:
+        """Metros de canto por material a partir de las superficies del cálculo."""
+        surfaces = [surface for surface in all_surfaces if 'largo_mm' in surface]
+        return EdgeBandingService.metres_by_material(
+            [surface['material'] for surface in surfaces],
+            [EdgeBandingService.piece_type(surface['descripcion']) for surface in surfaces],
+            [surface['largo_mm'] for surface in surfaces],
+            [surface['ancho_mm'] for surface in surfaces],
+            [surface['cantidad'] for surface in surfaces],
+            materials_dict,
+        )
+
+    @staticmethod
+    def calculate_cost(edge_banding_m: Dict[str, float], price_per_m: float) -> float:
+        """Costo del canto: metros totales por precio por metro."""
+        total_m = 0.0
+        for metres in edge_banding_m.values():
+            total_m += metres
+        return total_m * price_per_m
+
+
+_COUNT_SUFFIX = re.compile(r'\s*\(x\d+\)$')
+
+
+@lru_cache(maxsize=512)
+def _piece_type(description: str) -> str:
+    # Las descripciones se repiten mucho ('Lateral (x2)'), se memorizan
+    label = _COUNT_SUFFIX.sub('', description)
+    if label.startswith('Cajón'):
+        if label.endswith('frente/fondo'):
+            return 'Cajón frente/fondo'
+        if label.endswith('base'):
+            return 'Cajón base'
+        if label.endswith('lateral'):
+            return 'Cajón lateral'
+    return label
@@ -2,19 +2,137 @@ import streamlit as st
 from google.cloud import firestore
 from google.api_core import exceptions as gcloud_exceptions
 from google.api_core.retry import Retry, if_exception_type
+from google.cloud.firestore_v1.base_query import FieldFilter
+from google.cloud.firestore_v1.field_path import FieldPath
 import firebase_admin
 from firebase_admin import credentials
 import json
 import base64
-from typing import List, Dict, Optional
+import logging
+import copy
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, List, Dict, Optional
 from datetime import datetime
 import time
 
+from models.material_catalog import MaterialCatalog
+from services.calculation_service import CalculationService
+from services.catalog_replica import get_catalog_replica
+from services.logo_service import LogoService, PreparedLogo
+
+logger = logging.getLogger(__name__)
+
+
+class _TTLCache:
+    """Caché en memoria con expiración (TTL) y límite de entradas (LRU)."""
+
+    def __init__(self, ttl_seconds: float = 300.0, max_entries: int = 32):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max(1, int(max_entries))
+        self._entries: 'OrderedDict[str, tuple]' = OrderedDict()
+        self._lock = threading.RLock()
+        self._load_locks: Dict[str, threading.Lock] = {}
+        # Cada carga recibe un número nuevo: identifica la versión del valor sin compararlo
+        self._load_count = 0
+
+    def _get_fresh(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                return entry
+            return None
+
+    def _get_or_load_entry(self, key: str, loader: Callable[[], Any]) -> tuple:
+        """(vencimiento, valor, generación) vigente; las sesiones concurrentes esperan a una única carga."""
+        entry = self._get_fresh(key)
+        if entry is not None:
+            return entry
+
+        with self._lock:
+            load_lock = self._load_locks.setdefault(key, threading.Lock())
+
+        with load_lock:
+            entry = self._get_fresh(key)
+            if entry is not None:
+                return entry
+
+            value = loader()
+
+            with self._lock:
+                self._load_count += 1
+                entry = (time.monotonic() + self.ttl_seconds, value, self._load_count)
+                if self.ttl_seconds > 0:
+                    self._entries[key] = entry
+                    self._entries.move_to_end(key)
+                    while len(self._entries) > self.max_entries:
+                        self._entries.popitem(last=False)
+        return entry
+
+    def get_or_load(self, key: str, loader: Callable[[], Any]) -> Any:
+        """Devuelve una copia del valor cacheado o lo carga con `loader`."""
+        return copy.deepcopy(self._get_or_load_entry(key, loader)[1])
+
+    def generation(self, key: str, loader: Callable[[], Any]) -> int:
+        """Generación del valor vigente (cambia en cada carga, p. ej. tras `invalidate`), sin copiarlo."""
+        return self._get_or_load_entry(key, loader)[2]
+
+    def invalidate(self, *keys: str):
+        """Invalida las claves indicadas o toda la caché si no se indica ninguna."""
+        with self._lock:
+            if not keys:
+                self._entries.clear()
+                return
+            for key in keys:
+                self._entries.pop(key, None)
+
+
+# Formas de consulta de `list_projects` ya avisadas por falta de índice
+_missing_index_warned = set()
+_missing_index_lock = threading.Lock()
+
+
 class FirebaseService:
     """Servicio para manejar todas las operaciones con Firebase"""
+
+    # Claves de la caché de colecciones de referencia
+    CACHE_MATERIALS = 'materials'
+    CACHE_HARDWARE = 'hardware'
+    CACHE_CUTTING_SERVICE = 'cutting_service'
+    CACHE_LOGO = 'logo'
+    CACHE_LOGO_VERSION = 'logo_version'
+    CACHE_EMPLOYEES = 'employees'
+
+    # Campos que necesita la vista de lista de proyectos
+    PROJECT_LIST_FIELDS = ['name', 'client', 'date', 'status']
+    # Campos desnormalizados en `project_summaries` (mismo ID que el proyecto)
+    PROJECT_SUMMARY_FIELDS = PROJECT_LIST_FIELDS + ['total_calculated', 'final_price']
+    # Versión del formato de `project_summaries`; si la guardada es menor se regeneran (2: `name_lower`)
+    PROJECT_SUMMARIES_SCHEMA = 2
     
-    def __init__(self):
-        """Inicializa la conexión con Firebase"""
+    def __init__(self,
+                 cache_ttl_seconds: float = 300.0,
+                 cache_max_entries: int = 32,
+                 live_sync: Optional[bool] = None):
+        """Inicializa la conexión con Firebase
+
+        `cache_ttl_seconds` controla cuánto tiempo se reutilizan las lecturas de
+        referencias (materiales, herrajes, corte, logo, empleados); 0 desactiva la caché.
+        `live_sync` activa la réplica en memoria con listeners `on_snapshot`; si es None
+        se toma de `[app] live_sync` en los secrets (desactivado por defecto).
+        """
+        self._cache = _TTLCache(ttl_seconds=cache_ttl_seconds, max_entries=cache_max_entries)
+        self._replica = None
+        self._last_health: Optional[Dict] = None
+        self._summaries_checked = False
+        self._summaries_lock = threading.Lock()
+        self._material_catalog: Optional[MaterialCatalog] = None
+        self._material_catalog_revision: Optional[tuple] = None
+        self._material_catalog_lock = threading.Lock()
+        self._pdf_logo: Optional[PreparedLogo] = None
+        self._pdf_logo_lock = threading.Lock()
+        self._health_lock = threading.Lock()
         self.project_id = self._init_firebase()
         try:
             # Reutilizar credenciales del Admin SDK para evitar dependencia de ADC/metadata server
@@ -25,6 +143,45 @@ class FirebaseService:
             st.error(f"Error conectando con Firestore: {str(e)}")
             st.info("Verifica que Firestore esté activado en tu proyecto de Firebase")
             raise
+
+        if live_sync is None:
+            live_sync = self._live_sync_from_config()
+        if live_sync:
+            try:
+                self.enable_live_sync()
+            except Exception as e:
+                # Sin listeners se sigue leyendo desde Firestore con la caché TTL
+                st.warning(f"No se pudo activar la sincronización en vivo: {str(e)}")
+
+    def health_check(self, max_age_seconds: float = 60.0, timeout: float = 5.0) -> Dict:
+        """Comprueba la conexión con Firestore mediante una lectura mínima.
+
+        El resultado se reutiliza durante `max_age_seconds` para no añadir una lectura
+        a cada rerun de las páginas.
+        """
+        with self._health_lock:
+            last = self._last_health
+            if last and time.monotonic() - last['checked_at'] < max_age_seconds:
+                return dict(last)
+
+            started = time.monotonic()
+            try:
+                self.db.collection('config').document('logo').get(field_paths=['updated_at'], timeout=timeout)
+                status = {'ok': True, 'error': None}
+            except Exception as e:
+                status = {'ok': False, 'error': str(e)}
+            status['latency_ms'] = (time.monotonic() - started) * 1000.0
+            status['checked_at'] = time.monotonic()
+            self._last_health = status
+            return dict(status)
+
+    @staticmethod
+    def _live_sync_from_config() -> bool:
+        """Lee la opción `[app] live_sync` de los secrets de Streamlit."""
+        try:
+            return bool(st.secrets.get('app', {}).get('live_sync', False))
+        except Exception:
+            return False
     
     def _init_firebase(self) -> str:
         """Inicializa Firebase Admin SDK y retorna el project_id"""
@@ -103,21 +260,40 @@ class FirebaseService:
             timeout=total_timeout,
         )
     
+    def _project_summary_ref(self, project_id: str):
+        """Documento resumen del proyecto en `project_summaries`."""
+        return self.db.collection('project_summaries').document(project_id)
+
+    def _extract_project_summary(self, project_data: Dict) -> Dict:
+        """Toma del payload solo los campos que se desnormalizan en el resumen (y `name_lower` para buscar)."""
+        summary = {field: project_data[field] for field in self.PROJECT_SUMMARY_FIELDS if field in project_data}
+        if isinstance(summary.get('name'), str):
+            summary['name_lower'] = summary['name'].strip().lower()
+        return summary
+
+    def _create_project_batch(self, project_data: Dict):
+        """Escritura atómica del proyecto y su resumen."""
+        doc_ref = self.db.collection('projects').document()
+        batch = self.db.batch()
+        batch.set(doc_ref, project_data)
+        batch.set(self._project_summary_ref(doc_ref.id), self._extract_project_summary(project_data))
+        return doc_ref, batch
+
     def create_project(self, project_data: Dict) -> str:
-        """Crea un nuevo proyecto"""
+        """Crea un nuevo proyecto (y su documento resumen)"""
         try:
-            doc_ref = self.db.collection('projects').document()
             project_data['date'] = datetime.now()
+            doc_ref, batch = self._create_project_batch(project_data)
 
             # Reintentos controlados para errores transitorios (gRPC/servicio)
-            doc_ref.set(project_data, timeout=45.0, retry=self._firestore_write_retry())
+            batch.commit(timeout=45.0, retry=self._firestore_write_retry())
             return doc_ref.id
         except gcloud_exceptions.DeadlineExceeded:
             # Fallback de último intento sin retry interno y mayor timeout.
             # Ayuda cuando la red está lenta pero la operación puede completar en un segundo intento.
-            doc_ref = self.db.collection('projects').document()
             project_data['date'] = datetime.now()
-            doc_ref.set(project_data, timeout=60.0)
+            doc_ref, batch = self._create_project_batch(project_data)
+            batch.commit(timeout=60.0)
             return doc_ref.id
         except Exception as e:
             raise Exception(f"Error creando proyecto: {str(e)}")
@@ -148,27 +324,411 @@ class FirebaseService:
             raise Exception(f"Error obteniendo proyectos: {str(e)}")
     
     def update_project(self, project_id: str, project_data: Dict):
-        """Actualiza un proyecto existente"""
+        """
+        Actualiza un proyecto existente (y su resumen si cambian campos del mismo).
+
+        `project_data` puede ser un mapa parcial {ruta_de_campo: valor}, como el que
+        genera ProjectDiffService; las listas se reemplazan completas.
+        """
+        if not project_data:
+            return
         try:
-            self.db.collection('projects').document(project_id).update(
-                project_data,
-                timeout=45.0,
-                retry=self._firestore_write_retry(),
-            )
+            summary = self._extract_project_summary(project_data)
+            project_ref = self.db.collection('projects').document(project_id)
+            if not summary:
+                project_ref.update(
+                    project_data,
+                    timeout=45.0,
+                    retry=self._firestore_write_retry(),
+                )
+                return
+
+            batch = self.db.batch()
+            batch.update(project_ref, project_data)
+            batch.set(self._project_summary_ref(project_id), summary, merge=True)
+            batch.commit(timeout=45.0, retry=self._firestore_write_retry())
         except Exception as e:
             raise Exception(f"Error actualizando proyecto: {str(e)}")
     
     def delete_project(self, project_id: str):
-        """Elimina un proyecto"""
+        """Elimina un proyecto y su resumen"""
         try:
-            self.db.collection('projects').document(project_id).delete(timeout=15.0)
+            batch = self.db.batch()
+            batch.delete(self.db.collection('projects').document(project_id))
+            batch.delete(self._project_summary_ref(project_id))
+            batch.commit(timeout=15.0)
         except Exception as e:
             raise Exception(f"Error eliminando proyecto: {str(e)}")
+
+    def get_all_project_summaries(self) -> List[Dict]:
+        """Obtiene los resúmenes de todos los proyectos (sin módulos ni herrajes)"""
+        self._ensure_project_summaries()
+        try:
+            summaries = []
+            docs = self.db.collection('project_summaries').stream(timeout=20.0)
+            for doc in docs:
+                data = doc.to_dict()
+                data['id'] = doc.id
+                summaries.append(data)
+            return summaries
+        except Exception as e:
+            raise Exception(f"Error obteniendo resúmenes de proyectos: {str(e)}")
+
+    def rebuild_project_summaries(self, batch_size: int = 400) -> int:
+        """Regenera `project_summaries` desde `projects` (solo lee los campos del resumen)."""
+        try:
+            written = 0
+            batch = self.db.batch()
+            pending = 0
+            docs = self.db.collection('projects').select(self.PROJECT_SUMMARY_FIELDS).stream(timeout=60.0)
+            for doc in docs:
+                batch.set(self._project_summary_ref(doc.id), self._extract_project_summary(doc.to_dict()))
+                pending += 1
+                if pending >= batch_size:
+                    batch.commit(timeout=45.0, retry=self._firestore_write_retry())
+                    written += pending
+                    batch = self.db.batch()
+                    pending = 0
+            if pending:
+                batch.commit(timeout=45.0, retry=self._firestore_write_retry())
+                written += pending
+            self._project_summaries_marker_ref().set(
+                {'schema_version': self.PROJECT_SUMMARIES_SCHEMA, 'updated_at': datetime.now()},
+                timeout=15.0,
+            )
+            return written
+        except Exception as e:
+            raise Exception(f"Error regenerando resúmenes de proyectos: {str(e)}")
+
+    def _project_summaries_marker_ref(self):
+        """Documento `config/project_summaries` con la versión de formato de los resúmenes."""
+        return self.db.collection('config').document('project_summaries')
+
+    def _ensure_project_summaries(self):
+        """Regenera `project_summaries` una vez si no existen o tienen un formato anterior."""
+        if self._summaries_checked:
+            return
+        with self._summaries_lock:
+            if self._summaries_checked:
+                return
+            try:
+                marker = self._project_summaries_marker_ref().get(timeout=10.0)
+                schema_version = (marker.to_dict() or {}).get('schema_version', 0) if marker.exists else 0
+                if schema_version < self.PROJECT_SUMMARIES_SCHEMA:
+                    self.rebuild_project_summaries()
+                self._summaries_checked = True
+            except Exception:
+                # Se reintentará en la próxima lectura
+                pass
+
+    def list_projects(self,
+                      status: Optional[str] = None,
+                      name_prefix: Optional[str] = None,
+                      client: Optional[str] = None,
+                      order_by: str = '-date',
+                      limit: int = 20,
+                      cursor: Any = None) -> Dict:
+        """
+        Lista proyectos filtrados y paginados en Firestore.
+
+        Se consulta `project_summaries` y solo se descargan los campos de `PROJECT_LIST_FIELDS`. `order_by` admite un
+        prefijo '-' para orden descendente; con `name_prefix` (sin distinguir mayúsculas, sobre `name_lower`)
+        se ordena por nombre. `cursor` es el `next_cursor` opaco devuelto por la página anterior.
+        Retorna {'items': [...], 'next_cursor': cursor o None, 'index_fallback': bool}; `index_fallback`
+        indica que faltaba el índice compuesto (ver firestore.indexes.json) y se filtró en memoria.
+        """
+        name_prefix = (name_prefix or '').strip().lower()
+        if name_prefix:
+            order_by = 'name_lower'
+        descending = order_by.startswith('-')
+        order_field = order_by.lstrip('-')
+        if order_field not in self.PROJECT_LIST_FIELDS + ['name_lower']:
+            raise ValueError(f"order_by debe ser uno de {self.PROJECT_LIST_FIELDS}")
+        limit = max(1, int(limit))
+        self._ensure_project_summaries()
+
+        index_fallback = False
+        try:
+            # El campo de orden debe venir en la proyección para usar el documento como cursor
+            fields = self.PROJECT_LIST_FIELDS + (['name_lower'] if order_field == 'name_lower' else [])
+            query = self.db.collection('project_summaries').select(fields)
+            if status:
+                query = query.where(filter=FieldFilter('status', '==', status))
+            if client:
+                query = query.where(filter=FieldFilter('client', '==', client))
+            if name_prefix:
+                query = query.where(filter=FieldFilter('name_lower', '>=', name_prefix))
+                query = query.where(filter=FieldFilter('name_lower', '<', name_prefix + '\uf8ff'))
+            direction = firestore.Query.DESCENDING if descending else firestore.Query.ASCENDING
+            query = query.order_by(order_field, direction=direction)
+            if cursor is not None:
+                query = query.start_after(cursor)
+            # Se pide un documento extra para saber si existe página siguiente
+            docs = list(query.limit(limit + 1).stream(timeout=20.0))
+        except gcloud_exceptions.FailedPrecondition as e:
+            # Falta el índice compuesto: se filtra en memoria con la misma proyección (lee toda la colección)
+            index_fallback = True
+            self._warn_missing_index(status, client, order_field, descending, e)
+            docs = self._list_projects_without_index(
+                status, name_prefix, client, order_field, descending, limit, cursor
+            )
+        except Exception as e:
+            raise Exception(f"Error listando proyectos: {str(e)}")
+
+        page_docs = docs[:limit]
+        items = []
+        for doc in page_docs:
+            data = doc.to_dict()
+            data.pop('name_lower', None)
+            data['id'] = doc.id
+            items.append(data)
+        next_cursor = page_docs[-1] if len(docs) > limit else None
+        return {'items': items, 'next_cursor': next_cursor, 'index_fallback': index_fallback}
+
+    @staticmethod
+    def _warn_missing_index(status, client, order_field, descending, error: Exception):
+        """Avisa en el log (una vez por forma de consulta) que falta un índice compuesto."""
+        shape = (bool(status), bool(client), order_field, descending)
+        with _missing_index_lock:
+            if shape in _missing_index_warned:
+                return
+            _missing_index_warned.add(shape)
+        logger.warning(
+            "Falta un índice compuesto de project_summaries (status=%s, client=%s, orden=%s%s); "
+            "se lee la colección completa. Desplegar firestore.indexes.json. Detalle: %s",
+            bool(status), bool(client), '-' if descending else '', order_field, error,
+        )
+
+    def _list_projects_without_index(self, status, name_prefix, client, order_field, descending, limit, cursor) -> List:
+        """Alternativa a `list_projects` cuando Firestore no tiene el índice compuesto."""
+        try:
+            docs = []
+            fields = self.PROJECT_LIST_FIELDS + ['name_lower']
+            for doc in self.db.collection('project_summaries').select(fields).stream(timeout=20.0):
+                data = doc.to_dict()
+                if status and data.get('status') != status:
+                    continue
+                if client and data.get('client') != client:
+                    continue
+                if name_prefix and not (data.get('name') or '').strip().lower().startswith(name_prefix):
+                    continue
+                docs.append(doc)
+        except Exception as e:
+            raise Exception(f"Error listando proyectos: {str(e)}")
+
+        def sort_value(doc):
+            data = doc.to_dict()
+            if order_field == 'name_lower':
+                # Resúmenes anteriores a `name_lower`: se ordena por el nombre en minúsculas
+                return data.get('name_lower') or (data.get('name') or '').strip().lower()
+            return data.get(order_field)
+
+        # Los documentos sin valor en el campo de orden van siempre al final
+        with_value = [doc for doc in docs if sort_value(doc) is not None]
+        without_value = [doc for doc in docs if sort_value(doc) is None]
+        try:
+            with_value.sort(key=lambda doc: (sort_value(doc), doc.id), reverse=descending)
+        except TypeError:
+            with_value.sort(key=lambda doc: (str(sort_value(doc)), doc.id), reverse=descending)
+        docs = with_value + sorted(without_value, key=lambda doc: doc.id)
+
+        start = 0
+        if cursor is not None:
+            ids = [doc.id for doc in docs]
+            start = ids.index(cursor.id) + 1 if cursor.id in ids else len(docs)
+        return docs[start:start + limit + 1]
     
+    # ========== RECÁLCULO DE PRESUPUESTOS ==========
+
+    # Campos de `projects` que necesita el recálculo de costos
+    REPRICING_FIELDS = [
+        'name', 'client', 'status', 'total_calculated', 'final_price',
+        'modules', 'shelves', 'woods', 'hardwares', 'labor_cost_project', 'extra_complexity', 'use_nesting',
+    ]
+
+    def iter_project_chunks(self,
+                            status: Optional[str] = 'Activo',
+                            chunk_size: int = 200,
+                            client: Optional[str] = None,
+                            fields: Optional[List[str]] = None):
+        """
+        Recorre `projects` en bloques de `chunk_size` documentos ordenados por ID.
+
+        Cada bloque se pide con un cursor sobre el anterior, así solo hay un bloque
+        en memoria aunque el archivo tenga miles de proyectos. `fields` limita los
+        campos leídos (por defecto, los del recálculo).
+        """
+        chunk_size = max(1, int(chunk_size))
+        query = self.db.collection('projects').select(fields or self.REPRICING_FIELDS)
+        if status:
+            query = query.where(filter=FieldFilter('status', '==', status))
+        if client:
+            query = query.where(filter=FieldFilter('client', '==', client))
+        query = query.order_by(FieldPath.document_id()).limit(chunk_size)
+
+        last_doc = None
+        while True:
+            try:
+                page = query.start_after(last_doc) if last_doc is not None else query
+                docs = list(page.stream(timeout=60.0))
+            except Exception as e:
+                raise Exception(f"Error leyendo proyectos: {str(e)}")
+            if not docs:
+                return
+            chunk = []
+            for doc in docs:
+                data = doc.to_dict()
+                data['id'] = doc.id
+                chunk.append(data)
+            yield chunk
+            if len(docs) < chunk_size:
+                return
+            last_doc = docs[-1]
+
+    def create_repricing_report(self, report_data: Dict) -> str:
+        """Crea el documento de un informe de recálculo en `repricing_reports`."""
+        try:
+            doc_ref = self.db.collection('repricing_reports').document()
+            doc_ref.set({**report_data, 'created_at': datetime.now()}, timeout=20.0)
+            return doc_ref.id
+        except Exception as e:
+            raise Exception(f"Error creando informe de recálculo: {str(e)}")
+
+    def add_repricing_report_items(self, report_id: str, items: List[Dict], batch_size: int = 400) -> int:
+        """Escribe las diferencias por proyecto en `repricing_reports/{id}/items` con escrituras en lote."""
+        try:
+            items_ref = self.db.collection('repricing_reports').document(report_id).collection('items')
+            written = 0
+            batch = self.db.batch()
+            pending = 0
+            for item in items:
+                batch.set(items_ref.document(item['project_id']), item)
+                pending += 1
+                if pending >= batch_size:
+                    batch.commit(timeout=45.0, retry=self._firestore_write_retry())
+                    written += pending
+                    batch = self.db.batch()
+                    pending = 0
+            if pending:
+                batch.commit(timeout=45.0, retry=self._firestore_write_retry())
+                written += pending
+            return written
+        except Exception as e:
+            raise Exception(f"Error guardando informe de recálculo: {str(e)}")
+
+    def update_repricing_report(self, report_id: str, report_data: Dict):
+        """Actualiza los totales o el estado de un informe de recálculo."""
+        try:
+            self.db.collection('repricing_reports').document(report_id).update(report_data, timeout=20.0)
+        except Exception as e:
+            raise Exception(f"Error actualizando informe de recálculo: {str(e)}")
+
+    def get_latest_repricing_report(self) -> Optional[Dict]:
+        """Último informe de recálculo (sin sus items)."""
+        try:
+            docs = list(
+                self.db.collection('repricing_reports')
+                .order_by('created_at', direction=firestore.Query.DESCENDING)
+                .limit(1)
+                .stream(timeout=15.0)
+            )
+            if not docs:
+                return None
+            data = docs[0].to_dict()
+            data['id'] = docs[0].id
+            return data
+        except Exception as e:
+            raise Exception(f"Error obteniendo informe de recálculo: {str(e)}")
+
+    def get_repricing_report_items(self, report_id: str, limit: int = 50) -> List[Dict]:
+        """Proyectos del informe con mayor diferencia absoluta primero."""
+        try:
+            items = []
+            docs = (
+                self.db.collection('repricing_reports').document(report_id).collection('items')
+                .order_by('abs_delta', direction=firestore.Query.DESCENDING)
+                .limit(max(1, int(limit)))
+                .stream(timeout=20.0)
+            )
+            for doc in docs:
+                items.append(doc.to_dict())
+            return items
+        except Exception as e:
+            raise Exception(f"Error obteniendo informe de recálculo: {str(e)}")
+
+    # ========== CACHÉ DE REFERENCIAS ==========
+
+    def invalidate_cache(self, *keys: str):
+        """Invalida la caché de referencias (todas las claves si no se indica ninguna)."""
+        self._cache.invalidate(*keys)
+
+    # ========== SINCRONIZACIÓN EN VIVO (on_snapshot) ==========
+
+    def enable_live_sync(self):
+        """Adjunta listeners a los catálogos; las lecturas pasan a resolverse en memoria."""
+        replica = get_catalog_replica()
+        replica.attach(self.CACHE_MATERIALS, self.db.collection('materials'))
+        replica.attach(self.CACHE_HARDWARE, self.db.collection('hardware'))
+        replica.attach(self.CACHE_CUTTING_SERVICE, self.db.collection('cutting_service'))
+        replica.attach(self.CACHE_EMPLOYEES, self._employees_collection())
+        self._replica = replica
+
+    def disable_live_sync(self):
+        """Vuelve a leer desde Firestore (los listeners del proceso siguen activos)."""
+        self._replica = None
+
+    @property
+    def live_sync_enabled(self) -> bool:
+        return self._replica is not None
+
+    def _replica_ready(self, name: str) -> bool:
+        if self._replica is None:
+            return False
+        if self._replica.is_ready(name):
+            return True
+        # Listener cerrado: se vuelve a adjuntar y, hasta su primera instantánea, se lee de Firestore
+        self._replica.restart_if_closed(name)
+        return self._replica.is_ready(name)
+
+    def _replica_write(self, name: str, doc_id: str, data: Optional[Dict], merge: bool = False):
+        """Refleja una escritura propia en la réplica para leerla en el siguiente rerun."""
+        if self._replica is not None:
+            self._replica.apply_local_write(name, doc_id, data, merge=merge)
+
     # ========== MATERIALES ==========
     
     def get_all_materials(self) -> List[Dict]:
-        """Obtiene todos los materiales"""
+        """Obtiene todos los materiales (réplica en vivo o caché TTL)"""
+        if self._replica_ready(self.CACHE_MATERIALS):
+            return self._replica.get_all(self.CACHE_MATERIALS)
+        return self._cache.get_or_load(self.CACHE_MATERIALS, self._fetch_all_materials)
+
+    def get_material_catalog(self) -> MaterialCatalog:
+        """
+        Catálogo de materiales indexado (ver MaterialCatalog).
+
+        Se reconstruye solo cuando cambia la revisión de los materiales (un cambio en
+        la réplica en vivo o una nueva carga de la caché TTL, que create/update/delete
+        invalidan); mientras no cambie, todas las sesiones reciben la misma instancia
+        sin copiar ni recorrer la lista. La versión del catálogo es la huella de su
+        contenido (`MaterialCatalog.version_of`), válida entre instancias del servicio.
+        """
+        source_revision = self._materials_revision()
+        with self._material_catalog_lock:
+            if self._material_catalog is None or self._material_catalog_revision != source_revision:
+                materials = self.get_all_materials()
+                self._material_catalog = MaterialCatalog(materials, MaterialCatalog.version_of(materials))
+                self._material_catalog_revision = source_revision
+            return self._material_catalog
+
+    def _materials_revision(self) -> tuple:
+        """Revisión de los materiales: contador de cambios de la réplica o generación de la caché."""
+        if self._replica_ready(self.CACHE_MATERIALS):
+            return ('replica', self._replica.revision(self.CACHE_MATERIALS))
+        return ('cache', self._cache.generation(self.CACHE_MATERIALS, self._fetch_all_materials))
+
+    def _fetch_all_materials(self) -> List[Dict]:
+        """Lee la colección de materiales desde Firestore"""
         try:
             materials = []
             docs = self.db.collection('materials').stream(timeout=15.0)
@@ -185,6 +745,8 @@ class FirebaseService:
         try:
             doc_ref = self.db.collection('materials').document()
             doc_ref.set(material_data, timeout=15.0)
+            self._cache.invalidate(self.CACHE_MATERIALS)
+            self._replica_write(self.CACHE_MATERIALS, doc_ref.id, material_data)
             return doc_ref.id
         except Exception as e:
             raise Exception(f"Error creando material: {str(e)}")
@@ -193,6 +755,8 @@ class FirebaseService:
         """Actualiza un material"""
         try:
             self.db.collection('materials').document(material_id).update(material_data, timeout=15.0)
+            self._cache.invalidate(self.CACHE_MATERIALS)
+            self._replica_write(self.CACHE_MATERIALS, material_id, material_data, merge=True)
         except Exception as e:
             raise Exception(f"Error actualizando material: {str(e)}")
     
@@ -200,13 +764,21 @@ class FirebaseService:
         """Elimina un material"""
         try:
             self.db.collection('materials').document(material_id).delete(timeout=10.0)
+            self._cache.invalidate(self.CACHE_MATERIALS)
+            self._replica_write(self.CACHE_MATERIALS, material_id, None)
         except Exception as e:
             raise Exception(f"Error eliminando material: {str(e)}")
     
     # ========== HERRAJES ==========
     
     def get_all_hardware(self) -> List[Dict]:
-        """Obtiene todos los herrajes"""
+        """Obtiene todos los herrajes (réplica en vivo o caché TTL)"""
+        if self._replica_ready(self.CACHE_HARDWARE):
+            return self._replica.get_all(self.CACHE_HARDWARE)
+        return self._cache.get_or_load(self.CACHE_HARDWARE, self._fetch_all_hardware)
+
+    def _fetch_all_hardware(self) -> List[Dict]:
+        """Lee la colección de herrajes desde Firestore"""
         try:
             hardware = []
             docs = self.db.collection('hardware').stream(timeout=15.0)
@@ -223,6 +795,8 @@ class FirebaseService:
         try:
             doc_ref = self.db.collection('hardware').document()
             doc_ref.set(hardware_data, timeout=15.0)
+            self._cache.invalidate(self.CACHE_HARDWARE)
+            self._replica_write(self.CACHE_HARDWARE, doc_ref.id, hardware_data)
             return doc_ref.id
         except Exception as e:
             raise Exception(f"Error creando herraje: {str(e)}")
@@ -231,6 +805,8 @@ class FirebaseService:
         """Actualiza un herraje"""
         try:
             self.db.collection('hardware').document(hardware_id).update(hardware_data, timeout=15.0)
+            self._cache.invalidate(self.CACHE_HARDWARE)
+            self._replica_write(self.CACHE_HARDWARE, hardware_id, hardware_data, merge=True)
         except Exception as e:
             raise Exception(f"Error actualizando herraje: {str(e)}")
     
@@ -238,29 +814,46 @@ class FirebaseService:
         """Elimina un herraje"""
         try:
             self.db.collection('hardware').document(hardware_id).delete(timeout=10.0)
+            self._cache.invalidate(self.CACHE_HARDWARE)
+            self._replica_write(self.CACHE_HARDWARE, hardware_id, None)
         except Exception as e:
             raise Exception(f"Error eliminando herraje: {str(e)}")
     
     # ========== SERVICIO DE CORTE ==========
     
     def get_cutting_service(self) -> Optional[Dict]:
-        """Obtiene la configuración del servicio de corte"""
+        """Obtiene la configuración del servicio de corte (réplica en vivo o caché TTL)"""
+        if self._replica_ready(self.CACHE_CUTTING_SERVICE):
+            config = self._replica.get_document(self.CACHE_CUTTING_SERVICE, 'config')
+            return config if config is not None else self._default_cutting_service()
+        return self._cache.get_or_load(self.CACHE_CUTTING_SERVICE, self._fetch_cutting_service)
+
+    def _fetch_cutting_service(self) -> Optional[Dict]:
+        """Lee la configuración del servicio de corte desde Firestore"""
         try:
             doc = self.db.collection('cutting_service').document('config').get(timeout=10.0)
             if doc.exists:
                 return doc.to_dict()
-            # Valores por defecto
-            return {
-                'price_per_m2': 0.0,
-                'waste_factor': 0.10
-            }
+            return self._default_cutting_service()
         except Exception as e:
             raise Exception(f"Error obteniendo servicio de corte: {str(e)}")
     
+    @staticmethod
+    def _default_cutting_service() -> Dict:
+        """Valores por defecto cuando no existe el documento de configuración"""
+        return {
+            'price_per_m2': 0.0,
+            'waste_factor': 0.10,
+            'kerf_mm': 4.0,
+            'price_per_m_canto': 0.0
+        }
+
     def update_cutting_service(self, cutting_data: Dict):
         """Actualiza la configuración del servicio de corte"""
         try:
             self.db.collection('cutting_service').document('config').set(cutting_data, timeout=15.0)
+            self._cache.invalidate(self.CACHE_CUTTING_SERVICE)
+            self._replica_write(self.CACHE_CUTTING_SERVICE, 'config', cutting_data)
         except Exception as e:
             raise Exception(f"Error actualizando servicio de corte: {str(e)}")
     
@@ -280,23 +873,81 @@ class FirebaseService:
                 'logo_base64': logo_base64,
                 'updated_at': datetime.now()
             }
+            try:
+                # Variante reducida para los PDFs, preparada una sola vez al subir
+                logo_data['logo_pdf_base64'] = base64.b64encode(LogoService.prepare_pdf_logo(file_bytes)).decode('utf-8')
+            except Exception:
+                # Si Pillow no puede leerla se prepara al generar el primer PDF
+                pass
             self.db.collection('config').document('logo').set(logo_data, timeout=20.0)
+            self._cache.invalidate(self.CACHE_LOGO, self.CACHE_LOGO_VERSION)
+            with self._pdf_logo_lock:
+                self._pdf_logo = None
             
             return 'logo_stored'
         except Exception as e:
             raise Exception(f"Error guardando logo: {str(e)}")
     
     def get_logo_base64(self) -> Optional[str]:
-        """Obtiene el logo en formato base64 desde Firestore"""
+        """Obtiene el logo en formato base64 desde Firestore (con caché TTL)"""
         try:
-            doc = self.db.collection('config').document('logo').get(timeout=10.0)
-            if doc.exists:
-                data = doc.to_dict()
-                return data.get('logo_base64')
-            return None
+            return self._cache.get_or_load(self.CACHE_LOGO, self._fetch_logo_base64)
         except Exception as e:
             return None
 
+    def _fetch_logo_base64(self) -> Optional[str]:
+        """Lee el logo desde Firestore; los errores se propagan para no cachearlos"""
+        doc = self.db.collection('config').document('logo').get(field_paths=['logo_base64'], timeout=10.0)
+        if doc.exists:
+            data = doc.to_dict()
+            return data.get('logo_base64')
+        return None
+
+    def get_pdf_logo(self) -> Optional[PreparedLogo]:
+        """
+        Logo listo para insertar en el PDF (ver LogoService).
+
+        Se guarda en memoria del proceso junto con su versión (`updated_at`); la versión
+        se consulta con la caché TTL, así que generar un PDF no descarga ni decodifica
+        el logo mientras no cambie.
+        """
+        try:
+            version = self._cache.get_or_load(self.CACHE_LOGO_VERSION, self._fetch_logo_version)
+            if version is None:
+                return None
+            with self._pdf_logo_lock:
+                if self._pdf_logo is not None and self._pdf_logo.version == version:
+                    return self._pdf_logo
+
+            doc = self.db.collection('config').document('logo').get(
+                field_paths=['logo_pdf_base64', 'updated_at'], timeout=10.0
+            )
+            data = doc.to_dict() if doc.exists else {}
+            if data.get('logo_pdf_base64'):
+                prepared_bytes = base64.b64decode(data['logo_pdf_base64'])
+            else:
+                # Logo subido antes de guardar la variante: se prepara desde el original
+                original = self.get_logo_base64()
+                if not original:
+                    return None
+                prepared_bytes = LogoService.prepare_pdf_logo(base64.b64decode(original))
+
+            logo = LogoService.load_prepared(prepared_bytes, version)
+            with self._pdf_logo_lock:
+                self._pdf_logo = logo
+            return logo
+        except Exception:
+            # El PDF se genera sin logo antes que fallar
+            return None
+
+    def _fetch_logo_version(self) -> Optional[str]:
+        """Solo `updated_at` del logo: sirve de versión sin descargar la imagen."""
+        doc = self.db.collection('config').document('logo').get(field_paths=['updated_at'], timeout=10.0)
+        if not doc.exists:
+            return None
+        updated_at = (doc.to_dict() or {}).get('updated_at')
+        return str(updated_at) if updated_at is not None else 'sin-fecha'
+
     # ========== REFERENCIAS: EMPLEADOS ==========
 
     def _employees_collection(self):
@@ -304,7 +955,13 @@ class FirebaseService:
         return self.db.collection('referencias').document('empleados').collection('items')
 
     def get_all_employees(self) -> List[Dict]:
-        """Obtiene todos los empleados."""
+        """Obtiene todos los empleados (réplica en vivo o caché TTL)."""
+        if self._replica_ready(self.CACHE_EMPLOYEES):
+            return self._replica.get_all(self.CACHE_EMPLOYEES)
+        return self._cache.get_or_load(self.CACHE_EMPLOYEES, self._fetch_all_employees)
+
+    def _fetch_all_employees(self) -> List[Dict]:
+        """Lee la colección de empleados desde Firestore."""
         try:
             employees = []
             docs = self._employees_collection().stream(timeout=15.0)
@@ -322,6 +979,8 @@ class FirebaseService:
             doc_ref = self._employees_collection().document()
             payload = {**employee_data, 'created_at': datetime.now()}
             doc_ref.set(payload, timeout=15.0)
+            self._cache.invalidate(self.CACHE_EMPLOYEES)
+            self._replica_write(self.CACHE_EMPLOYEES, doc_ref.id, payload)
             return doc_ref.id
         except Exception as e:
             raise Exception(f"Error creando empleado: {str(e)}")
@@ -331,6 +990,8 @@ class FirebaseService:
         try:
             payload = {**employee_data, 'updated_at': datetime.now()}
             self._employees_collection().document(employee_id).update(payload, timeout=15.0)
+            self._cache.invalidate(self.CACHE_EMPLOYEES)
+            self._replica_write(self.CACHE_EMPLOYEES, employee_id, payload, merge=True)
         except Exception as e:
             raise Exception(f"Error actualizando empleado: {str(e)}")
 
@@ -338,16 +999,28 @@ class FirebaseService:
         """Elimina un empleado."""
         try:
             self._employees_collection().document(employee_id).delete(timeout=10.0)
+            self._cache.invalidate(self.CACHE_EMPLOYEES)
+            self._replica_write(self.CACHE_EMPLOYEES, employee_id, None)
         except Exception as e:
             raise Exception(f"Error eliminando empleado: {str(e)}")
 
     # ========== ECONOMÍA ==========
 
-    def get_economy_movements(self) -> List[Dict]:
-        """Obtiene movimientos económicos ordenados por fecha desc."""
+    def _economy_movements_collection(self):
+        return self.db.collection('economia_movimientos')
+
+    def _economy_totals_ref(self):
+        """Documento con los balances agregados del libro (`economia_agregados/totales`)."""
+        return self.db.collection('economia_agregados').document('totales')
+
+    def get_economy_movements(self, limit: Optional[int] = None) -> List[Dict]:
+        """Obtiene movimientos económicos ordenados por fecha desc (los `limit` más recientes si se indica)."""
         try:
             movements = []
-            docs = self.db.collection('economia_movimientos').order_by('fecha', direction=firestore.Query.DESCENDING).stream(timeout=20.0)
+            query = self._economy_movements_collection().order_by('fecha', direction=firestore.Query.DESCENDING)
+            if limit:
+                query = query.limit(int(limit))
+            docs = query.stream(timeout=20.0)
             for doc in docs:
                 data = doc.to_dict()
                 data['id'] = doc.id
@@ -356,40 +1029,139 @@ class FirebaseService:
         except Exception:
             try:
                 movements = []
-                docs = self.db.collection('economia_movimientos').stream(timeout=20.0)
+                docs = self._economy_movements_collection().stream(timeout=20.0)
                 for doc in docs:
                     data = doc.to_dict()
                     data['id'] = doc.id
                     movements.append(data)
-                return sorted(movements, key=lambda x: x.get('fecha') or datetime.min, reverse=True)
+                movements = sorted(movements, key=lambda x: x.get('fecha') or datetime.min, reverse=True)
+                return movements[:int(limit)] if limit else movements
             except Exception as e:
                 raise Exception(f"Error obteniendo movimientos económicos: {str(e)}")
 
+    @staticmethod
+    def _economy_increments(deltas: Dict) -> Dict:
+        """Convierte los deltas en `firestore.Increment` (se omiten los que valen 0)."""
+        increments = {}
+        for key, value in deltas.items():
+            if isinstance(value, dict):
+                nested = FirebaseService._economy_increments(value)
+                if nested:
+                    increments[key] = nested
+            elif value:
+                increments[key] = firestore.Increment(value)
+        return increments
+
+    @staticmethod
+    def _economy_write_deltas(previous: Optional[Dict], current: Optional[Dict]) -> Dict:
+        """Cambio de los agregados al pasar de `previous` a `current` (None = sin movimiento)."""
+        deltas = CalculationService.empty_economy_totals()
+        if previous is not None:
+            CalculationService.add_economy_deltas(deltas, CalculationService.economy_movement_deltas(previous), -1)
+        if current is not None:
+            CalculationService.add_economy_deltas(deltas, CalculationService.economy_movement_deltas(current))
+        return deltas
+
+    def _write_economy_movement(self, movement_id: Optional[str], movement_data: Optional[Dict], merge: bool = False) -> str:
+        """
+        Escribe (o borra, con `movement_data=None`) un movimiento y ajusta los agregados
+        en la misma transacción: se resta el aporte del movimiento anterior y se suma el nuevo.
+
+        Si el documento de agregados aún no existe no se toca; lo crea
+        `rebuild_economy_totals` a partir del libro completo.
+        """
+        collection = self._economy_movements_collection()
+        doc_ref = collection.document(movement_id) if movement_id else collection.document()
+        totals_ref = self._economy_totals_ref()
+
+        @firestore.transactional
+        def write(transaction):
+            previous = None
+            if movement_id:
+                snapshot = doc_ref.get(transaction=transaction, timeout=15.0)
+                previous = snapshot.to_dict() if snapshot.exists else None
+            totals_exist = totals_ref.get(field_paths=['movimientos'], transaction=transaction, timeout=15.0).exists
+
+            current = None
+            if movement_data is not None:
+                current = {**(previous or {}), **movement_data} if merge else movement_data
+                if merge:
+                    transaction.update(doc_ref, movement_data)
+                else:
+                    transaction.set(doc_ref, movement_data)
+            elif previous is not None:
+                transaction.delete(doc_ref)
+
+            if not totals_exist:
+                return
+            increments = self._economy_increments(self._economy_write_deltas(previous, current))
+            if increments:
+                transaction.set(totals_ref, {**increments, 'updated_at': datetime.now()}, merge=True)
+
+        write(self.db.transaction())
+        return doc_ref.id
+
     def create_economy_movement(self, movement_data: Dict) -> str:
-        """Crea un movimiento económico."""
+        """Crea un movimiento económico (y actualiza los agregados)."""
         try:
-            doc_ref = self.db.collection('economia_movimientos').document()
             payload = {**movement_data, 'created_at': datetime.now()}
-            doc_ref.set(payload, timeout=20.0)
-            return doc_ref.id
+            return self._write_economy_movement(None, payload)
         except Exception as e:
             raise Exception(f"Error creando movimiento económico: {str(e)}")
 
     def update_economy_movement(self, movement_id: str, movement_data: Dict):
-        """Actualiza un movimiento económico."""
+        """Actualiza un movimiento económico (y los agregados)."""
         try:
             payload = {**movement_data, 'updated_at': datetime.now()}
-            self.db.collection('economia_movimientos').document(movement_id).update(payload, timeout=20.0)
+            self._write_economy_movement(movement_id, payload, merge=True)
         except Exception as e:
             raise Exception(f"Error actualizando movimiento económico: {str(e)}")
 
     def delete_economy_movement(self, movement_id: str):
-        """Elimina un movimiento económico."""
+        """Elimina un movimiento económico (y descuenta su aporte de los agregados)."""
         try:
-            self.db.collection('economia_movimientos').document(movement_id).delete(timeout=15.0)
+            self._write_economy_movement(movement_id, None)
         except Exception as e:
             raise Exception(f"Error eliminando movimiento económico: {str(e)}")
 
+    def rebuild_economy_totals(self) -> Dict:
+        """Regenera `economia_agregados/totales` leyendo todo el libro dentro de una transacción."""
+        try:
+            totals_ref = self._economy_totals_ref()
+            fields = ['tipo', 'monto', 'origen_categoria', 'origen_nombre', 'empleado_tipo', 'project_name']
+
+            @firestore.transactional
+            def rebuild(transaction):
+                movements = [
+                    doc.to_dict()
+                    for doc in self._economy_movements_collection().select(fields).stream(transaction=transaction, timeout=60.0)
+                ]
+                totals = CalculationService.compute_economy_totals(movements)
+                # set sin merge: desaparecen empleados, proyectos y clientes sin movimientos
+                transaction.set(totals_ref, {**totals, 'updated_at': datetime.now()})
+                return totals
+
+            return rebuild(self.db.transaction())
+        except Exception as e:
+            raise Exception(f"Error regenerando balances de economía: {str(e)}")
+
+    def get_economy_totals(self) -> Dict:
+        """
+        Balances agregados de economía: un solo documento en lugar de todo el libro.
+
+        La primera vez (sin documento de agregados) se regenera desde `economia_movimientos`.
+        """
+        try:
+            snapshot = self._economy_totals_ref().get(timeout=15.0)
+            if not snapshot.exists:
+                return self.rebuild_economy_totals()
+            data = snapshot.to_dict() or {}
+            totals = CalculationService.empty_economy_totals()
+            totals.update({key: value for key, value in data.items() if key in totals})
+            return totals
+        except Exception as e:
+            raise Exception(f"Error obteniendo balances de economía: {str(e)}")
+
     def log_economy_action(self, action: str, movement_id: str, snapshot_before: Optional[Dict] = None, user: Optional[str] = None):
         """Registra eventos create/update/delete de economía."""
         try:
@@ -404,3 +1176,27 @@ class FirebaseService:
         except Exception:
             # Logging best effort
             pass
+
+
+@st.cache_resource(show_spinner="Conectando con Firebase...")
+def get_shared_firebase_service() -> FirebaseService:
+    """Instancia única de FirebaseService compartida por todas las sesiones del proceso.
+
+    Un solo `firestore.Client` reutiliza su canal gRPC (y la conexión TLS) para todos
+    los usuarios, junto con la caché de referencias.
+    """
+    return FirebaseService()
+
+
+def get_healthy_firebase_service() -> FirebaseService:
+    """Devuelve el servicio compartido y lo recrea una vez si el health check falla."""
+    service = get_shared_firebase_service()
+    if service.health_check()['ok']:
+        return service
+
+    get_shared_firebase_service.clear()
+    service = get_shared_firebase_service()
+    status = service.health_check(max_age_seconds=0)
+    if not status['ok']:
+        raise Exception(f"Firestore no responde: {status['error']}")
+    return service
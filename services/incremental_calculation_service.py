@@ -0,0 +1,287 @@
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+from models.material_catalog import MaterialCatalog
+from services.calculation_service import CalculationService
+from services.edge_banding_service import EdgeBandingService
+from services.nesting_service import NestingService
+from services.project_diff_service import structural_digest
+
+
+class _ItemContribution:
+    """Aporte cacheado de un módulo, estante o madera."""
+
+    __slots__ = ('fingerprint', 'surfaces', 'material_m2', 'edge_banding_m', 'hardware_total')
+
+    def __init__(self, fingerprint: str, surfaces: List[Dict], material_m2: Dict[str, float],
+                 edge_banding_m: Dict[str, float], hardware_total: float = 0.0):
+        self.fingerprint = fingerprint
+        self.surfaces = surfaces
+        self.material_m2 = material_m2
+        self.edge_banding_m = edge_banding_m
+        self.hardware_total = hardware_total
+
+
+class IncrementalCostCalculator:
+    """
+    Calculadora de costos incremental para la pestaña de costos.
+
+    Guarda las superficies y m² por material de cada módulo, estante y madera, y
+    los subtotales por material. En cada `sync` solo se recalculan los elementos
+    cuya huella cambió; los subtotales de los materiales que tocan se vuelven a
+    sumar desde los aportes cacheados (sin restar, para no arrastrar restos de
+    redondeo) y los costos se recalculan solo para esos materiales. Si quien
+    llama sabe qué elementos cambió puede indicarlo con `changed` y se evita
+    revisar el resto. Cambiar el precio final con `with_final_price` solo
+    recalcula la mano de obra y el descuento para la factura. Con `use_nesting`
+    el despiece de tablas también se repite solo para los materiales afectados.
+    """
+
+    SECTIONS = ('modules', 'shelves', 'woods')
+
+    def __init__(self, materials_db: Union[MaterialCatalog, List[Dict]], cutting_service: Dict, use_nesting: bool = False,
+                 nesting_heuristic: str = NestingService.DEFAULT_HEURISTIC,
+                 nesting_workers: Optional[int] = None):
+        self.materials_dict = MaterialCatalog.coerce(materials_db)
+        self.catalog_fingerprint = self.catalog_hash(self.materials_dict, cutting_service)
+        self.cutting_service = cutting_service
+        self.use_nesting = use_nesting
+        self.nesting_heuristic = nesting_heuristic
+        self.nesting_workers = nesting_workers
+        self._items: Dict[str, List[_ItemContribution]] = {section: [] for section in self.SECTIONS}
+        self._material_totals: Dict[str, float] = {}
+        self._edge_banding_totals: Dict[str, float] = {}
+        self._material_costs: Dict[str, Dict] = {}
+        self._layouts: Dict[str, Dict] = {}
+        self._dirty_materials = set()
+        self._dirty_edge_banding = set()
+        self._module_hardware_total = 0.0
+        self._last_result: Optional[Dict] = None
+
+    @staticmethod
+    def catalog_hash(materials_db: Union[MaterialCatalog, List[Dict]], cutting_service: Dict) -> Tuple:
+        if isinstance(materials_db, MaterialCatalog):
+            materials_version = materials_db.version
+        else:
+            materials_version = MaterialCatalog.version_of(materials_db)
+        return (materials_version, structural_digest(cutting_service))
+
+    def matches_catalog(self, materials_db: Union[MaterialCatalog, List[Dict]], cutting_service: Dict) -> bool:
+        """Indica si la calculadora se construyó con este catálogo y configuración de corte."""
+        return self.catalog_fingerprint == self.catalog_hash(materials_db, cutting_service)
+
+    # ---------- Aportes por elemento ----------
+
+    @staticmethod
+    def item_fingerprint(item: Dict) -> str:
+        """Huella barata (repr en C) del elemento; un falso cambio solo implica recalcularlo."""
+        return repr(item)
+
+    def _build_contribution(self, section: str, item: Dict, fingerprint: str) -> _ItemContribution:
+        hardware_total = 0.0
+        if section == 'modules':
+            surfaces = CalculationService.calculate_module_surfaces(item)
+            surfaces.extend(CalculationService.calculate_drawer_surfaces(item))
+            hardware_total = CalculationService.calculate_module_hardware_total([item])
+        elif section == 'shelves':
+            surfaces = [CalculationService.calculate_shelf_surface(item)]
+        else:
+            surfaces = [CalculationService.calculate_wood_surface(item)]
+        material_m2 = CalculationService.group_surfaces_by_material(surfaces)
+        edge_banding_m = EdgeBandingService.metres_from_surfaces(surfaces, self.materials_dict)
+        return _ItemContribution(fingerprint, surfaces, material_m2, edge_banding_m, hardware_total)
+
+    def _apply(self, contribution: _ItemContribution):
+        """Marca los materiales del aporte (que entra o sale) para volver a sumarlos."""
+        self._dirty_materials.update(contribution.material_m2)
+        self._dirty_edge_banding.update(contribution.edge_banding_m)
+
+    def _resum_totals(self, totals: Dict[str, float], attribute: str, keys: Iterable[str]):
+        """Vuelve a sumar desde los aportes cacheados los subtotales de `keys` (los que quedan sin aportes se quitan)."""
+        keys = set(keys)
+        if not keys:
+            return
+        sums: Dict[str, float] = {}
+        for section in self.SECTIONS:
+            for contribution in self._items[section]:
+                for key, value in getattr(contribution, attribute).items():
+                    if key in keys:
+                        sums[key] = sums.get(key, 0.0) + value
+        for key in keys:
+            if key in sums:
+                totals[key] = sums[key]
+            else:
+                totals.pop(key, None)
+
+    def _sync_section(self, section: str, items: List[Dict], indices: Optional[Iterable[int]] = None) -> bool:
+        cached = self._items[section]
+        changed = False
+        if indices is None or len(items) != len(cached):
+            candidates = range(len(items))
+        else:
+            candidates = sorted(idx for idx in set(indices) if 0 <= idx < len(items))
+        for idx in candidates:
+            item = items[idx]
+            fingerprint = self.item_fingerprint(item)
+            if idx < len(cached) and cached[idx].fingerprint == fingerprint:
+                continue
+            contribution = self._build_contribution(section, item, fingerprint)
+            if idx < len(cached):
+                self._apply(cached[idx])
+                cached[idx] = contribution
+            else:
+                cached.append(contribution)
+            self._apply(contribution)
+            changed = True
+
+        while len(cached) > len(items):
+            self._apply(cached.pop())
+            changed = True
+        return changed
+
+    # ---------- Resultado ----------
+
+    def _refresh_material_costs(self):
+        self._resum_totals(self._material_totals, 'material_m2', self._dirty_materials)
+        self._resum_totals(self._edge_banding_totals, 'edge_banding_m', self._dirty_edge_banding)
+        self._dirty_edge_banding.clear()
+        self._module_hardware_total = sum(
+            contribution.hardware_total for contribution in self._items['modules']
+        )
+
+        nest_targets = []
+        for material in self._dirty_materials:
+            if material not in self._material_totals or material not in self.materials_dict:
+                self._material_costs.pop(material, None)
+                self._layouts.pop(material, None)
+                continue
+            mat = self.materials_dict[material]
+            self._material_costs[material] = CalculationService.calculate_material_cost(
+                self._material_totals[material],
+                mat.get('waste_factor', 0.0),
+                mat.get('board_height_mm', 0),
+                mat.get('board_width_mm', 0),
+                mat.get('board_price', 0.0)
+            )
+            nest_targets.append(material)
+        self._dirty_materials.clear()
+
+        if self.use_nesting and nest_targets:
+            targets = set(nest_targets)
+            pieces_by_material = NestingService.pieces_from_surfaces(
+                surface
+                for section in self.SECTIONS
+                for contribution in self._items[section]
+                for surface in contribution.surfaces
+                if surface['material'] in targets
+            )
+            # Como en el cálculo completo, los materiales sin piezas (0 m²) no tienen despiece
+            for material in targets.difference(pieces_by_material):
+                self._layouts.pop(material, None)
+            layouts = NestingService.nest_materials(
+                pieces_by_material,
+                self.materials_dict,
+                self.cutting_service.get('kerf_mm'),
+                self.nesting_heuristic,
+                self.nesting_workers
+            )
+            self._layouts.update(layouts)
+            NestingService.apply_to_material_costs(self._material_costs, layouts)
+
+    def sync(self, project_data: Dict, changed: Optional[Dict[str, Iterable[int]]] = None) -> Dict:
+        """
+        Actualiza los elementos modificados y devuelve el cálculo completo del proyecto.
+
+        `changed` ({'modules': [2], 'shelves': []}) limita la revisión a esos índices;
+        las secciones omitidas no se revisan. Si cambia la cantidad de elementos de
+        una sección, esa sección se revisa completa.
+        """
+        for section in self.SECTIONS:
+            items = project_data.get(section, [])
+            if changed is not None and section not in changed and len(items) == len(self._items[section]):
+                continue
+            indices = changed.get(section) if changed is not None else None
+            self._sync_section(section, items, indices)
+        self._refresh_material_costs()
+
+        material_costs = {
+            key: self._material_costs[key]
+            for key in self._material_totals
+            if key in self._material_costs
+        }
+        total_m2_con_desperdicio = 0.0
+        for cost_data in material_costs.values():
+            total_m2_con_desperdicio += cost_data['m2_con_desperdicio']
+
+        edge_banding_m = dict(self._edge_banding_totals)
+        edge_banding_cost = EdgeBandingService.calculate_cost(
+            edge_banding_m,
+            self.cutting_service.get('price_per_m_canto', 0.0)
+        )
+        cutting_cost = CalculationService.calculate_cutting_cost(
+            total_m2_con_desperdicio,
+            self.cutting_service.get('price_per_m2', 0.0),
+            self.cutting_service.get('waste_factor', 0.0)
+        ) + edge_banding_cost
+        hardware_total = (
+            CalculationService.calculate_hardware_total(project_data.get('hardwares', []))
+            + self._module_hardware_total
+        )
+        total_calculated = CalculationService.calculate_project_total(
+            material_costs,
+            cutting_cost,
+            hardware_total,
+            project_data.get('labor_cost_project', 0.0),
+            project_data.get('extra_complexity', 0.0)
+        )
+
+        all_surfaces = []
+        for section in self.SECTIONS:
+            for contribution in self._items[section]:
+                all_surfaces.extend(contribution.surfaces)
+
+        self._last_result = {
+            'all_surfaces': all_surfaces,
+            'material_totals': dict(self._material_totals),
+            'material_costs': material_costs,
+            'cutting_cost': cutting_cost,
+            'hardware_total': hardware_total,
+            'total_calculated': total_calculated,
+            'total_m2_con_desperdicio': total_m2_con_desperdicio,
+            'edge_banding_m': edge_banding_m,
+            'edge_banding_cost': edge_banding_cost,
+            'labor_cost_project': project_data.get('labor_cost_project', 0.0),
+            'extra_complexity': project_data.get('extra_complexity', 0.0),
+        }
+        if self.use_nesting:
+            self._last_result['nesting'] = {key: self._layouts[key] for key in material_costs if key in self._layouts}
+        return self.with_final_price(project_data.get('final_price', total_calculated))
+
+    def with_final_price(self, final_price: float) -> Dict:
+        """Recalcula solo mano de obra y descuento para factura con un nuevo precio final."""
+        if self._last_result is None:
+            raise ValueError("sync() debe ejecutarse antes de with_final_price()")
+
+        base = self._last_result
+        labor_invoice_raw = CalculationService.calculate_labor_for_invoice(
+            base['labor_cost_project'],
+            base['extra_complexity'],
+            final_price,
+            base['total_calculated']
+        )
+        results = {
+            'all_surfaces': base['all_surfaces'],
+            'material_totals': base['material_totals'],
+            'material_costs': base['material_costs'],
+            'cutting_cost': base['cutting_cost'],
+            'hardware_total': base['hardware_total'],
+            'total_calculated': base['total_calculated'],
+            'final_price': final_price,
+            'labor_for_invoice': max(0.0, labor_invoice_raw),
+            'discount_for_invoice': max(0.0, -labor_invoice_raw),
+            'total_m2_con_desperdicio': base['total_m2_con_desperdicio'],
+            'edge_banding_m': base['edge_banding_m'],
+            'edge_banding_cost': base['edge_banding_cost']
+        }
+        if 'nesting' in base:
+            results['nesting'] = base['nesting']
+        return results
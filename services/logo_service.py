@@ -0,0 +1,60 @@
+from io import BytesIO
+from typing import Optional
+
+from PIL import Image as PILImage
+
+
+class PreparedLogo:
+    """Logo listo para insertar en el PDF: JPEG ya reducido y su tamaño en píxeles."""
+
+    __slots__ = ('data', 'width', 'height', 'version')
+
+    def __init__(self, data: bytes, width: int, height: int, version: Optional[str] = None):
+        self.data = data
+        self.width = width
+        self.height = height
+        self.version = version
+
+    def open(self) -> BytesIO:
+        """Archivo en memoria para `reportlab.platypus.Image` (cada PDF necesita el suyo)."""
+        return BytesIO(self.data)
+
+
+class LogoService:
+    """
+    Variante del logo para los PDFs.
+
+    El logo se muestra a 2,4 cm en el presupuesto, así que se guarda una copia
+    reducida (lado mayor `PDF_MAX_PX`, ~300 ppp) en JPEG sobre fondo blanco:
+    ReportLab inserta los JPEG tal cual, sin volver a decodificar la imagen.
+    """
+
+    PDF_MAX_PX = 300
+    PDF_JPEG_QUALITY = 92
+
+    @staticmethod
+    def prepare_pdf_logo(file_bytes: bytes) -> bytes:
+        """Reduce y recomprime el logo subido; lanza excepción si no es una imagen válida."""
+        with PILImage.open(BytesIO(file_bytes)) as image:
+            image.load()
+            if image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info):
+                # La transparencia se aplana sobre blanco, el fondo del encabezado del PDF
+                image = image.convert('RGBA')
+                background = PILImage.new('RGB', image.size, (255, 255, 255))
+                background.paste(image, mask=image.getchannel('A'))
+                image = background
+            elif image.mode != 'RGB':
+                image = image.convert('RGB')
+            image.thumbnail((LogoService.PDF_MAX_PX, LogoService.PDF_MAX_PX), PILImage.LANCZOS)
+
+            output = BytesIO()
+            # subsampling=0 mantiene nítidos los bordes del texto del logo
+            image.save(output, format='JPEG', quality=LogoService.PDF_JPEG_QUALITY, subsampling=0, optimize=True)
+            return output.getvalue()
+
+    @staticmethod
+    def load_prepared(data: bytes, version: Optional[str] = None) -> PreparedLogo:
+        """Lee solo las dimensiones de la variante ya preparada."""
+        with PILImage.open(BytesIO(data)) as image:
+            width, height = image.size
+        return PreparedLogo(data, width, height, version)
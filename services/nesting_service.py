@@ -0,0 +1,434 @@
+import math
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, CancelledError, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+# Pieza expandida: (largo_mm, ancho_mm, descripcion); el largo va en el sentido de la veta
+Piece = Tuple[float, float, str]
+
+
+class _Board:
+    """Tabla abierta durante el nesting con sus rectángulos libres."""
+
+    __slots__ = ('free', 'placements', 'used_area', 'max_free_x', 'max_free_y')
+
+    def __init__(self, length: float, width: float):
+        self.free: List[Tuple[float, float, float, float]] = [(0.0, 0.0, length, width)]
+        self.placements: List[Dict] = []
+        self.used_area = 0.0
+        self.max_free_x = length
+        self.max_free_y = width
+
+    def refresh_bounds(self):
+        self.max_free_x = max((rect[2] for rect in self.free), default=0.0)
+        self.max_free_y = max((rect[3] for rect in self.free), default=0.0)
+
+
+class NestingService:
+    """
+    Despiece real de tablas (cutting stock 2D) a partir de las piezas del proyecto.
+
+    Coordenadas en mm: `x` recorre el alto de la tabla (`board_height_mm`, sentido de
+    la veta) e `y` su ancho. Cada pieza se coloca con su largo sobre `x`; si el
+    material no tiene veta también se prueba girada. El kerf (grosor de la sierra) se
+    suma a cada pieza y a la tabla, así las piezas quedan separadas por un corte y
+    las del borde no pierden material.
+
+    Heurísticas:
+    - 'guillotine': cortes de lado a lado como en una seccionadora (por defecto)
+    - 'maxrects': rectángulos libres maximales, suele usar menos tablas
+    - 'best': ejecuta ambas y se queda con la de menos tablas
+
+    Cada material es independiente: con varios materiales y suficientes piezas
+    `nest_materials` los reparte en un pool de procesos. Cada material tiene un
+    presupuesto de tiempo; si se agota, las piezas restantes se estiman por área
+    (`timed_out` y `estimated_boards` en el resultado).
+    """
+
+    HEURISTICS = ('guillotine', 'maxrects', 'best')
+    DEFAULT_HEURISTIC = 'guillotine'
+    DEFAULT_KERF_MM = 4.0
+    DEFAULT_TIME_BUDGET_S = 2.0
+    # Por debajo de estas piezas el costo de enviar el trabajo a otro proceso no compensa
+    PARALLEL_MIN_PIECES = 300
+
+    # ---------- Piezas ----------
+
+    @staticmethod
+    def pieces_from_surfaces(all_surfaces: Iterable[Dict]) -> Dict[str, List[Tuple[float, float, int, str]]]:
+        """Agrupa las superficies del cálculo por material como (largo, ancho, cantidad, descripción)."""
+        pieces_by_material: Dict[str, List[Tuple[float, float, int, str]]] = {}
+        for surface in all_surfaces:
+            quantity = int(surface.get('cantidad', 0) or 0)
+            if quantity <= 0 or 'largo_mm' not in surface:
+                continue
+            pieces_by_material.setdefault(surface['material'], []).append((
+                float(surface['largo_mm']),
+                float(surface['ancho_mm']),
+                quantity,
+                surface.get('descripcion', ''),
+            ))
+        return pieces_by_material
+
+    @staticmethod
+    def expand_pieces(grouped: List[Tuple[float, float, int, str]]) -> List[Piece]:
+        """Expande cantidades y ordena de mayor a menor (lado mayor y luego área)."""
+        pieces: List[Piece] = []
+        for largo, ancho, quantity, description in grouped:
+            if largo <= 0 or ancho <= 0:
+                continue
+            pieces.extend([(largo, ancho, description)] * quantity)
+        pieces.sort(key=lambda piece: (-max(piece[0], piece[1]), -(piece[0] * piece[1]), piece[2]))
+        return pieces
+
+    # ---------- Colocación ----------
+
+    @staticmethod
+    def _orientations(largo: float, ancho: float, kerf: float, grain: bool):
+        yield largo + kerf, ancho + kerf, False
+        if not grain and largo != ancho:
+            yield ancho + kerf, largo + kerf, True
+
+    @staticmethod
+    def _guillotine_place(board: _Board, largo: float, ancho: float, kerf: float, grain: bool):
+        """Best Area Fit; el sobrante se divide por el eje más corto."""
+        best = None
+        for index, (fx, fy, fw, fh) in enumerate(board.free):
+            for w, h, rotated in NestingService._orientations(largo, ancho, kerf, grain):
+                if w <= fw and h <= fh:
+                    score = (fw * fh - w * h, min(fw - w, fh - h))
+                    if best is None or score < best[0]:
+                        best = (score, index, w, h, rotated)
+        if best is None:
+            return None
+
+        _, index, w, h, rotated = best
+        fx, fy, fw, fh = board.free.pop(index)
+        rest_w, rest_h = fw - w, fh - h
+        if rest_w < rest_h:
+            # Corte horizontal: la franja de arriba ocupa todo el ancho libre
+            right = (fx + w, fy, rest_w, h)
+            top = (fx, fy + h, fw, rest_h)
+        else:
+            right = (fx + w, fy, rest_w, fh)
+            top = (fx, fy + h, w, rest_h)
+        for rect in (right, top):
+            if rect[2] > kerf and rect[3] > kerf:
+                board.free.append(rect)
+        return fx, fy, rotated
+
+    @staticmethod
+    def _maxrects_place(board: _Board, largo: float, ancho: float, kerf: float, grain: bool):
+        """Best Short Side Fit con poda de rectángulos contenidos."""
+        best = None
+        for fx, fy, fw, fh in board.free:
+            for w, h, rotated in NestingService._orientations(largo, ancho, kerf, grain):
+                if w <= fw and h <= fh:
+                    score = (min(fw - w, fh - h), max(fw - w, fh - h))
+                    if best is None or score < best[0]:
+                        best = (score, fx, fy, w, h, rotated)
+        if best is None:
+            return None
+
+        _, px, py, w, h, rotated = best
+        px2, py2 = px + w, py + h
+        new_free = []
+        for rect in board.free:
+            fx, fy, fw, fh = rect
+            fx2, fy2 = fx + fw, fy + fh
+            if px >= fx2 or px2 <= fx or py >= fy2 or py2 <= fy:
+                new_free.append(rect)
+                continue
+            if px > fx:
+                new_free.append((fx, fy, px - fx, fh))
+            if px2 < fx2:
+                new_free.append((px2, fy, fx2 - px2, fh))
+            if py > fy:
+                new_free.append((fx, fy, fw, py - fy))
+            if py2 < fy2:
+                new_free.append((fx, py2, fw, fy2 - py2))
+
+        new_free = [rect for rect in new_free if rect[2] > kerf and rect[3] > kerf]
+        new_free.sort(key=lambda rect: -(rect[2] * rect[3]))
+        pruned = []
+        for fx, fy, fw, fh in new_free:
+            contained = False
+            for ox, oy, ow, oh in pruned:
+                if fx >= ox and fy >= oy and fx + fw <= ox + ow and fy + fh <= oy + oh:
+                    contained = True
+                    break
+            if not contained:
+                pruned.append((fx, fy, fw, fh))
+        board.free = pruned
+        return px, py, rotated
+
+    @staticmethod
+    def _nest(pieces: List[Piece], length: float, width: float, kerf: float, grain: bool, heuristic: str,
+              deadline: Optional[float] = None) -> Dict:
+        place = NestingService._maxrects_place if heuristic == 'maxrects' else NestingService._guillotine_place
+        boards: List[_Board] = []
+        unplaced: List[Dict] = []
+        # Primera tabla donde todavía podría entrar cada medida (las tablas solo se llenan)
+        first_candidate: Dict[Tuple[float, float], int] = {}
+        fits_empty = NestingService._fits_board
+        remaining_area = 0.0
+
+        for piece_index, (largo, ancho, description) in enumerate(pieces):
+            if deadline is not None and piece_index % 32 == 0 and time.monotonic() > deadline:
+                # Sin tiempo: el resto se estima por área (con kerf) como el cálculo clásico
+                for rest_largo, rest_ancho, rest_description in pieces[piece_index:]:
+                    if fits_empty(rest_largo + kerf, rest_ancho + kerf, length, width, grain):
+                        remaining_area += (rest_largo + kerf) * (rest_ancho + kerf)
+                    else:
+                        unplaced.append({'descripcion': rest_description, 'largo_mm': rest_largo, 'ancho_mm': rest_ancho})
+                break
+
+            if not fits_empty(largo + kerf, ancho + kerf, length, width, grain):
+                unplaced.append({'descripcion': description, 'largo_mm': largo, 'ancho_mm': ancho})
+                continue
+
+            size = (largo, ancho)
+            piece_x, piece_y = largo + kerf, ancho + kerf
+            position = None
+            board_index = first_candidate.get(size, 0)
+            while board_index < len(boards):
+                board = boards[board_index]
+                # Descarte rápido: ningún rectángulo libre es tan largo/ancho como la pieza
+                if (
+                    (piece_x <= board.max_free_x and piece_y <= board.max_free_y)
+                    or (not grain and piece_y <= board.max_free_x and piece_x <= board.max_free_y)
+                ):
+                    position = place(board, largo, ancho, kerf, grain)
+                    if position is not None:
+                        break
+                board_index += 1
+
+            if position is None:
+                board = _Board(length, width)
+                boards.append(board)
+                board_index = len(boards) - 1
+                position = place(board, largo, ancho, kerf, grain)
+
+            first_candidate[size] = board_index
+            x, y, rotated = position
+            board.placements.append({
+                'descripcion': description,
+                'x_mm': x,
+                'y_mm': y,
+                'largo_mm': largo,
+                'ancho_mm': ancho,
+                'girada': rotated,
+            })
+            board.used_area += largo * ancho
+            board.refresh_bounds()
+
+        result = NestingService._build_result(boards, unplaced, length, width, kerf, heuristic)
+        if remaining_area > 0:
+            estimated = math.ceil(remaining_area / (length * width))
+            result['timed_out'] = True
+            result['estimated_boards'] = estimated
+            result['boards_needed'] += estimated
+        return result
+
+    @staticmethod
+    def _fits_board(largo: float, ancho: float, length: float, width: float, grain: bool) -> bool:
+        if largo <= length and ancho <= width:
+            return True
+        return not grain and ancho <= length and largo <= width
+
+    @staticmethod
+    def _build_result(boards: List[_Board], unplaced: List[Dict], length: float, width: float,
+                      kerf: float, heuristic: str) -> Dict:
+        board_area = (length - kerf) * (width - kerf)
+        board_results = []
+        total_used = 0.0
+        for index, board in enumerate(boards):
+            total_used += board.used_area
+            board_results.append({
+                'index': index + 1,
+                'placements': board.placements,
+                'used_m2': board.used_area / 1_000_000,
+                'utilization': board.used_area / board_area if board_area > 0 else 0.0,
+            })
+        return {
+            'heuristic': heuristic,
+            'boards_needed': len(boards),
+            'boards': board_results,
+            'unplaced': unplaced,
+            'board_height_mm': length - kerf,
+            'board_width_mm': width - kerf,
+            'kerf_mm': kerf,
+            'utilization': total_used / (board_area * len(boards)) if boards and board_area > 0 else 0.0,
+            'timed_out': False,
+            'estimated_boards': 0,
+        }
+
+    # ---------- API ----------
+
+    @staticmethod
+    def nest_pieces(grouped: List[Tuple[float, float, int, str]],
+                    board_height_mm: float,
+                    board_width_mm: float,
+                    kerf_mm: float = DEFAULT_KERF_MM,
+                    grain: bool = False,
+                    heuristic: str = DEFAULT_HEURISTIC,
+                    time_budget_s: Optional[float] = None) -> Dict:
+        """
+        Calcula las tablas necesarias y la ubicación de cada pieza en ellas.
+
+        `grouped` es la lista de (largo, ancho, cantidad, descripción) de un material.
+        Las piezas más grandes que la tabla se devuelven en `unplaced`.
+        """
+        if heuristic not in NestingService.HEURISTICS:
+            raise ValueError(f"Heurística de nesting desconocida: {heuristic}")
+        deadline = time.monotonic() + time_budget_s if time_budget_s is not None else None
+
+        kerf = max(0.0, float(kerf_mm or 0.0))
+        length = float(board_height_mm or 0) + kerf
+        width = float(board_width_mm or 0) + kerf
+        pieces = NestingService.expand_pieces(grouped)
+        if length <= kerf or width <= kerf:
+            unplaced = [{'descripcion': d, 'largo_mm': l, 'ancho_mm': a} for l, a, d in pieces]
+            return NestingService._build_result([], unplaced, length, width, kerf, heuristic)
+
+        if heuristic != 'best':
+            return NestingService._nest(pieces, length, width, kerf, bool(grain), heuristic, deadline)
+
+        best = NestingService._nest(pieces, length, width, kerf, bool(grain), 'guillotine', deadline)
+        if best['timed_out']:
+            return best
+        candidate = NestingService._nest(pieces, length, width, kerf, bool(grain), 'maxrects', deadline)
+        if not candidate['timed_out'] and candidate['boards_needed'] < best['boards_needed']:
+            return candidate
+        return best
+
+    @staticmethod
+    def nest_materials(pieces_by_material: Dict[str, List[Tuple[float, float, int, str]]],
+                       materials_dict: Dict[str, Dict],
+                       kerf_mm: Optional[float] = None,
+                       heuristic: str = DEFAULT_HEURISTIC,
+                       max_workers: Optional[int] = None,
+                       time_budget_s: Optional[float] = DEFAULT_TIME_BUDGET_S) -> Dict[str, Dict]:
+        """
+        Ejecuta el nesting de cada material del catálogo presente en el proyecto.
+
+        `max_workers`: None decide según la cantidad de piezas y de CPUs, 1 fuerza
+        el cálculo secuencial. El resultado se arma siempre en el orden de las claves
+        de material, sin importar qué proceso termina primero.
+        """
+        kerf = NestingService.DEFAULT_KERF_MM if kerf_mm is None else kerf_mm
+        tasks = []
+        total_pieces = 0
+        for material_key in sorted(pieces_by_material):
+            mat = materials_dict.get(material_key)
+            if mat is None:
+                continue
+            grouped = pieces_by_material[material_key]
+            total_pieces += sum(quantity for _, _, quantity, _ in grouped)
+            tasks.append((material_key, (
+                grouped,
+                mat.get('board_height_mm', 0),
+                mat.get('board_width_mm', 0),
+                kerf,
+                mat.get('grain', False),
+                heuristic,
+                time_budget_s,
+            )))
+
+        workers = NestingService._resolve_workers(max_workers, len(tasks), total_pieces)
+        if workers > 1:
+            pool = None
+            try:
+                pool = _get_process_pool()
+                return _run_on_pool(pool, tasks, workers)
+            except BrokenProcessPool:
+                # Un worker murió: el pool roto se descarta y el próximo pedido crea otro
+                _discard_process_pool(pool)
+            except (CancelledError, OSError, RuntimeError):
+                # Pool no disponible (p. ej. sin permisos para crear procesos): se sigue en secuencial
+                pass
+
+        return {material_key: NestingService.nest_pieces(*args) for material_key, args in tasks}
+
+    @staticmethod
+    def _resolve_workers(max_workers: Optional[int], task_count: int, total_pieces: int) -> int:
+        if task_count < 2:
+            return 1
+        if max_workers is None:
+            if total_pieces < NestingService.PARALLEL_MIN_PIECES:
+                return 1
+            max_workers = os.cpu_count() or 1
+        return max(1, min(max_workers, task_count))
+
+    @staticmethod
+    def apply_to_material_costs(material_costs: Dict[str, Dict], layouts: Dict[str, Dict]) -> Dict[str, Dict]:
+        """Reemplaza las tablas estimadas por área con las del despiece real."""
+        for material_key, layout in layouts.items():
+            cost_data = material_costs.get(material_key)
+            if cost_data is None:
+                continue
+            cost_data['boards_needed'] = layout['boards_needed']
+            cost_data['material_cost'] = layout['boards_needed'] * cost_data['board_price']
+        return material_costs
+
+
+def _nest_material_task(args) -> Dict:
+    """Tarea del pool: nesting de un material (función de módulo para poder serializarla)."""
+    return NestingService.nest_pieces(*args)
+
+
+def _run_on_pool(pool: ProcessPoolExecutor, tasks: List[Tuple[str, tuple]], workers: int) -> Dict[str, Dict]:
+    """
+    Reparte las tareas en el pool compartido con como máximo `workers` en curso a la vez.
+
+    El pool tiene un tamaño fijo; la concurrencia de cada llamada se limita por la
+    cantidad de tareas enviadas, así otras sesiones conservan su parte del pool.
+    """
+    results: Dict[str, Dict] = {}
+    pending_tasks = iter(tasks)
+    in_flight = {}
+    for material_key, args in pending_tasks:
+        in_flight[pool.submit(_nest_material_task, args)] = material_key
+        if len(in_flight) >= workers:
+            break
+    while in_flight:
+        done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+        for future in done:
+            results[in_flight.pop(future)] = future.result()
+            next_task = next(pending_tasks, None)
+            if next_task is not None:
+                in_flight[pool.submit(_nest_material_task, next_task[1])] = next_task[0]
+    # Mismo orden de claves que el cálculo secuencial
+    return {material_key: results[material_key] for material_key, _ in tasks}
+
+
+_pool_lock = threading.Lock()
+_process_pool: Optional[ProcessPoolExecutor] = None
+# Tamaño fijo del pool compartido por todas las sesiones del proceso
+_PROCESS_POOL_WORKERS = os.cpu_count() or 1
+
+
+def _get_process_pool() -> ProcessPoolExecutor:
+    """Pool compartido por el proceso; se crea una vez con `_PROCESS_POOL_WORKERS` workers."""
+    global _process_pool
+    with _pool_lock:
+        if _process_pool is None:
+            # 'spawn': el proceso de Streamlit tiene hilos y fork podría bloquearse
+            _process_pool = ProcessPoolExecutor(
+                max_workers=_PROCESS_POOL_WORKERS,
+                mp_context=multiprocessing.get_context('spawn'),
+            )
+        return _process_pool
+
+
+def _discard_process_pool(pool: Optional[ProcessPoolExecutor]):
+    """Olvida un pool roto (sin apagarlo: sus futuros ya fallaron) para que se cree uno nuevo."""
+    global _process_pool
+    with _pool_lock:
+        if pool is not None and _process_pool is pool:
+            _process_pool = None
@@ -1,96 +1,245 @@
 from reportlab.lib.pagesizes import A4
 from reportlab.lib.units import cm
 from reportlab.lib import colors
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, Image, KeepInFrame
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, Image, KeepInFrame, KeepTogether
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.enums import TA_CENTER, TA_RIGHT, TA_LEFT
 from io import BytesIO
 from datetime import datetime
+from functools import lru_cache
+from types import MappingProxyType
 import base64
-from typing import Dict, Optional
+import hashlib
+import json
+from typing import Dict, Optional, Union
 
-class PDFService:
-    """Servicio para generar PDFs de presupuestos"""
+from models.material_catalog import MaterialCatalog
+from services.byte_lru_cache import ByteLRUCache
+from services.drawing_service import DrawingService
+from services.logo_service import PreparedLogo
 
-    @staticmethod
-    def _create_table(data, col_widths, header_bg='#1F3A5F', alt_rows=True):
-        table = Table(data, colWidths=col_widths)
-        style = [
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor(header_bg)),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 9),
-            ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-            ('FONTSIZE', (0, 1), (-1, -1), 8.5),
-            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-            ('TOPPADDING', (0, 0), (-1, -1), 6),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
-            ('GRID', (0, 0), (-1, -1), 0.35, colors.HexColor('#D0D7DE')),
-        ]
-        if alt_rows and len(data) > 2:
-            style.append(('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#F8FAFC')]))
-        table.setStyle(TableStyle(style))
-        return table
-
-    @staticmethod
-    def generate_pdf(project_data: Dict,
-                     calculations: Dict,
-                     materials_db: Dict,
-                     logo_base64: Optional[str] = None) -> BytesIO:
-        """Genera un PDF del presupuesto."""
-        buffer = BytesIO()
-        doc = SimpleDocTemplate(
-            buffer,
-            pagesize=A4,
-            topMargin=1.6 * cm,
-            bottomMargin=1.6 * cm,
-            leftMargin=1.6 * cm,
-            rightMargin=1.6 * cm,
-        )
 
-        styles = getSampleStyleSheet()
-        title_style = ParagraphStyle(
+def _build_paragraph_styles() -> MappingProxyType:
+    base = getSampleStyleSheet()
+    normal = ParagraphStyle(
+        'CustomNormal',
+        parent=base['Normal'],
+        fontSize=9,
+        leading=12,
+        textColor=colors.HexColor('#2C3E50'),
+    )
+    return MappingProxyType({
+        'title': ParagraphStyle(
             'CustomTitle',
-            parent=styles['Heading1'],
+            parent=base['Heading1'],
             fontSize=20,
             leading=22,
             textColor=colors.HexColor('#12263A'),
             alignment=TA_LEFT,
             spaceAfter=3,
-        )
-        subtitle_style = ParagraphStyle(
+        ),
+        'subtitle': ParagraphStyle(
             'CustomSubtitle',
-            parent=styles['Normal'],
+            parent=base['Normal'],
             fontSize=9,
             textColor=colors.HexColor('#4E5D6C'),
             alignment=TA_LEFT,
             spaceAfter=12,
-        )
-        section_style = ParagraphStyle(
+        ),
+        'section': ParagraphStyle(
             'SectionTitle',
-            parent=styles['Heading2'],
+            parent=base['Heading2'],
             fontSize=11,
             leading=13,
             textColor=colors.HexColor('#1F3A5F'),
             alignment=TA_LEFT,
             spaceBefore=8,
             spaceAfter=6,
+        ),
+        'normal': normal,
+        'header_right': ParagraphStyle('HR', parent=normal, alignment=TA_RIGHT),
+    })
+
+
+@lru_cache(maxsize=8)
+def _data_table_style(header_bg: str, alt_rows: bool) -> TableStyle:
+    """Estilo de las tablas con cabecera (una instancia por color y filas alternas)."""
+    style = [
+        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor(header_bg)),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, 0), 9),
+        ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+        ('FONTSIZE', (0, 1), (-1, -1), 8.5),
+        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+        ('TOPPADDING', (0, 0), (-1, -1), 6),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
+        ('GRID', (0, 0), (-1, -1), 0.35, colors.HexColor('#D0D7DE')),
+    ]
+    if alt_rows:
+        style.append(('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#F8FAFC')]))
+    return TableStyle(style)
+
+
+def _build_table_styles() -> MappingProxyType:
+    return MappingProxyType({
+        'data': _data_table_style('#1F3A5F', False),
+        'data_alt': _data_table_style('#1F3A5F', True),
+        'header': TableStyle([
+            ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+            ('LINEBELOW', (0, 0), (-1, 0), 0.8, colors.HexColor('#1F3A5F')),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
+        ]),
+        'client': TableStyle([
+            ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#F1F5F9')),
+            ('TEXTCOLOR', (0, 0), (-1, -1), colors.HexColor('#12263A')),
+            ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
+            ('FONTNAME', (1, 0), (1, -1), 'Helvetica'),
+            ('FONTSIZE', (0, 0), (-1, -1), 9),
+            ('ALIGN', (0, 0), (0, -1), 'LEFT'),
+            ('ALIGN', (1, 0), (1, -1), 'LEFT'),
+            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+            ('TOPPADDING', (0, 0), (-1, -1), 6),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
+            ('GRID', (0, 0), (-1, -1), 0.35, colors.HexColor('#D0D7DE')),
+        ]),
+        # Importes alineados a la derecha desde la segunda columna
+        'amounts': TableStyle([
+            ('ALIGN', (1, 1), (-1, -1), 'RIGHT'),
+        ]),
+        'summary': TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#12263A')),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, 0), 9.5),
+            ('FONTNAME', (0, 1), (-1, -2), 'Helvetica'),
+            ('FONTSIZE', (0, 1), (-1, -2), 9),
+            ('BACKGROUND', (0, -1), (-1, -1), colors.HexColor('#1E8449')),
+            ('TEXTCOLOR', (0, -1), (-1, -1), colors.white),
+            ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, -1), (-1, -1), 11),
+            ('ALIGN', (1, 1), (1, -1), 'RIGHT'),
+            ('TOPPADDING', (0, 0), (-1, -1), 7),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 7),
+            ('GRID', (0, 0), (-1, -1), 0.35, colors.HexColor('#D0D7DE')),
+            ('ROWBACKGROUNDS', (0, 1), (-1, -2), [colors.white, colors.HexColor('#F8FAFC')]),
+        ]),
+    })
+
+
+# Estilos construidos una vez al importar y compartidos por todos los PDFs (solo lectura)
+PARAGRAPH_STYLES = _build_paragraph_styles()
+TABLE_STYLES = _build_table_styles()
+
+
+class _Amount(str):
+    """Importe ya formateado que conserva su valor para las sumas por página."""
+
+    def __new__(cls, value: float, text: Optional[str] = None):
+        amount = super().__new__(cls, text if text is not None else f"{value:.2f} €")
+        amount.value = value
+        return amount
+
+
+class _PagedDocTemplate(SimpleDocTemplate):
+    """
+    Documento del modo multipágina: al pie de cada página imprime el número de
+    página, la suma de los importes dibujados en ella y el acumulado ("suma y sigue").
+    """
+
+    def __init__(self, *args, footer_title: str = '', **kwargs):
+        super().__init__(*args, **kwargs)
+        self.footer_title = footer_title
+        self.page_total = 0.0
+        self.running_total = 0.0
+
+    def afterFlowable(self, flowable):
+        # Las tablas partidas llegan aquí trozo a trozo, cada uno en la página donde se dibujó
+        if isinstance(flowable, Table):
+            for row in flowable._cellvalues:
+                for cell in row:
+                    if isinstance(cell, _Amount):
+                        self.page_total += cell.value
+
+    def afterPage(self):
+        self.running_total += self.page_total
+        canvas = self.canv
+        canvas.saveState()
+        canvas.setFont('Helvetica', 8)
+        canvas.setFillColor(colors.HexColor('#4E5D6C'))
+        canvas.setStrokeColor(colors.HexColor('#D0D7DE'))
+        y = self.bottomMargin - 0.5 * cm
+        canvas.line(self.leftMargin, y + 0.35 * cm, self.pagesize[0] - self.rightMargin, y + 0.35 * cm)
+        canvas.drawString(self.leftMargin, y, f"{self.footer_title} · Página {canvas.getPageNumber()}")
+        canvas.drawRightString(
+            self.pagesize[0] - self.rightMargin,
+            y,
+            f"Suma de esta página: {self.page_total:.2f} €   Suma y sigue: {self.running_total:.2f} €",
         )
-        normal_style = ParagraphStyle(
-            'CustomNormal',
-            parent=styles['Normal'],
-            fontSize=9,
-            leading=12,
-            textColor=colors.HexColor('#2C3E50'),
-        )
+        canvas.restoreState()
+        self.page_total = 0.0
+
+
+class PDFService:
+    """Servicio para generar PDFs de presupuestos"""
+
+    # Presupuesto de memoria de la caché de PDFs (compartida por todas las sesiones)
+    PDF_CACHE_MAX_BYTES = 32 * 1024 * 1024
+    # Campos del cálculo que aparecen en el PDF
+    PDF_CALCULATION_FIELDS = (
+        'material_costs', 'cutting_cost', 'hardware_total',
+        'labor_for_invoice', 'discount_for_invoice', 'final_price',
+    )
+    # Filas de detalle (materiales, servicios y herrajes) a partir de las cuales el PDF
+    # pasa de una página reducida a varias páginas con tamaño de letra normal
+    MULTIPAGE_ROW_THRESHOLD = 40
+    PAGE_MARGIN = 1.6 * cm
+    # Alto máximo del alzado del proyecto dentro del PDF
+    ELEVATION_MAX_HEIGHT = 8 * cm
+
+    @staticmethod
+    def _create_table(data, col_widths, header_bg='#1F3A5F', alt_rows=True):
+        # repeatRows: si la tabla se parte entre páginas, cada trozo repite la cabecera
+        table = Table(data, colWidths=col_widths, repeatRows=1)
+        table.setStyle(_data_table_style(header_bg, bool(alt_rows and len(data) > 2)))
+        return table
+
+    @staticmethod
+    def generate_pdf(project_data: Dict,
+                     calculations: Dict,
+                     materials_db: Union[MaterialCatalog, Dict[str, Dict]],
+                     logo_base64: Optional[str] = None,
+                     logo_image: Optional[PreparedLogo] = None,
+                     multipage: Optional[bool] = None,
+                     include_elevation: bool = False) -> BytesIO:
+        """
+        Genera un PDF del presupuesto.
+
+        `logo_image` (ver FirebaseService.get_pdf_logo) evita decodificar y escalar el
+        logo original; si se indica, `logo_base64` no se usa.
+
+        `multipage=None` elige el formato según las filas de detalle: hasta
+        MULTIPAGE_ROW_THRESHOLD todo se reduce a una página; por encima, el contenido
+        fluye en varias páginas con cabeceras de tabla repetidas y sumas al pie.
+
+        `include_elevation` agrega el alzado de todo el proyecto como dibujo vectorial.
+        """
+        materials_db = MaterialCatalog.coerce(materials_db)
+        buffer = BytesIO()
+
+        title_style = PARAGRAPH_STYLES['title']
+        subtitle_style = PARAGRAPH_STYLES['subtitle']
+        section_style = PARAGRAPH_STYLES['section']
+        normal_style = PARAGRAPH_STYLES['normal']
 
-        story = []
         content_story = []
 
         # Encabezado con logo + datos de emisión
         header_left = []
-        if logo_base64:
+        if logo_image is not None:
+            header_left.append(Image(logo_image.open(), width=2.4 * cm, height=2.4 * cm, kind='proportional'))
+        elif logo_base64:
             try:
                 logo_bytes = base64.b64decode(logo_base64)
                 logo_buffer = BytesIO(logo_bytes)
@@ -112,13 +261,9 @@ class PDFService:
             f"<b>Fecha proyecto:</b> {project_date}<br/>"
             f"<b>Estado:</b> {project_data.get('status', 'Activo')}"
         )
-        header_data = [[header_left, Paragraph(header_right_text, ParagraphStyle('HR', parent=normal_style, alignment=TA_RIGHT))]]
+        header_data = [[header_left, Paragraph(header_right_text, PARAGRAPH_STYLES['header_right'])]]
         header_table = Table(header_data, colWidths=[11.5 * cm, 5.1 * cm])
-        header_table.setStyle(TableStyle([
-            ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-            ('LINEBELOW', (0, 0), (-1, 0), 0.8, colors.HexColor('#1F3A5F')),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
-        ]))
+        header_table.setStyle(TABLE_STYLES['header'])
         content_story.append(header_table)
         content_story.append(Spacer(1, 0.35 * cm))
 
@@ -128,19 +273,7 @@ class PDFService:
             ['Proyecto', project_data.get('name', '—')],
         ]
         client_table = Table(client_data, colWidths=[3.2 * cm, 13.4 * cm])
-        client_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#F1F5F9')),
-            ('TEXTCOLOR', (0, 0), (-1, -1), colors.HexColor('#12263A')),
-            ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-            ('FONTNAME', (1, 0), (1, -1), 'Helvetica'),
-            ('FONTSIZE', (0, 0), (-1, -1), 9),
-            ('ALIGN', (0, 0), (0, -1), 'LEFT'),
-            ('ALIGN', (1, 0), (1, -1), 'LEFT'),
-            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-            ('TOPPADDING', (0, 0), (-1, -1), 6),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
-            ('GRID', (0, 0), (-1, -1), 0.35, colors.HexColor('#D0D7DE')),
-        ]))
+        client_table.setStyle(TABLE_STYLES['client'])
         content_story.append(client_table)
         content_story.append(Spacer(1, 0.45 * cm))
 
@@ -149,19 +282,16 @@ class PDFService:
         material_data = [['Material', 'm² con desperdicio', 'Tablas', 'Importe']] if calculations['material_costs'] else [['Material', 'm² con desperdicio', 'Tablas', 'Importe'], ['Sin materiales', '-', '-', '0.00 €']]
 
         for material_key, cost_data in calculations['material_costs'].items():
-            material_info = materials_db.get(material_key, {})
-            material_name = f"{material_info.get('type', material_key)} {material_info.get('color', '')} {material_info.get('thickness_mm', '')}mm".strip()
+            material_name = materials_db.label(material_key)
             material_data.append([
                 material_name,
                 f"{cost_data['m2_con_desperdicio']:.2f}",
                 str(cost_data['boards_needed']),
-                f"{cost_data['material_cost']:.2f} €",
+                _Amount(cost_data['material_cost']),
             ])
 
         materials_table = PDFService._create_table(material_data, [8.8 * cm, 3.1 * cm, 2.2 * cm, 2.5 * cm])
-        materials_table.setStyle(TableStyle([
-            ('ALIGN', (1, 1), (-1, -1), 'RIGHT'),
-        ]),)
+        materials_table.setStyle(TABLE_STYLES['amounts'])
         content_story.append(materials_table)
         content_story.append(Spacer(1, 0.3 * cm))
 
@@ -171,18 +301,17 @@ class PDFService:
         content_story.append(Paragraph("2. Servicios y mano de obra", section_style))
         service_data = [
             ['Concepto', 'Importe'],
-            ['Corte y canto', f"{calculations['cutting_cost']:.2f} €"],
-            ['Mano de obra y montaje', f"{calculations['labor_for_invoice']:.2f} €"],
+            ['Corte y canto', _Amount(calculations['cutting_cost'])],
+            ['Mano de obra y montaje', _Amount(calculations['labor_for_invoice'])],
         ]
         discount_for_invoice = calculations.get('discount_for_invoice', 0.0)
         if discount_for_invoice > 0:
-            service_data.append(['Descuento', f"-{discount_for_invoice:.2f} €"])
+            service_data.append(['Descuento', _Amount(-discount_for_invoice, f"-{discount_for_invoice:.2f} €")])
         services_table = PDFService._create_table(service_data, [14.1 * cm, 2.5 * cm])
-        services_table.setStyle(TableStyle([
-            ('ALIGN', (1, 1), (1, -1), 'RIGHT'),
-        ]))
+        services_table.setStyle(TABLE_STYLES['amounts'])
         content_story.append(services_table)
 
+        detail_rows = len(material_data) + len(service_data) - 2
         if calculations['hardware_total'] > 0:
             content_story.append(Spacer(1, 0.3 * cm))
             content_story.append(Paragraph("3. Herrajes", section_style))
@@ -197,7 +326,7 @@ class PDFService:
                     hardware.get('type', 'Herraje'),
                     str(quantity),
                     f"{price:.2f} €",
-                    f"{total:.2f} €",
+                    _Amount(total),
                 ])
 
             for module in project_data.get('modules', []):
@@ -213,16 +342,27 @@ class PDFService:
                         f"{mod_hardware.get('type', 'Herraje')} ({module_name})",
                         str(quantity),
                         f"{price:.2f} €",
-                        f"{total:.2f} €",
+                        _Amount(total),
                     ])
             if len(hardware_data) == 1:
                 hardware_data.append(['Sin herrajes', '-', '-', '0.00 €'])
+            detail_rows += len(hardware_data) - 1
             hardware_table = PDFService._create_table(hardware_data, [9.6 * cm, 2.0 * cm, 2.4 * cm, 2.6 * cm])
-            hardware_table.setStyle(TableStyle([
-                ('ALIGN', (1, 1), (-1, -1), 'RIGHT'),
-            ]))
+            hardware_table.setStyle(TABLE_STYLES['amounts'])
             content_story.append(hardware_table)
 
+        if include_elevation:
+            elevation = DrawingService.project_elevation_drawing(
+                project_data,
+                max_width=A4[0] - 2 * PDFService.PAGE_MARGIN,
+                max_height=PDFService.ELEVATION_MAX_HEIGHT,
+            )
+            if elevation is not None:
+                section_number = 4 if calculations['hardware_total'] > 0 else 3
+                content_story.append(Spacer(1, 0.3 * cm))
+                content_story.append(Paragraph(f"{section_number}. Vista del proyecto", section_style))
+                content_story.append(elevation)
+
         content_story.append(Spacer(1, 0.55 * cm))
 
         # Resumen final
@@ -242,35 +382,107 @@ class PDFService:
             summary_data.append(['Descuento', f"-{discount_for_invoice:.2f} €"])
         summary_data.append(['TOTAL PRESUPUESTADO', f"{final_price:.2f} €"])
         summary_table = Table(summary_data, colWidths=[11.6 * cm, 5.0 * cm])
-        summary_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#12263A')),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 9.5),
-            ('FONTNAME', (0, 1), (-1, -2), 'Helvetica'),
-            ('FONTSIZE', (0, 1), (-1, -2), 9),
-            ('BACKGROUND', (0, -1), (-1, -1), colors.HexColor('#1E8449')),
-            ('TEXTCOLOR', (0, -1), (-1, -1), colors.white),
-            ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, -1), (-1, -1), 11),
-            ('ALIGN', (1, 1), (1, -1), 'RIGHT'),
-            ('TOPPADDING', (0, 0), (-1, -1), 7),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 7),
-            ('GRID', (0, 0), (-1, -1), 0.35, colors.HexColor('#D0D7DE')),
-            ('ROWBACKGROUNDS', (0, 1), (-1, -2), [colors.white, colors.HexColor('#F8FAFC')]),
-        ]))
-        content_story.append(summary_table)
+        summary_table.setStyle(TABLE_STYLES['summary'])
+        closing_story = [
+            summary_table,
+            Spacer(1, 0.5 * cm),
+            Paragraph(
+                "<b>Condiciones:</b> Presupuesto válido por 15 días. Incluye fabricación y montaje según especificaciones del proyecto.",
+                normal_style,
+            ),
+        ]
 
-        content_story.append(Spacer(1, 0.5 * cm))
-        content_story.append(Paragraph(
-            "<b>Condiciones:</b> Presupuesto válido por 15 días. Incluye fabricación y montaje según especificaciones del proyecto.",
-            normal_style,
-        ))
+        if multipage is None:
+            multipage = detail_rows > PDFService.MULTIPAGE_ROW_THRESHOLD
+        margins = dict(
+            pagesize=A4,
+            topMargin=PDFService.PAGE_MARGIN,
+            bottomMargin=PDFService.PAGE_MARGIN,
+            leftMargin=PDFService.PAGE_MARGIN,
+            rightMargin=PDFService.PAGE_MARGIN,
+        )
 
-        available_width = A4[0] - doc.leftMargin - doc.rightMargin
-        available_height = A4[1] - doc.topMargin - doc.bottomMargin
-        story.append(KeepInFrame(available_width, available_height, content_story, mode='shrink'))
+        if multipage:
+            # Sin KeepInFrame: cada flowable se maqueta una vez y las tablas se parten entre páginas
+            content_story.append(KeepTogether(closing_story))
+            doc = _PagedDocTemplate(
+                buffer,
+                footer_title=f"Presupuesto {project_data.get('name', '')}".strip(),
+                **margins,
+            )
+            doc.build(content_story)
+        else:
+            content_story.extend(closing_story)
+            doc = SimpleDocTemplate(buffer, **margins)
+            available_width = A4[0] - doc.leftMargin - doc.rightMargin
+            available_height = A4[1] - doc.topMargin - doc.bottomMargin
+            doc.build([KeepInFrame(available_width, available_height, content_story, mode='shrink')])
 
-        doc.build(story)
         buffer.seek(0)
         return buffer
+
+    # ---------- Caché ----------
+
+    @staticmethod
+    def pdf_cache_key(project_data: Dict,
+                      calculations: Dict,
+                      materials_db: Union[MaterialCatalog, Dict[str, Dict]],
+                      logo_base64: Optional[str] = None,
+                      logo_image: Optional[PreparedLogo] = None,
+                      include_elevation: bool = False) -> str:
+        """
+        Huella del contenido del PDF: proyecto, cálculos mostrados, materiales
+        usados, logo, alzado y fecha de emisión (el PDF la imprime).
+        """
+        materials_db = MaterialCatalog.coerce(materials_db)
+        content = {
+            'project': project_data,
+            'calculations': {field: calculations.get(field) for field in PDFService.PDF_CALCULATION_FIELDS},
+            'materials': {key: materials_db.get(key) for key in calculations.get('material_costs', {})},
+            'issue_date': datetime.now().strftime('%d/%m/%Y'),
+        }
+        if include_elevation:
+            content['elevation'] = True
+        digest = hashlib.sha256(
+            json.dumps(content, sort_keys=True, default=str, ensure_ascii=False).encode('utf-8')
+        )
+        if logo_image is not None:
+            digest.update(f"|logo_image:{logo_image.version}:{len(logo_image.data)}".encode('utf-8'))
+        elif logo_base64:
+            # El hash de un str queda guardado en el objeto: no se recorre el logo en cada rerun
+            digest.update(f"|logo:{len(logo_base64)}:{hash(logo_base64)}".encode('ascii'))
+        return digest.hexdigest()
+
+    @staticmethod
+    def get_cached_pdf(cache_key: str) -> Optional[bytes]:
+        """PDF ya generado para esa huella, o None."""
+        return _pdf_cache.get(cache_key)
+
+    @staticmethod
+    def generate_pdf_cached(project_data: Dict,
+                            calculations: Dict,
+                            materials_db: Union[MaterialCatalog, Dict[str, Dict]],
+                            logo_base64: Optional[str] = None,
+                            cache_key: Optional[str] = None,
+                            logo_image: Optional[PreparedLogo] = None,
+                            include_elevation: bool = False) -> bytes:
+        """Como `generate_pdf`, pero reutiliza el PDF si el contenido no cambió."""
+        if cache_key is None:
+            cache_key = PDFService.pdf_cache_key(
+                project_data, calculations, materials_db, logo_base64, logo_image, include_elevation
+            )
+        data = _pdf_cache.get(cache_key)
+        if data is None:
+            data = PDFService.generate_pdf(
+                project_data, calculations, materials_db, logo_base64, logo_image,
+                include_elevation=include_elevation,
+            ).getvalue()
+            _pdf_cache.put(cache_key, data)
+        return data
+
+    @staticmethod
+    def clear_pdf_cache():
+        _pdf_cache.clear()
+
+
+_pdf_cache = ByteLRUCache(PDFService.PDF_CACHE_MAX_BYTES)
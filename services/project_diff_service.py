@@ -0,0 +1,146 @@
+import hashlib
+import math
+from datetime import datetime
+from typing import Any, Dict, Iterable, List
+
+from google.cloud import firestore
+from google.cloud.firestore_v1.field_path import FieldPath
+
+
+class ProjectDiffService:
+    """Calcula actualizaciones mínimas entre el último estado guardado y el borrador"""
+
+    @staticmethod
+    def values_equal(saved: Any, draft: Any) -> bool:
+        """Compara valores; las fechas se comparan por día (como el selector de fecha)."""
+        if isinstance(saved, datetime) and isinstance(draft, datetime):
+            return saved.date() == draft.date()
+        return saved == draft
+
+    @staticmethod
+    def compute_update(saved: Dict, draft: Dict) -> Dict[str, Any]:
+        """
+        Genera un mapa {ruta_de_campo: valor} con solo lo que cambió.
+
+        - Los diccionarios se recorren y generan rutas anidadas ('totals.material')
+        - Las listas (módulos, estantes, ...) se reemplazan completas si difieren
+        - Los campos que ya no existen en el borrador se eliminan con DELETE_FIELD
+        """
+        updates: Dict[str, Any] = {}
+        ProjectDiffService._diff_into(updates, [], saved or {}, draft or {})
+        return updates
+
+    @staticmethod
+    def _diff_into(updates: Dict[str, Any], path: List[str], saved: Dict, draft: Dict):
+        for key, draft_value in draft.items():
+            field_path = path + [str(key)]
+            if key not in saved:
+                updates[ProjectDiffService._field_path(field_path)] = draft_value
+                continue
+
+            saved_value = saved[key]
+            if isinstance(saved_value, dict) and isinstance(draft_value, dict) and draft_value:
+                ProjectDiffService._diff_into(updates, field_path, saved_value, draft_value)
+            elif not ProjectDiffService.values_equal(saved_value, draft_value):
+                updates[ProjectDiffService._field_path(field_path)] = draft_value
+
+        for key in saved:
+            if key not in draft:
+                updates[ProjectDiffService._field_path(path + [str(key)])] = firestore.DELETE_FIELD
+
+    @staticmethod
+    def _field_path(parts: List[str]) -> str:
+        """Ruta de campo de Firestore con escape de claves no simples."""
+        return FieldPath(*parts).to_api_repr()
+
+
+def _encode_canonical(value: Any, parts: List[str]):
+    """Codificación canónica: claves ordenadas, textos con longitud y 1 == 1.0 como en la comparación."""
+    if isinstance(value, dict):
+        parts.append('d{')
+        for key in sorted(value, key=str):
+            _encode_canonical(str(key), parts)
+            _encode_canonical(value[key], parts)
+        parts.append('}')
+    elif isinstance(value, (list, tuple)):
+        parts.append('l[')
+        for item in value:
+            _encode_canonical(item, parts)
+        parts.append(']')
+    elif isinstance(value, str):
+        parts.append(f's{len(value)}:{value}')
+    elif isinstance(value, bool) or value is None:
+        parts.append(f'c{value};')
+    elif isinstance(value, int):
+        parts.append(f'i{value};')
+    elif isinstance(value, float):
+        if math.isfinite(value) and value == int(value):
+            parts.append(f'i{int(value)};')
+        else:
+            parts.append(f'f{value!r};')
+    elif isinstance(value, datetime):
+        # Igual que en la comparación de guardado: solo importa el día
+        parts.append(f't{value.date().isoformat()};')
+    else:
+        parts.append(f'r{value!r};')
+
+
+def structural_digest(value: Any) -> bytes:
+    """Huella blake2b de datos tipo JSON a partir de su codificación canónica."""
+    parts: List[str] = []
+    _encode_canonical(value, parts)
+    return hashlib.blake2b(''.join(parts).encode('utf-8'), digest_size=16).digest()
+
+
+class ProjectChangeTracker:
+    """
+    Detecta cambios sin guardar con una huella por sección del proyecto.
+
+    Cada sección (datos básicos, módulos, estantes, maderas, herrajes) guarda la
+    huella del último estado guardado. La página indica con `refresh` qué secciones
+    pudieron cambiar en la ejecución (las de la pestaña activa): solo esas se vuelven
+    a codificar, y `has_changes` consulta las marcas sin recorrer el proyecto.
+    """
+
+    BASIC_FIELDS = (
+        'name', 'client', 'date', 'status', 'labor_cost_project', 'extra_complexity', 'final_price', 'use_nesting',
+    )
+    LIST_SECTIONS = ('modules', 'shelves', 'woods', 'hardwares')
+    SECTIONS = ('basics',) + LIST_SECTIONS
+
+    def __init__(self, project: Dict):
+        self._baseline: Dict[str, bytes] = {}
+        self._dirty: List[str] = []
+        self.reset(project)
+
+    @classmethod
+    def section_digest(cls, project: Dict, section: str) -> bytes:
+        if section == 'basics':
+            return structural_digest([project.get(field) for field in cls.BASIC_FIELDS])
+        return structural_digest(project.get(section) or [])
+
+    def reset(self, project: Dict):
+        """Toma el estado actual como el último guardado."""
+        self._baseline = {section: self.section_digest(project, section) for section in self.SECTIONS}
+        self._dirty = []
+
+    def refresh(self, project: Dict, sections: Iterable[str]) -> bool:
+        """Vuelve a calcular la huella de las secciones indicadas; devuelve si hay cambios."""
+        for section in sections:
+            dirty = self.section_digest(project, section) != self._baseline[section]
+            if dirty and section not in self._dirty:
+                self._dirty.append(section)
+            elif not dirty and section in self._dirty:
+                self._dirty.remove(section)
+        return self.has_changes()
+
+    def is_section_dirty(self, section: str) -> bool:
+        return section in self._dirty
+
+    def has_changes(self) -> bool:
+        """Indica si alguna sección quedó distinta de lo guardado en el último `refresh`."""
+        return bool(self._dirty)
+
+    @property
+    def dirty_sections(self) -> List[str]:
+        return list(self._dirty)
@@ -0,0 +1,263 @@
+import heapq
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Dict, Iterable, List, Optional, Union
+
+from models.material_catalog import MaterialCatalog
+from services.vector_calculation_service import VectorCalculationService
+
+
+class RepricingService:
+    """
+    Recálculo en lote de los presupuestos activos con el catálogo actual.
+
+    Los proyectos se leen por bloques (`FirebaseService.iter_project_chunks`), cada
+    bloque se recalcula en procesos worker con el motor vectorizado y las
+    diferencias (total anterior vs nuevo) se escriben en un informe con escrituras
+    en lote. Solo hay un bloque en memoria a la vez; del informe se conservan los
+    acumulados y los proyectos con mayor diferencia.
+    """
+
+    DEFAULT_CHUNK_SIZE = 200
+    # Diferencias por debajo de medio céntimo no se consideran cambio
+    CHANGE_EPSILON = 0.005
+    TOP_CHANGES = 20
+    # Campos del proyecto que se envían a los workers
+    CALCULATION_FIELDS = (
+        'modules', 'shelves', 'woods', 'hardwares',
+        'labor_cost_project', 'extra_complexity', 'final_price', 'use_nesting',
+    )
+
+    @staticmethod
+    def reprice_project(project: Dict, materials_db: Union[MaterialCatalog, List[Dict]], cutting_service: Dict) -> Dict:
+        """Recalcula un proyecto y devuelve la fila del informe."""
+        # Con el mismo modo de tablas que produjo el total guardado
+        results = VectorCalculationService.calculate_all_project_costs(
+            project, materials_db, cutting_service, include_surfaces=False,
+            use_nesting=bool(project.get('use_nesting', False)), nesting_workers=1
+        )
+        old_total = RepricingService._previous_total(project)
+        new_total = results['total_calculated']
+        delta = None if old_total is None else new_total - old_total
+        return {
+            'project_id': project['id'],
+            'name': project.get('name', ''),
+            'client': project.get('client', ''),
+            'old_total': old_total,
+            'new_total': new_total,
+            'delta': delta,
+            'abs_delta': abs(delta) if delta is not None else 0.0,
+            'final_price': project.get('final_price'),
+        }
+
+    @staticmethod
+    def _previous_total(project: Dict) -> Optional[float]:
+        """
+        Total guardado del proyecto, o None si no se conoce.
+
+        `build_project_payload` guarda 0.0 hasta que se calcula el proyecto, así que un
+        total 0 (o no numérico) se trata como desconocido y no como diferencia.
+        """
+        old_total = project.get('total_calculated')
+        if isinstance(old_total, bool) or not isinstance(old_total, (int, float)):
+            return None
+        if abs(old_total) < RepricingService.CHANGE_EPSILON:
+            return None
+        return float(old_total)
+
+    @staticmethod
+    def _calculation_payload(project: Dict) -> Dict:
+        """Copia reducida del proyecto para enviar a un worker."""
+        payload = {field: project[field] for field in RepricingService.CALCULATION_FIELDS if field in project}
+        payload['id'] = project['id']
+        payload['name'] = project.get('name', '')
+        payload['client'] = project.get('client', '')
+        payload['total_calculated'] = project.get('total_calculated')
+        return payload
+
+    @staticmethod
+    def reprice_chunk(projects: List[Dict],
+                      materials_db: Union[MaterialCatalog, List[Dict]],
+                      cutting_service: Dict,
+                      pool: Optional[ProcessPoolExecutor] = None,
+                      workers: int = 1) -> List[Dict]:
+        """Recalcula un bloque, en el pool si se indica; las filas salen en el orden del bloque."""
+        payloads = [RepricingService._calculation_payload(project) for project in projects]
+        if pool is not None:
+            # Varios proyectos por envío para no pagar la comunicación de a uno
+            chunksize = max(1, len(payloads) // (4 * workers))
+            return list(pool.map(_reprice_task, payloads, chunksize=chunksize))
+        return [RepricingService.reprice_project(payload, materials_db, cutting_service) for payload in payloads]
+
+    @staticmethod
+    def _resolve_workers(max_workers: Optional[int]) -> int:
+        if max_workers is None:
+            max_workers = os.cpu_count() or 1
+        return max(1, int(max_workers))
+
+    @staticmethod
+    def run(chunks: Iterable[List[Dict]],
+            materials_db: Union[MaterialCatalog, List[Dict]],
+            cutting_service: Dict,
+            max_workers: Optional[int] = None,
+            write_items: Optional[Callable[[List[Dict]], None]] = None,
+            progress_callback: Optional[Callable[[Dict], None]] = None) -> Dict:
+        """
+        Recalcula todos los bloques y devuelve el resumen del recálculo.
+
+        `write_items` recibe, por cada bloque, las filas de los proyectos cuyo total
+        cambió (o que no tenían total guardado, o lo tenían a 0). `progress_callback` recibe el
+        resumen parcial después de cada bloque. `max_workers=1` calcula en el
+        proceso actual.
+        """
+        started = time.perf_counter()
+        # El catálogo se indexa una vez para todo el recálculo
+        materials_db = MaterialCatalog.coerce(materials_db)
+        summary = {
+            'projects': 0,
+            'changed': 0,
+            'increased': 0,
+            'decreased': 0,
+            'without_previous_total': 0,
+            'total_old': 0.0,
+            'total_new': 0.0,
+            # Solo proyectos con total anterior; los que no tenían total no suman diferencia
+            'delta': 0.0,
+            'top_changes': [],
+            'workers': RepricingService._resolve_workers(max_workers),
+        }
+        top: List[tuple] = []
+
+        pool = None
+        if summary['workers'] > 1:
+            try:
+                # 'spawn': el proceso de Streamlit tiene hilos y fork podría bloquearse
+                pool = ProcessPoolExecutor(
+                    max_workers=summary['workers'],
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=_init_worker,
+                    initargs=(materials_db, cutting_service),
+                )
+            except (OSError, RuntimeError):
+                pool = None
+                summary['workers'] = 1
+
+        try:
+            for chunk in chunks:
+                try:
+                    rows = RepricingService.reprice_chunk(
+                        chunk, materials_db, cutting_service, pool, summary['workers']
+                    )
+                except (BrokenProcessPool, OSError, RuntimeError):
+                    # Pool caído: se sigue en el proceso actual
+                    if pool is not None:
+                        pool.shutdown(wait=False, cancel_futures=True)
+                        pool = None
+                        summary['workers'] = 1
+                    rows = RepricingService.reprice_chunk(chunk, materials_db, cutting_service)
+
+                changed_rows = []
+                for row in rows:
+                    summary['projects'] += 1
+                    summary['total_new'] += row['new_total']
+                    if row['delta'] is None:
+                        summary['without_previous_total'] += 1
+                        changed_rows.append(row)
+                        continue
+                    summary['total_old'] += row['old_total']
+                    summary['delta'] += row['delta']
+                    if row['abs_delta'] < RepricingService.CHANGE_EPSILON:
+                        continue
+                    summary['changed'] += 1
+                    if row['delta'] > 0:
+                        summary['increased'] += 1
+                    else:
+                        summary['decreased'] += 1
+                    changed_rows.append(row)
+                    entry = (row['abs_delta'], row['project_id'], row)
+                    if len(top) < RepricingService.TOP_CHANGES:
+                        heapq.heappush(top, entry)
+                    elif entry[:2] > top[0][:2]:
+                        heapq.heapreplace(top, entry)
+
+                if write_items is not None and changed_rows:
+                    write_items(changed_rows)
+                if progress_callback is not None:
+                    progress_callback(dict(summary))
+        finally:
+            if pool is not None:
+                pool.shutdown(wait=True)
+
+        summary['top_changes'] = [row for _, _, row in sorted(top, key=lambda entry: entry[:2], reverse=True)]
+        summary['elapsed_s'] = time.perf_counter() - started
+        return summary
+
+    @staticmethod
+    def run_for_firebase(firebase_service,
+                         status: Optional[str] = 'Activo',
+                         chunk_size: int = DEFAULT_CHUNK_SIZE,
+                         max_workers: Optional[int] = None,
+                         write_report: bool = True,
+                         progress_callback: Optional[Callable[[Dict], None]] = None) -> Dict:
+        """
+        Recalcula los proyectos con `status` contra el catálogo de Firestore.
+
+        Con `write_report` se crea un documento en `repricing_reports` con el
+        resumen y las filas de los proyectos afectados en su subcolección `items`.
+        """
+        materials_db = firebase_service.get_material_catalog()
+        cutting_service = firebase_service.get_cutting_service() or {}
+
+        report_id = None
+        if write_report:
+            report_id = firebase_service.create_repricing_report({
+                'status': 'running',
+                'filter_status': status,
+                'materials': len(materials_db),
+            })
+
+        def write_report_items(rows: List[Dict]):
+            firebase_service.add_repricing_report_items(report_id, rows)
+
+        try:
+            summary = RepricingService.run(
+                firebase_service.iter_project_chunks(status, chunk_size),
+                materials_db,
+                cutting_service,
+                max_workers,
+                write_report_items if report_id is not None else None,
+                progress_callback,
+            )
+        except Exception as e:
+            if report_id is not None:
+                try:
+                    firebase_service.update_repricing_report(report_id, {'status': 'error', 'error': str(e)})
+                except Exception:
+                    pass
+            raise
+
+        summary['report_id'] = report_id
+        if report_id is not None:
+            firebase_service.update_repricing_report(report_id, {
+                'status': 'done',
+                **{key: value for key, value in summary.items() if key not in ('top_changes', 'report_id')},
+            })
+        return summary
+
+
+_worker_materials: Optional[MaterialCatalog] = None
+_worker_cutting_service: Dict = {}
+
+
+def _init_worker(materials_db: MaterialCatalog, cutting_service: Dict):
+    """El catálogo se envía una vez por worker, no con cada proyecto."""
+    global _worker_materials, _worker_cutting_service
+    _worker_materials = materials_db
+    _worker_cutting_service = cutting_service
+
+
+def _reprice_task(project: Dict) -> Dict:
+    return RepricingService.reprice_project(project, _worker_materials, _worker_cutting_service)
@@ -0,0 +1,252 @@
+from typing import Dict, List, Optional, Union
+
+import numpy as np
+
+from models.material_catalog import MaterialCatalog
+from services.calculation_service import CalculationService
+from services.edge_banding_service import EdgeBandingService
+from services.nesting_service import NestingService
+
+
+class _SurfaceColumns:
+    """Columnas de superficies (una fila por superficie de `calculate_*_surfaces`)."""
+
+    def __init__(self, include_surfaces: bool):
+        self.include_surfaces = include_surfaces
+        self.material_codes: Dict[str, int] = {}
+        self.codes: List[int] = []
+        self.height: List[float] = []
+        self.width: List[float] = []
+        # m2_total = ((m2_unitario * k1) * k2) * k3, mismo orden que el motor escalar
+        self.k1: List[float] = []
+        self.k2: List[float] = []
+        self.k3: List[float] = []
+        self.quantities: List[int] = []
+        self.descriptions: List[str] = []
+        self.materials: List[str] = []
+        # Medidas de pieza (largo en el sentido de la veta) y tipo de pieza para despiece y canto
+        self.largo: List[float] = []
+        self.ancho: List[float] = []
+        self.type_codes: Dict[str, int] = {}
+        self.types: List[int] = []
+
+    def add(self, piece_type, description, material, height, width, k1, k2=1, k3=1, quantity=0,
+            largo=None, ancho=None):
+        self.codes.append(self.material_codes.setdefault(material, len(self.material_codes)))
+        self.types.append(self.type_codes.setdefault(piece_type, len(self.type_codes)))
+        self.height.append(height)
+        self.width.append(width)
+        self.k1.append(k1)
+        self.k2.append(k2)
+        self.k3.append(k3)
+        self.quantities.append(quantity)
+        self.largo.append(height if largo is None else largo)
+        self.ancho.append(width if ancho is None else ancho)
+        if self.include_surfaces:
+            self.descriptions.append(description)
+            self.materials.append(material)
+
+
+class VectorCalculationService:
+    """
+    Motor de costos vectorizado con NumPy.
+
+    Produce exactamente el mismo resultado que
+    `CalculationService.calculate_all_project_costs`: las superficies se pasan a
+    columnas (medidas, cantidades, código de material), los m² se calculan en bloque
+    y se agrupan por material con `np.bincount`, respetando el orden de las
+    operaciones en coma flotante del motor escalar.
+    """
+
+    @staticmethod
+    def _collect_module(columns: _SurfaceColumns, module: Dict):
+        alto = module['alto_mm']
+        ancho = module['ancho_mm']
+        profundo = module['profundo_mm']
+        cantidad_puertas = module.get('cantidad_puertas', 0)
+        cantidad_estantes = module.get('cantidad_estantes', 0)
+        cantidad_divisiones = module.get('cantidad_divisiones', 0)
+        cantidad_modulos = max(1, int(module.get('cantidad_modulos', 1)))
+        material = module.get('material', '')
+        material_fondo = module.get('material_fondo', material)
+        material_puerta = module.get('material_puerta', material)
+
+        columns.add('Lateral', 'Lateral (x2)', material, alto, profundo, 2, cantidad_modulos,
+                    quantity=2 * cantidad_modulos)
+        columns.add('Horizontal', 'Horizontal (x2)', material, ancho, profundo, 2, cantidad_modulos,
+                    quantity=2 * cantidad_modulos)
+        if module.get('tiene_fondo', False):
+            columns.add('Fondo', 'Fondo', material_fondo, ancho, alto, cantidad_modulos,
+                        quantity=1 * cantidad_modulos, largo=alto, ancho=ancho)
+        if module.get('tiene_puertas', False) and cantidad_puertas > 0:
+            columns.add('Puerta', f'Puerta (x{cantidad_puertas})', material_puerta, ancho, alto,
+                        cantidad_puertas, cantidad_modulos,
+                        quantity=cantidad_puertas * cantidad_modulos, largo=alto, ancho=ancho)
+        if cantidad_estantes > 0:
+            columns.add('Estante', f'Estante (x{cantidad_estantes})', material, ancho, profundo,
+                        cantidad_estantes, cantidad_modulos,
+                        quantity=cantidad_estantes * cantidad_modulos)
+        if cantidad_divisiones > 0:
+            columns.add('División', f'División (x{cantidad_divisiones})', material, alto, profundo,
+                        cantidad_divisiones, cantidad_modulos,
+                        quantity=cantidad_divisiones * cantidad_modulos)
+
+        drawer_config = module.get('cajones', {})
+        if not drawer_config or not drawer_config.get('enabled', False):
+            return
+        cantidad_cajones = max(0, int(drawer_config.get('cantidad_cajones', 0)))
+        if cantidad_cajones <= 0:
+            return
+        d_ancho = drawer_config.get('ancho_mm', 0)
+        d_alto = drawer_config.get('alto_mm', 0)
+        d_profundo = drawer_config.get('profundo_mm', 0)
+        d_material = drawer_config.get('material', module.get('material', ''))
+        tipo = drawer_config.get('tipo', 'Magic')
+
+        columns.add('Cajón frente/fondo', f'Cajón {tipo} frente/fondo (x{2 * cantidad_cajones})',
+                    d_material, d_ancho, d_alto, 2, cantidad_cajones, cantidad_modulos,
+                    quantity=2 * cantidad_cajones * cantidad_modulos)
+        columns.add('Cajón base', f'Cajón {tipo} base (x{cantidad_cajones})',
+                    d_material, d_ancho, d_profundo, cantidad_cajones, cantidad_modulos,
+                    quantity=cantidad_cajones * cantidad_modulos)
+        if tipo == 'Completo':
+            columns.add('Cajón lateral', f'Cajón completo lateral (x{2 * cantidad_cajones})',
+                        d_material, d_alto, d_profundo, 2, cantidad_cajones, cantidad_modulos,
+                        quantity=2 * cantidad_cajones * cantidad_modulos)
+
+    @staticmethod
+    def build_columns(project_data: Dict, include_surfaces: bool = True) -> _SurfaceColumns:
+        """Convierte módulos, cajones, estantes y maderas en columnas."""
+        columns = _SurfaceColumns(include_surfaces)
+        for module in project_data.get('modules', []):
+            VectorCalculationService._collect_module(columns, module)
+        for shelf in project_data.get('shelves', []):
+            cantidad = shelf.get('cantidad', 1)
+            columns.add('Estante independiente', f'Estante independiente (x{cantidad})', shelf.get('material', ''),
+                        shelf['ancho_mm'], shelf['profundo_mm'], cantidad, quantity=cantidad)
+        for wood in project_data.get('woods', []):
+            cantidad = wood.get('cantidad', 1)
+            columns.add('Madera', f'Madera (x{cantidad})', wood.get('material', ''),
+                        wood['ancho_mm'], wood['profundo_mm'], cantidad, quantity=cantidad)
+        return columns
+
+    @staticmethod
+    def calculate_material_costs(material_totals: Dict[str, float], materials_dict: Dict[str, Dict]) -> Dict[str, Dict]:
+        """Calcula tablas y costo de todos los materiales en bloque."""
+        keys = [key for key in material_totals if key in materials_dict]
+        if not keys:
+            return {}
+
+        mats = [materials_dict[key] for key in keys]
+        m2_total = np.array([material_totals[key] for key in keys], dtype=np.float64)
+        waste = np.array([mat.get('waste_factor', 0.0) for mat in mats], dtype=np.float64)
+        board_h = np.array([mat.get('board_height_mm', 0) for mat in mats], dtype=np.float64)
+        board_w = np.array([mat.get('board_width_mm', 0) for mat in mats], dtype=np.float64)
+        board_price = np.array([mat.get('board_price', 0.0) for mat in mats], dtype=np.float64)
+
+        m2_con_desperdicio = m2_total * (1 + waste)
+        board_m2 = (board_h / 1000) * (board_w / 1000)
+        valid = board_m2 > 0
+        with np.errstate(divide='ignore', invalid='ignore'):
+            boards = np.where(valid, np.ceil(m2_con_desperdicio / np.where(valid, board_m2, 1.0)), 0.0)
+        material_cost = np.where(valid, boards * board_price, 0.0)
+
+        results = {}
+        for idx, key in enumerate(keys):
+            results[key] = {
+                'm2_sin_desperdicio': material_totals[key],
+                'm2_con_desperdicio': float(m2_con_desperdicio[idx]),
+                'board_m2': float(board_m2[idx]),
+                'boards_needed': int(boards[idx]),
+                'board_price': mats[idx].get('board_price', 0.0),
+                'material_cost': float(material_cost[idx]),
+            }
+        return results
+
+    @staticmethod
+    def calculate_all_project_costs(project_data: Dict,
+                                    materials_db: Union[MaterialCatalog, List[Dict]],
+                                    cutting_service: Dict,
+                                    include_surfaces: bool = True,
+                                    use_nesting: bool = False,
+                                    nesting_heuristic: str = NestingService.DEFAULT_HEURISTIC,
+                                    nesting_workers: Optional[int] = None) -> Dict:
+        """
+        Equivalente vectorizado de `CalculationService.calculate_all_project_costs`.
+
+        Con `include_surfaces=False` no se construye la lista `all_surfaces` (útil
+        para recalcular muchos proyectos en lote).
+        """
+        materials_dict = MaterialCatalog.coerce(materials_db)
+
+        columns = VectorCalculationService.build_columns(project_data, include_surfaces or use_nesting)
+
+        height = np.array(columns.height, dtype=np.float64)
+        width = np.array(columns.width, dtype=np.float64)
+        m2_unitario = (height / 1000) * (width / 1000)
+        m2_total = ((m2_unitario * np.array(columns.k1, dtype=np.float64))
+                    * np.array(columns.k2, dtype=np.float64)) * np.array(columns.k3, dtype=np.float64)
+
+        material_names = list(columns.material_codes)
+        sums = np.bincount(
+            np.array(columns.codes, dtype=np.intp),
+            weights=m2_total,
+            minlength=len(material_names),
+        ) if columns.codes else np.zeros(0)
+        material_totals = {name: float(sums[code]) for code, name in enumerate(material_names)}
+
+        all_surfaces = []
+        if columns.include_surfaces:
+            for description, material, unit, total, quantity, largo, ancho in zip(
+                columns.descriptions, columns.materials, m2_unitario.tolist(), m2_total.tolist(),
+                columns.quantities, columns.largo, columns.ancho
+            ):
+                all_surfaces.append({
+                    'descripcion': description,
+                    'material': material,
+                    'm2_unitario': unit,
+                    'm2_total': total,
+                    'cantidad': quantity,
+                    'largo_mm': largo,
+                    'ancho_mm': ancho,
+                })
+
+        material_costs = VectorCalculationService.calculate_material_costs(material_totals, materials_dict)
+        total_m2_con_desperdicio = 0.0
+        for cost_data in material_costs.values():
+            total_m2_con_desperdicio += cost_data['m2_con_desperdicio']
+
+        layouts = None
+        if use_nesting:
+            layouts = NestingService.nest_materials(
+                NestingService.pieces_from_surfaces(all_surfaces),
+                materials_dict,
+                cutting_service.get('kerf_mm'),
+                nesting_heuristic,
+                nesting_workers,
+            )
+            NestingService.apply_to_material_costs(material_costs, layouts)
+
+        edge_banding_m = EdgeBandingService.metres_by_codes(
+            material_names,
+            columns.codes,
+            list(columns.type_codes),
+            columns.types,
+            columns.largo,
+            columns.ancho,
+            columns.quantities,
+            materials_dict,
+        )
+
+        results = CalculationService.finalize_project_costs(
+            project_data,
+            cutting_service,
+            all_surfaces if include_surfaces else [],
+            material_totals,
+            material_costs,
+            total_m2_con_desperdicio,
+            edge_banding_m,
+        )
+        if layouts is not None:
+            results['nesting'] = layouts
+        return results
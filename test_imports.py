@@ -47,7 +47,8 @@ with open('requirements.txt', 'r') as f:
         'google-cloud-firestore',
         'reportlab',
         'matplotlib',
-        'Pillow'
+        'Pillow',
+        'numpy'
     ]
     
     for package in required_packages:
@@ -65,8 +66,21 @@ files_to_check = [
     'services/firebase_service.py',
     'services/calculation_service.py',
     'services/pdf_service.py',
+    'services/vector_calculation_service.py',
+    'services/nesting_service.py',
+    'services/cut_list_service.py',
+    'services/edge_banding_service.py',
+    'services/repricing_service.py',
+    'services/logo_service.py',
+    'services/bulk_export_service.py',
+    'services/byte_lru_cache.py',
+    'services/drawing_service.py',
     'models/project_model.py',
-    'app.py'
+    'models/material_catalog.py',
+    'app.py',
+    'reprice_projects.py',
+    'export_pdfs.py',
+    'export_cut_list.py'
 ]
 
 syntax_errors = False
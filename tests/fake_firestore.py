@@ -0,0 +1,202 @@
+"""
+Fake en proceso de Firestore para las pruebas: colecciones en memoria con
+`stream()` y `on_snapshot()`.
+
+Los listeners reciben los mismos argumentos que los de google-cloud-firestore
+(docs, changes, read_time) con cambios `ChangeType.ADDED/MODIFIED/REMOVED`.
+Las consultas con filtros (`where`) fallan con `FailedPrecondition`, como en un
+proyecto sin los índices compuestos de `firestore.indexes.json`.
+"""
+
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+import threading
+
+from google.api_core import exceptions as gcloud_exceptions
+from google.cloud.firestore_v1.watch import ChangeType
+
+
+class FakeDocumentSnapshot:
+    def __init__(self, doc_id: str, data: Optional[Dict]):
+        self.id = doc_id
+        self._data = dict(data) if data is not None else None
+
+    @property
+    def exists(self) -> bool:
+        return self._data is not None
+
+    def to_dict(self) -> Optional[Dict]:
+        return dict(self._data) if self._data is not None else None
+
+
+class FakeChange:
+    def __init__(self, change_type: ChangeType, document: FakeDocumentSnapshot):
+        self.type = change_type
+        self.document = document
+
+
+class FakeWatch:
+    """Listener activo; `close()` simula el cierre del stream por un error de red."""
+
+    def __init__(self, collection: 'FakeCollection', callback: Callable):
+        self.collection = collection
+        self.callback = callback
+        self.is_active = True
+
+    def close(self):
+        self.is_active = False
+
+    def unsubscribe(self):
+        self.is_active = False
+        self.collection.watches.remove(self)
+
+
+class FakeDocumentReference:
+    """Referencia a un documento; las escrituras notifican a los listeners como Firestore."""
+
+    def __init__(self, collection: 'FakeCollection', doc_id: str):
+        self.collection = collection
+        self.id = doc_id
+
+    def get(self, timeout: Optional[float] = None) -> FakeDocumentSnapshot:
+        return FakeDocumentSnapshot(self.id, self.collection.documents.get(self.id))
+
+    def set(self, data: Dict, merge: bool = False, timeout: Optional[float] = None):
+        if self.id in self.collection.documents:
+            current = self.collection.documents[self.id] if merge else {}
+            self.collection.modify(self.id, {**current, **data})
+        else:
+            self.collection.add(self.id, data)
+
+    def update(self, data: Dict, timeout: Optional[float] = None):
+        self.collection.modify(self.id, {**self.collection.documents[self.id], **data})
+
+    def delete(self, timeout: Optional[float] = None):
+        if self.id in self.collection.documents:
+            self.collection.remove(self.id)
+
+
+class FakeCollection:
+    """Colección en memoria; cuenta las lecturas completas (`stream`)."""
+
+    def __init__(self, documents: Optional[Dict[str, Dict]] = None, deliver_initial: bool = True):
+        self.documents: Dict[str, Dict] = {doc_id: dict(data) for doc_id, data in (documents or {}).items()}
+        self.watches: List[FakeWatch] = []
+        self.deliver_initial = deliver_initial
+        self.stream_calls = 0
+        self._auto_ids = 0
+
+    def document(self, doc_id: Optional[str] = None) -> FakeDocumentReference:
+        if doc_id is None:
+            self._auto_ids += 1
+            doc_id = f'auto{self._auto_ids}'
+        return FakeDocumentReference(self, doc_id)
+
+    def stream(self, timeout: Optional[float] = None):
+        self.stream_calls += 1
+        for doc_id, data in list(self.documents.items()):
+            yield FakeDocumentSnapshot(doc_id, data)
+
+    def select(self, fields: List[str]) -> 'FakeQuery':
+        return FakeQuery(self, fields)
+
+    def on_snapshot(self, callback: Callable) -> FakeWatch:
+        watch = FakeWatch(self, callback)
+        self.watches.append(watch)
+        if self.deliver_initial:
+            self.deliver_initial_snapshot(watch)
+        return watch
+
+    def deliver_initial_snapshot(self, watch: Optional[FakeWatch] = None):
+        """Primera instantánea: todos los documentos como ADDED."""
+        changes = [FakeChange(ChangeType.ADDED, FakeDocumentSnapshot(doc_id, data))
+                   for doc_id, data in self.documents.items()]
+        for target in [watch] if watch is not None else list(self.watches):
+            target.callback(self._snapshots(), changes, datetime.now())
+
+    # ---------- Cambios remotos (otro proceso escribe en Firestore) ----------
+
+    def add(self, doc_id: str, data: Dict):
+        self.documents[doc_id] = dict(data)
+        self._notify(ChangeType.ADDED, doc_id, data)
+
+    def modify(self, doc_id: str, data: Dict):
+        self.documents[doc_id] = dict(data)
+        self._notify(ChangeType.MODIFIED, doc_id, data)
+
+    def remove(self, doc_id: str):
+        data = self.documents.pop(doc_id)
+        self._notify(ChangeType.REMOVED, doc_id, data)
+
+    def _snapshots(self) -> List[FakeDocumentSnapshot]:
+        return [FakeDocumentSnapshot(doc_id, data) for doc_id, data in self.documents.items()]
+
+    def _notify(self, change_type: ChangeType, doc_id: str, data: Dict):
+        change = FakeChange(change_type, FakeDocumentSnapshot(doc_id, data))
+        for watch in list(self.watches):
+            if watch.is_active:
+                watch.callback(self._snapshots(), [change], datetime.now())
+
+
+class FakeQuery:
+    """Proyección (`select`) de una colección; sin índices compuestos."""
+
+    def __init__(self, collection: FakeCollection, fields: List[str]):
+        self.collection = collection
+        self.fields = list(fields)
+
+    def where(self, *args, **kwargs):
+        raise gcloud_exceptions.FailedPrecondition('The query requires an index.')
+
+    def stream(self, timeout: Optional[float] = None):
+        for doc in self.collection.stream(timeout=timeout):
+            data = doc.to_dict()
+            yield FakeDocumentSnapshot(doc.id, {field: data[field] for field in self.fields if field in data})
+
+
+class FakeBatch:
+    """Escritura en lote: aplica las operaciones al hacer `commit`."""
+
+    def __init__(self):
+        self.operations: List[Callable] = []
+
+    def set(self, reference: FakeDocumentReference, data: Dict, merge: bool = False):
+        self.operations.append(lambda: reference.set(data, merge=merge))
+
+    def delete(self, reference: FakeDocumentReference):
+        self.operations.append(reference.delete)
+
+    def commit(self, timeout: Optional[float] = None, retry=None):
+        for operation in self.operations:
+            operation()
+        self.operations = []
+
+
+class FakeFirestore:
+    """Cliente mínimo: `collection(nombre)` devuelve siempre la misma colección en memoria."""
+
+    def __init__(self, collections: Optional[Dict[str, FakeCollection]] = None):
+        self.collections: Dict[str, FakeCollection] = dict(collections or {})
+
+    def collection(self, name: str) -> FakeCollection:
+        return self.collections.setdefault(name, FakeCollection())
+
+    def batch(self) -> FakeBatch:
+        return FakeBatch()
+
+
+def make_firebase_service(db: FakeFirestore, replica=None, ttl_seconds: float = 300.0):
+    """FirebaseService sobre el fake, sin conectar con Firebase (no pasa por `__init__`)."""
+    from services.firebase_service import FirebaseService, _TTLCache
+
+    service = FirebaseService.__new__(FirebaseService)
+    service.db = db
+    service._cache = _TTLCache(ttl_seconds=ttl_seconds)
+    service._replica = replica
+    service._material_catalog = None
+    service._material_catalog_revision = None
+    service._material_catalog_lock = threading.Lock()
+    service._summaries_checked = False
+    service._summaries_lock = threading.Lock()
+    return service
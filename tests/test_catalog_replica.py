@@ -0,0 +1,184 @@
+from google.cloud.firestore_v1.watch import ChangeType
+
+from services.catalog_replica import CatalogReplica
+from tests.fake_firestore import FakeChange, FakeCollection, FakeDocumentSnapshot, FakeFirestore, make_firebase_service
+
+MATERIALS = {
+    'm1': {'type': 'MDF', 'color': 'Blanco', 'thickness_mm': 18},
+    'm2': {'type': 'Melamina', 'color': 'Roble', 'thickness_mm': 18},
+}
+
+
+def attached_replica(collection: FakeCollection, name: str = 'materials') -> CatalogReplica:
+    replica = CatalogReplica()
+    replica.attach(name, collection)
+    return replica
+
+
+def test_initial_snapshot_loads_collection():
+    collection = FakeCollection(MATERIALS)
+    replica = attached_replica(collection)
+
+    assert replica.is_ready('materials')
+    assert replica.get_all('materials') == [{**MATERIALS['m1'], 'id': 'm1'}, {**MATERIALS['m2'], 'id': 'm2'}]
+    assert replica.get_document('materials', 'm2') == MATERIALS['m2']
+    assert collection.stream_calls == 0
+
+
+def test_not_ready_until_first_snapshot():
+    collection = FakeCollection(MATERIALS, deliver_initial=False)
+    replica = attached_replica(collection)
+
+    assert not replica.is_ready('materials')
+    assert replica.get_all('materials') is None
+
+    collection.deliver_initial_snapshot()
+    assert replica.is_ready('materials')
+    assert len(replica.get_all('materials')) == 2
+
+
+def test_added_document_appears():
+    collection = FakeCollection(MATERIALS)
+    replica = attached_replica(collection)
+
+    collection.add('m3', {'type': 'HDF', 'color': 'Blanco', 'thickness_mm': 3})
+
+    assert [doc['id'] for doc in replica.get_all('materials')] == ['m1', 'm2', 'm3']
+    assert replica.get_document('materials', 'm3')['type'] == 'HDF'
+
+
+def test_modified_document_is_replaced():
+    collection = FakeCollection(MATERIALS)
+    replica = attached_replica(collection)
+
+    collection.modify('m1', {'type': 'MDF', 'color': 'Negro', 'thickness_mm': 18})
+
+    assert replica.get_document('materials', 'm1')['color'] == 'Negro'
+    assert len(replica.get_all('materials')) == 2
+
+
+def test_removed_document_disappears():
+    collection = FakeCollection(MATERIALS)
+    replica = attached_replica(collection)
+
+    collection.remove('m1')
+
+    assert replica.get_document('materials', 'm1') is None
+    assert [doc['id'] for doc in replica.get_all('materials')] == ['m2']
+
+
+def test_returned_documents_are_copies():
+    replica = attached_replica(FakeCollection(MATERIALS))
+
+    replica.get_all('materials')[0]['color'] = 'Cambiado'
+    replica.get_document('materials', 'm2')['color'] = 'Cambiado'
+
+    assert replica.get_document('materials', 'm1')['color'] == 'Blanco'
+    assert replica.get_document('materials', 'm2')['color'] == 'Roble'
+
+
+def test_closed_watch_is_not_ready_and_attach_restarts_it():
+    collection = FakeCollection(MATERIALS)
+    replica = attached_replica(collection)
+
+    collection.watches[0].close()
+    assert not replica.is_ready('materials')
+    assert replica.get_all('materials') is None
+
+    replica.attach('materials', collection)
+    assert replica.is_ready('materials')
+    # El listener cerrado se cancela, no queda colgado
+    assert len(collection.watches) == 1 and collection.watches[0].is_active
+
+
+def test_restart_if_closed_waits_for_retry_interval():
+    collection = FakeCollection(MATERIALS)
+    replica = attached_replica(collection)
+
+    assert not replica.restart_if_closed('materials')  # sigue activo
+    collection.watches[0].close()
+    assert not replica.restart_if_closed('materials')  # reintento demasiado pronto
+
+    replica.RESTART_INTERVAL_S = 0.0
+    assert replica.restart_if_closed('materials')
+    assert replica.is_ready('materials')
+    assert len(collection.watches) == 1
+
+
+def test_events_from_replaced_watch_are_ignored():
+    collection = FakeCollection(MATERIALS)
+    replica = attached_replica(collection)
+    stale = collection.watches[0]
+    stale.close()
+    replica.attach('materials', collection)
+
+    stale.callback([], [FakeChange(ChangeType.REMOVED, FakeDocumentSnapshot('m1', MATERIALS['m1']))], None)
+
+    assert replica.get_document('materials', 'm1') is not None
+
+
+def test_attach_twice_keeps_single_listener():
+    collection = FakeCollection(MATERIALS)
+    replica = attached_replica(collection)
+    replica.attach('materials', collection)
+
+    assert len(collection.watches) == 1
+
+
+def test_detach_all_unsubscribes():
+    collection = FakeCollection(MATERIALS)
+    replica = attached_replica(collection)
+
+    replica.detach_all()
+
+    assert collection.watches == []
+    assert not replica.is_ready('materials')
+
+
+def test_service_reads_from_replica_when_live_sync_is_on():
+    db = FakeFirestore({'materials': FakeCollection(MATERIALS)})
+    replica = attached_replica(db.collection('materials'))
+    service = make_firebase_service(db, replica)
+
+    assert [mat['id'] for mat in service.get_all_materials()] == ['m1', 'm2']
+    db.collection('materials').add('m3', {'type': 'HDF', 'color': 'Blanco', 'thickness_mm': 3})
+    assert [mat['id'] for mat in service.get_all_materials()] == ['m1', 'm2', 'm3']
+    assert db.collection('materials').stream_calls == 0
+
+
+def test_service_falls_back_to_reads_when_live_sync_is_off():
+    db = FakeFirestore({'materials': FakeCollection(MATERIALS)})
+    service = make_firebase_service(db, replica=None)
+
+    assert not service.live_sync_enabled
+    assert {mat['id'] for mat in service.get_all_materials()} == {'m1', 'm2'}
+    assert db.collection('materials').stream_calls == 1
+    # La caché TTL evita volver a leer en el siguiente rerun
+    service.get_all_materials()
+    assert db.collection('materials').stream_calls == 1
+
+
+def test_service_falls_back_to_reads_when_watch_closes():
+    db = FakeFirestore({'materials': FakeCollection(MATERIALS)})
+    replica = attached_replica(db.collection('materials'))
+    service = make_firebase_service(db, replica, ttl_seconds=0)
+
+    db.collection('materials').watches[0].close()
+
+    assert {mat['id'] for mat in service.get_all_materials()} == {'m1', 'm2'}
+    assert db.collection('materials').stream_calls == 1
+
+
+def test_service_reattaches_closed_watch():
+    db = FakeFirestore({'materials': FakeCollection(MATERIALS)})
+    replica = attached_replica(db.collection('materials'))
+    replica.RESTART_INTERVAL_S = 0.0
+    service = make_firebase_service(db, replica, ttl_seconds=0)
+
+    db.collection('materials').watches[0].close()
+    db.collection('materials').documents['m3'] = {'type': 'HDF', 'color': 'Blanco', 'thickness_mm': 3}
+
+    # El nuevo listener trae el estado actual; no hace falta leer la colección
+    assert [mat['id'] for mat in service.get_all_materials()] == ['m1', 'm2', 'm3']
+    assert db.collection('materials').stream_calls == 0
+    assert len(db.collection('materials').watches) == 1
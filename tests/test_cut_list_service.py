@@ -0,0 +1,62 @@
+"""Lista de corte: escritura por fragmentos (CLI) y bytes para el botón de descarga."""
+
+import csv
+import io
+import json
+
+from models.material_catalog import MaterialCatalog
+from services.cut_list_service import CutListService
+
+MATERIALS = [{'id': 'mdf', 'type': 'MDF', 'color': 'Blanco', 'thickness_mm': 18, 'waste_factor': 0.1,
+              'board_price': 45.0, 'board_height_mm': 2440, 'board_width_mm': 1220}]
+KEY = MaterialCatalog.key_for(MATERIALS[0])
+PROJECT = {
+    'name': 'Taller',
+    'modules': [{'nombre': 'Bajo', 'alto_mm': 720, 'ancho_mm': 600, 'profundo_mm': 560, 'material': KEY,
+                 'cantidad_estantes': 1, 'cantidad_modulos': 40}],
+    'shelves': [{'ancho_mm': 800, 'profundo_mm': 300, 'cantidad': 3, 'material': KEY}],
+    'woods': [],
+}
+
+
+class CountingStream(io.BytesIO):
+    """Archivo binario que registra cuántas escrituras recibe."""
+
+    def __init__(self):
+        super().__init__()
+        self.writes = 0
+
+    def write(self, data):
+        self.writes += 1
+        return super().write(data)
+
+
+def test_write_csv_streams_one_line_per_piece():
+    stream = CountingStream()
+
+    written = CutListService.write_csv(PROJECT, stream)
+
+    pieces = CutListService.count_pieces(PROJECT)
+    assert stream.writes == pieces + 1  # cabecera + una escritura por pieza
+    assert written == len(stream.getvalue())
+    rows = list(csv.DictReader(io.StringIO(stream.getvalue().decode('utf-8'))))
+    assert len(rows) == pieces
+    assert stream.getvalue() == CutListService.csv_download_bytes(PROJECT)
+
+
+def test_write_layout_json_streams_board_by_board():
+    stream = CountingStream()
+
+    CutListService.write_layout_json(PROJECT, MATERIALS, {'kerf_mm': 4.0}, stream, nesting_workers=1)
+
+    document = json.loads(stream.getvalue().decode('utf-8'))
+    boards = sum(len(material['boards']) for material in document['materials'])
+    assert boards > 1
+    assert stream.writes > boards
+    assert stream.getvalue() == CutListService.layout_json_download_bytes(PROJECT, MATERIALS, {'kerf_mm': 4.0})
+
+
+def test_write_csv_accepts_text_streams():
+    stream = io.StringIO()
+    CutListService.write_csv(PROJECT, stream)
+    assert stream.getvalue().encode('utf-8') == CutListService.csv_download_bytes(PROJECT)
@@ -0,0 +1,144 @@
+"""
+Agregados de economía (`economia_agregados/totales`) ajustados por deltas.
+
+Se simula el documento de agregados aplicando los `firestore.Increment` que
+escribe `FirebaseService._write_economy_movement` en cada alta, edición y baja,
+y se compara con los balances calculados sobre el libro completo.
+"""
+
+import math
+import random
+
+import pytest
+
+from services.calculation_service import CalculationService
+from services.firebase_service import FirebaseService
+
+EMPLOYEES = ['Ana', 'Luis', 'Marta']
+CLIENTS = ['Cliente A', 'Cliente B']
+PROJECTS = ['', 'Cocina', 'Armario']
+
+
+def random_movement(rng: random.Random) -> dict:
+    origen = rng.choice(['Cliente', 'Empleado', 'Inversión', 'Mantenimiento'])
+    movement = {
+        'tipo': rng.choice(['Ingreso', 'Egreso', 'Pendiente de pago']),
+        'monto': round(rng.uniform(0, 900), 2),
+        'origen_categoria': origen,
+        'origen_nombre': rng.choice(EMPLOYEES if origen == 'Empleado' else CLIENTS if origen == 'Cliente' else [origen]),
+        'project_name': rng.choice(PROJECTS),
+    }
+    if origen == 'Empleado':
+        movement['empleado_tipo'] = rng.choice(['Temporal', 'Permanente'])
+    return movement
+
+
+def random_change(rng: random.Random, movement: dict) -> dict:
+    """Edición parcial (como `update_economy_movement`, que hace merge)."""
+    field = rng.choice(['tipo', 'monto', 'employee', 'project_name'])
+    if field == 'tipo':
+        return {'tipo': rng.choice(['Ingreso', 'Egreso', 'Pendiente de pago'])}
+    if field == 'monto':
+        return {'monto': round(rng.uniform(0, 900), 2)}
+    if field == 'employee':
+        return {'origen_categoria': 'Empleado', 'origen_nombre': rng.choice(EMPLOYEES),
+                'empleado_tipo': rng.choice(['Temporal', 'Permanente'])}
+    return {'project_name': rng.choice(PROJECTS)}
+
+
+def apply_increments(ledger: dict, increments: dict):
+    """Lo que hace Firestore con `set(..., merge=True)` de mapas con `Increment`."""
+    for key, value in increments.items():
+        if isinstance(value, dict):
+            apply_increments(ledger.setdefault(key, {}), value)
+        else:
+            ledger[key] = ledger.get(key, 0) + value.value
+
+
+def write(ledger: dict, previous, current):
+    deltas = FirebaseService._economy_write_deltas(previous, current)
+    apply_increments(ledger, FirebaseService._economy_increments(deltas))
+
+
+def by_origin(movements, origen: str, include_pending: bool) -> dict:
+    result = {}
+    for movement in movements:
+        if movement.get('origen_categoria') == origen:
+            name = movement['origen_nombre']
+            result[name] = result.get(name, 0.0) + CalculationService.economy_signed_amount(movement, include_pending)
+    return result
+
+
+def assert_ledger_matches(ledger: dict, movements: list):
+    balances = CalculationService.compute_economy_balances(movements)
+    for key, expected in balances.items():
+        assert math.isclose(ledger.get(key, 0.0), expected, abs_tol=1e-6), key
+    assert ledger.get('movimientos', 0) == len(movements)
+
+    employees = ledger.get('empleados', {})
+    for field, include_pending in (('fondos', False), ('balance', True)):
+        expected = by_origin(movements, 'Empleado', include_pending)
+        for name in set(expected) | set(employees):
+            actual = employees.get(name, {}).get(field, 0.0)
+            assert math.isclose(actual, expected.get(name, 0.0), abs_tol=1e-6), (name, field)
+
+    # Igual que regenerar los agregados desde cero
+    rebuilt = CalculationService.compute_economy_totals(movements)
+    for group in ('empleados', 'clientes', 'proyectos'):
+        for name, entry in rebuilt[group].items():
+            assert ledger[group][name]['movimientos'] == entry['movimientos'], (group, name)
+
+
+def test_create_update_delete_keep_the_ledger_in_sync():
+    ledger = CalculationService.empty_economy_totals()
+    movements = {}
+
+    movements['m1'] = {'tipo': 'Ingreso', 'monto': 500.0, 'origen_categoria': 'Cliente', 'origen_nombre': 'Cliente A',
+                       'project_name': 'Cocina'}
+    write(ledger, None, movements['m1'])
+    movements['m2'] = {'tipo': 'Egreso', 'monto': 120.0, 'origen_categoria': 'Empleado', 'origen_nombre': 'Ana',
+                       'empleado_tipo': 'Permanente', 'project_name': 'Cocina'}
+    write(ledger, None, movements['m2'])
+    assert_ledger_matches(ledger, list(movements.values()))
+    assert ledger['empleados']['Ana']['fondos'] == -120.0
+
+    # Cambio de tipo: un pendiente de pago no cuenta en los fondos pero sí en el balance
+    previous, movements['m2'] = movements['m2'], {**movements['m2'], 'tipo': 'Pendiente de pago'}
+    write(ledger, previous, movements['m2'])
+    assert_ledger_matches(ledger, list(movements.values()))
+    assert ledger['empleados']['Ana']['fondos'] == 0.0
+    assert ledger['empleados']['Ana']['balance'] == -120.0
+    assert ledger['balance_empleados_permanentes'] == 0.0
+
+    # Cambio de empleado: el aporte pasa de Ana a Luis
+    previous, movements['m2'] = movements['m2'], {**movements['m2'], 'tipo': 'Egreso', 'origen_nombre': 'Luis',
+                                                  'empleado_tipo': 'Temporal'}
+    write(ledger, previous, movements['m2'])
+    assert_ledger_matches(ledger, list(movements.values()))
+    assert ledger['empleados']['Ana'] == {'balance': 0.0, 'fondos': 0.0, 'movimientos': 0}
+    assert ledger['empleados']['Luis']['fondos'] == -120.0
+
+    write(ledger, movements.pop('m1'), None)
+    assert_ledger_matches(ledger, list(movements.values()))
+    assert ledger['clientes']['Cliente A']['movimientos'] == 0
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_random_writes_match_full_recalculation(seed):
+    rng = random.Random(seed)
+    ledger = CalculationService.empty_economy_totals()
+    movements = {}
+    for step in range(60):
+        action = rng.choice(['create', 'create', 'update', 'update', 'delete'])
+        if action == 'create' or not movements:
+            movements[f'm{step}'] = random_movement(rng)
+            write(ledger, None, movements[f'm{step}'])
+        elif action == 'update':
+            movement_id = rng.choice(sorted(movements))
+            previous = movements[movement_id]
+            movements[movement_id] = {**previous, **random_change(rng, previous)}
+            write(ledger, previous, movements[movement_id])
+        else:
+            movement_id = rng.choice(sorted(movements))
+            write(ledger, movements.pop(movement_id), None)
+        assert_ledger_matches(ledger, list(movements.values()))
@@ -0,0 +1,97 @@
+"""
+Equivalencia de `IncrementalCostCalculator` con `CalculationService`.
+
+Se parte de un proyecto aleatorio con semilla fija y se aplican ediciones
+aleatorias (cambiar, agregar y quitar módulos, estantes y maderas, cantidades
+en 0, cambios de material); después de cada `sync` el resultado debe coincidir
+con el cálculo completo.
+"""
+
+import copy
+import random
+
+import pytest
+
+from services.calculation_service import CalculationService
+from services.incremental_calculation_service import IncrementalCostCalculator
+from tests.test_vector_calculation_service import (
+    CATALOG, CUTTING_SERVICE, KEYS, UNKNOWN_KEY, assert_equivalent, random_module, random_project,
+)
+
+
+def random_edit(rng: random.Random, project: dict) -> dict:
+    """Aplica una edición al proyecto y devuelve los índices cambiados por sección."""
+    section = rng.choice(['modules', 'shelves', 'woods'])
+    items = project.setdefault(section, [])
+    action = rng.choice(['change', 'change', 'add', 'remove', 'zero'])
+    if action == 'add' or not items:
+        if section == 'modules':
+            items.append(random_module(rng, len(items)))
+        else:
+            items.append({'ancho_mm': rng.randint(200, 1200), 'profundo_mm': rng.randint(40, 500),
+                          'cantidad': rng.randint(1, 6), 'material': rng.choice(KEYS)})
+        return {section: [len(items) - 1]}
+    index = rng.randrange(len(items))
+    if action == 'remove':
+        items.pop(index)
+        return {section: []}
+    item = items[index]
+    if action == 'zero':
+        item['cantidad_modulos' if section == 'modules' else 'cantidad'] = 0
+    elif section == 'modules':
+        field = rng.choice(['alto_mm', 'ancho_mm', 'material', 'cantidad_estantes', 'tiene_puertas'])
+        item[field] = {
+            'alto_mm': rng.randint(100, 2400),
+            'ancho_mm': rng.randint(100, 1200),
+            'material': rng.choice(KEYS + [UNKNOWN_KEY]),
+            'cantidad_estantes': rng.randint(0, 4),
+            'tiene_puertas': not item.get('tiene_puertas'),
+        }[field]
+    else:
+        item[rng.choice(['ancho_mm', 'profundo_mm'])] = rng.randint(40, 1200)
+        item['material'] = rng.choice(KEYS)
+    return {section: [index]}
+
+
+def run_edits(seed: int, edits: int, use_nesting: bool, with_hints: bool):
+    rng = random.Random(seed)
+    project = random_project(rng)
+    calculator = IncrementalCostCalculator(CATALOG, CUTTING_SERVICE, use_nesting=use_nesting, nesting_workers=1)
+    calculator.sync(project)
+    for _ in range(edits):
+        changed = random_edit(rng, project)
+        actual = calculator.sync(project, changed if with_hints else None)
+        expected = CalculationService.calculate_all_project_costs(
+            copy.deepcopy(project), CATALOG, CUTTING_SERVICE, use_nesting=use_nesting, nesting_workers=1
+        )
+        assert_equivalent(expected, actual)
+
+
+@pytest.mark.parametrize('seed', range(30))
+def test_incremental_matches_full_calculation(seed):
+    run_edits(seed, edits=25, use_nesting=False, with_hints=seed % 2 == 0)
+
+
+@pytest.mark.parametrize('seed', range(8))
+def test_incremental_matches_full_calculation_with_nesting(seed):
+    run_edits(500 + seed, edits=10, use_nesting=True, with_hints=seed % 2 == 0)
+
+
+def test_material_back_to_zero_leaves_no_boards():
+    key = KEYS[0]
+    project = {'shelves': [], 'woods': [], 'modules': []}
+    calculator = IncrementalCostCalculator(CATALOG, CUTTING_SERVICE, use_nesting=True, nesting_workers=1)
+    # Áreas que no suman exacto en coma flotante
+    for ancho, profundo in ((333, 301), (777, 123), (101, 999)):
+        project['shelves'].append({'ancho_mm': ancho, 'profundo_mm': profundo, 'cantidad': 3, 'material': key})
+        calculator.sync(project)
+    for shelf in project['shelves']:
+        shelf['cantidad'] = 0
+        result = calculator.sync(project)
+
+    assert result['material_totals'] == {key: 0.0}
+    assert result['material_costs'][key]['boards_needed'] == 0
+    assert result['material_costs'][key]['material_cost'] == 0.0
+    assert result['nesting'] == {}
+    project['shelves'] = []
+    assert calculator.sync(project)['material_totals'] == {}
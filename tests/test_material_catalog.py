@@ -0,0 +1,94 @@
+from models.material_catalog import MaterialCatalog
+from services.catalog_replica import CatalogReplica
+from services.incremental_calculation_service import IncrementalCostCalculator
+from tests.fake_firestore import FakeCollection, FakeFirestore, make_firebase_service
+
+MATERIALS = {
+    'm1': {'type': 'MDF', 'color': 'Blanco', 'thickness_mm': 18, 'board_price': 45.0},
+    'm2': {'type': 'Melamina', 'color': 'Roble', 'thickness_mm': 18, 'board_price': 60.0},
+}
+
+
+def make_db() -> FakeFirestore:
+    return FakeFirestore({'materials': FakeCollection(MATERIALS)})
+
+
+def test_catalog_is_reused_without_rereading_materials():
+    db = make_db()
+    service = make_firebase_service(db)
+
+    catalog = service.get_material_catalog()
+    reads = db.collection('materials').stream_calls
+
+    assert service.get_material_catalog() is catalog
+    assert service.get_material_catalog() is catalog
+    assert db.collection('materials').stream_calls == reads == 1
+
+
+def test_catalog_is_rebuilt_after_own_write():
+    db = make_db()
+    service = make_firebase_service(db)
+    catalog = service.get_material_catalog()
+
+    service.update_material('m1', {'board_price': 50.0})
+    updated = service.get_material_catalog()
+
+    assert updated is not catalog
+    assert updated.version != catalog.version
+    assert updated.by_id('m1')['board_price'] == 50.0
+
+    service.delete_material('m2')
+    assert service.get_material_catalog().by_id('m2') is None
+
+
+def test_catalog_is_rebuilt_when_cache_reloads():
+    db = make_db()
+    service = make_firebase_service(db, ttl_seconds=0)
+
+    first = service.get_material_catalog()
+    second = service.get_material_catalog()
+
+    assert second is not first
+    # Mismo contenido, misma versión
+    assert second.version == first.version
+
+
+def test_catalog_version_is_valid_across_service_instances():
+    # `get_healthy_firebase_service` puede crear un servicio nuevo con el catálogo ya cambiado
+    first = make_firebase_service(make_db()).get_material_catalog()
+    changed_db = make_db()
+    changed_db.collection('materials').documents['m1']['board_price'] = 50.0
+    changed = make_firebase_service(changed_db).get_material_catalog()
+    same = make_firebase_service(make_db()).get_material_catalog()
+
+    assert changed.version != first.version
+    assert same.version == first.version
+
+    calculator = IncrementalCostCalculator(first, {})
+    assert not calculator.matches_catalog(changed, {})
+    assert calculator.matches_catalog(same, {})
+
+
+def test_catalog_follows_live_replica_revisions():
+    db = make_db()
+    replica = CatalogReplica()
+    replica.attach('materials', db.collection('materials'))
+    service = make_firebase_service(db, replica)
+
+    catalog = service.get_material_catalog()
+    assert service.get_material_catalog() is catalog
+
+    # Cambio hecho desde otro proceso: llega por el listener
+    db.collection('materials').modify('m2', {**MATERIALS['m2'], 'board_price': 65.0})
+    updated = service.get_material_catalog()
+
+    assert updated is not catalog
+    assert updated.by_id('m2')['board_price'] == 65.0
+    assert db.collection('materials').stream_calls == 0
+
+
+def test_version_of_detects_small_changes():
+    first = [{'type': 'MDF', 'quantity': -1}]
+    second = [{'type': 'MDF', 'quantity': -2}]
+    assert MaterialCatalog.version_of(first) != MaterialCatalog.version_of(second)
+    assert MaterialCatalog.version_of(first) == MaterialCatalog.version_of([{'type': 'MDF', 'quantity': -1}])
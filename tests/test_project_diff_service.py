@@ -0,0 +1,130 @@
+import copy
+from datetime import datetime
+
+from google.cloud import firestore
+
+from services.project_diff_service import ProjectChangeTracker, ProjectDiffService, structural_digest
+from tests.fake_firestore import FakeCollection, FakeFirestore, make_firebase_service
+
+
+def make_project():
+    return {
+        'name': 'Cocina', 'client': 'Ana', 'date': datetime(2026, 3, 1, 10, 30), 'status': 'Activo',
+        'labor_cost_project': 300.0, 'extra_complexity': 0.0, 'final_price': 1500.0,
+        'modules': [{'nombre': 'Bajo', 'alto_mm': 720, 'herrajes': [{'type': 'Bisagra', 'quantity': -1}]}],
+        'shelves': [], 'woods': [], 'hardwares': [],
+    }
+
+
+def test_digest_distinguishes_small_values_python_hash_confuses():
+    assert hash(-1) == hash(-2)
+    assert structural_digest({'quantity': -1}) != structural_digest({'quantity': -2})
+
+
+def test_digest_follows_save_comparison():
+    assert structural_digest({'a': 1, 'b': [1.0]}) == structural_digest({'b': [1], 'a': 1.0})
+    assert structural_digest(datetime(2026, 3, 1, 9)) == structural_digest(datetime(2026, 3, 1, 18))
+    assert structural_digest(['a', 'b']) != structural_digest(['ab'])
+    assert structural_digest({'a': None}) != structural_digest({'a': 'None'})
+
+
+def test_refresh_detects_change_in_refreshed_section():
+    project = make_project()
+    tracker = ProjectChangeTracker(project)
+    assert not tracker.has_changes()
+
+    project['modules'][0]['herrajes'][0]['quantity'] = -2
+    assert tracker.refresh(project, ['modules'])
+    assert tracker.dirty_sections == ['modules']
+
+    project['modules'][0]['herrajes'][0]['quantity'] = -1
+    assert not tracker.refresh(project, ['modules'])
+
+
+def test_only_refreshed_sections_are_rechecked():
+    project = make_project()
+    tracker = ProjectChangeTracker(project)
+
+    project['shelves'].append({'ancho_mm': 800})
+    # Sin refresh de 'shelves' la marca no cambia: no se recorre el resto del proyecto
+    assert not tracker.refresh(project, ['basics'])
+    assert tracker.refresh(project, ['shelves'])
+    assert tracker.is_section_dirty('shelves')
+
+
+def test_reset_takes_current_state_as_saved():
+    project = make_project()
+    tracker = ProjectChangeTracker(project)
+    project['name'] = 'Cocina nueva'
+    assert tracker.refresh(project, ['basics'])
+
+    tracker.reset(project)
+    assert not tracker.has_changes()
+    assert not tracker.refresh(project, ProjectChangeTracker.SECTIONS)
+
+
+def test_compute_update_only_changed_scalars():
+    saved = make_project()
+    draft = copy.deepcopy(saved)
+    draft['client'] = 'Luis'
+    draft['final_price'] = 1600.0
+    draft['labor_cost_project'] = 300  # mismo valor como int
+
+    assert ProjectDiffService.compute_update(saved, draft) == {'client': 'Luis', 'final_price': 1600.0}
+
+
+def test_compute_update_replaces_whole_list():
+    saved = make_project()
+    draft = copy.deepcopy(saved)
+    draft['modules'][0]['alto_mm'] = 900
+
+    updates = ProjectDiffService.compute_update(saved, draft)
+
+    assert updates == {'modules': draft['modules']}
+
+
+def test_compute_update_compares_dates_by_day():
+    saved = make_project()
+    draft = copy.deepcopy(saved)
+    draft['date'] = datetime(2026, 3, 1)
+    assert ProjectDiffService.compute_update(saved, draft) == {}
+
+    draft['date'] = datetime(2026, 3, 2)
+    assert ProjectDiffService.compute_update(saved, draft) == {'date': datetime(2026, 3, 2)}
+
+
+def test_compute_update_deletes_removed_keys_with_escaped_paths():
+    saved = {**make_project(), 'notes': 'x', 'totals': {'MDF_Blanco_18': 1.0, 'mdf.old': 2.0}}
+    draft = copy.deepcopy(saved)
+    del draft['notes']
+    del draft['totals']['mdf.old']
+    draft['totals']['MDF_Blanco_18'] = 1.5
+
+    updates = ProjectDiffService.compute_update(saved, draft)
+
+    assert updates == {
+        'notes': firestore.DELETE_FIELD,
+        'totals.MDF_Blanco_18': 1.5,
+        'totals.`mdf.old`': firestore.DELETE_FIELD,
+    }
+
+
+def test_compute_update_without_changes_writes_nothing():
+    saved = make_project()
+    assert ProjectDiffService.compute_update(saved, copy.deepcopy(saved)) == {}
+    assert ProjectDiffService.compute_update({}, {}) == {}
+    # Sin estado guardado se escribe el borrador completo
+    assert ProjectDiffService.compute_update(None, {'name': 'Cocina'}) == {'name': 'Cocina'}
+
+
+def test_empty_diff_is_not_written():
+    saved = make_project()
+    db = FakeFirestore({'projects': FakeCollection({'p1': saved})})
+    watch_changes = []
+    db.collection('projects').on_snapshot(lambda docs, changes, read_time: watch_changes.extend(changes))
+    watch_changes.clear()
+
+    make_firebase_service(db).update_project('p1', ProjectDiffService.compute_update(saved, copy.deepcopy(saved)))
+
+    assert watch_changes == []
+    assert 'project_summaries' not in db.collections
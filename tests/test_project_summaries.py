@@ -0,0 +1,77 @@
+"""Pruebas de `project_summaries`: `name_lower`, regeneración por versión y listado sin índice."""
+
+import logging
+from datetime import datetime
+
+import pytest
+
+from services.firebase_service import FirebaseService
+from services import firebase_service
+from tests.fake_firestore import FakeCollection, FakeFirestore, make_firebase_service
+
+
+def project(name, status='Activo', day=1, client='Cliente'):
+    return {
+        'name': name, 'client': client, 'date': datetime(2026, 1, day), 'status': status,
+        'total_calculated': 100.0, 'final_price': 120.0, 'modules': [],
+    }
+
+
+@pytest.fixture
+def db():
+    return FakeFirestore({'projects': FakeCollection({
+        'p1': project('Cocina Pérez', day=3),
+        'p2': project('cocina López', day=2),
+        'p3': project('Armario', day=1),
+        'p4': project('COCINA cerrada', status='Cerrado', day=4),
+    })})
+
+
+@pytest.fixture(autouse=True)
+def reset_warnings():
+    firebase_service._missing_index_warned.clear()
+    yield
+    firebase_service._missing_index_warned.clear()
+
+
+def test_summary_stores_lowercased_name():
+    service = make_firebase_service(FakeFirestore())
+    summary = service._extract_project_summary({'name': '  Cocina Pérez ', 'modules': []})
+    assert summary == {'name': '  Cocina Pérez ', 'name_lower': 'cocina pérez'}
+    assert 'name_lower' not in service._extract_project_summary({'final_price': 10.0})
+
+
+def test_summaries_without_schema_version_are_rebuilt(db):
+    summaries = db.collection('project_summaries')
+    summaries.documents['p1'] = {'name': 'Cocina Pérez', 'status': 'Activo'}  # formato anterior
+    service = make_firebase_service(db)
+
+    service._ensure_project_summaries()
+
+    assert summaries.documents['p1']['name_lower'] == 'cocina pérez'
+    assert set(summaries.documents) == {'p1', 'p2', 'p3', 'p4'}
+    marker = db.collection('config').documents['project_summaries']
+    assert marker['schema_version'] == FirebaseService.PROJECT_SUMMARIES_SCHEMA
+
+    # Con la versión al día no se vuelve a leer `projects`
+    reads = db.collection('projects').stream_calls
+    make_firebase_service(db)._ensure_project_summaries()
+    assert db.collection('projects').stream_calls == reads
+
+
+def test_name_prefix_is_case_insensitive_and_fallback_is_reported(db, caplog):
+    service = make_firebase_service(db)
+
+    with caplog.at_level(logging.WARNING, logger='services.firebase_service'):
+        page = service.list_projects(status='Activo', name_prefix=' COCINA', limit=1)
+        assert page['index_fallback'] is True
+        assert [item['name'] for item in page['items']] == ['cocina López']
+        next_page = service.list_projects(status='Activo', name_prefix='cocina', limit=1,
+                                          cursor=page['next_cursor'])
+
+    assert [item['name'] for item in next_page['items']] == ['Cocina Pérez']
+    assert next_page['next_cursor'] is None
+    assert set(next_page['items'][0]) == set(FirebaseService.PROJECT_LIST_FIELDS) | {'id'}
+    # Un aviso por forma de consulta, no uno por página
+    warnings = [record for record in caplog.records if 'firestore.indexes.json' in record.getMessage()]
+    assert len(warnings) == 1
@@ -0,0 +1,113 @@
+"""Pruebas del recálculo en lote: proyectos sin total anterior conocido."""
+
+import pytest
+
+from services.repricing_service import RepricingService
+from services.vector_calculation_service import VectorCalculationService
+
+MATERIALS = [{
+    'id': 'm1', 'type': 'MDF', 'color': 'Blanco', 'thickness_mm': 18, 'waste_factor': 0.1,
+    'board_price': 45.5, 'board_height_mm': 2440, 'board_width_mm': 1220,
+}]
+CUTTING_SERVICE = {'price_per_m2': 5.0, 'waste_factor': 0.1}
+
+
+def project(project_id, **fields):
+    return {
+        'id': project_id, 'name': project_id, 'client': 'Cliente',
+        'shelves': [{'nombre': 'Estante', 'ancho_mm': 800, 'profundo_mm': 300, 'cantidad': 2,
+                     'material': 'MDF_Blanco_18'}],
+        **fields,
+    }
+
+
+def current_total(data):
+    return VectorCalculationService.calculate_all_project_costs(
+        data, MATERIALS, CUTTING_SERVICE, include_surfaces=False
+    )['total_calculated']
+
+
+@pytest.mark.parametrize('old_total', [None, 0.0, 0, '120'])
+def test_missing_or_zero_previous_total_is_unknown(old_total):
+    fields = {} if old_total is None else {'total_calculated': old_total}
+    row = RepricingService.reprice_project(project('p1', **fields), MATERIALS, CUTTING_SERVICE)
+    assert row['old_total'] is None
+    assert row['delta'] is None
+    assert row['abs_delta'] == 0.0
+
+
+def test_summary_only_compares_known_totals():
+    new_total = current_total(project('x'))
+    chunks = [[
+        project('sin_total'),
+        project('a_cero', total_calculated=0.0),
+        project('igual', total_calculated=new_total),
+        project('sube', total_calculated=new_total - 10.0),
+    ]]
+    written = []
+
+    summary = RepricingService.run(chunks, MATERIALS, CUTTING_SERVICE, max_workers=1, write_items=written.extend)
+
+    assert summary['projects'] == 4
+    assert summary['without_previous_total'] == 2
+    assert summary['changed'] == 1 and summary['increased'] == 1
+    assert summary['total_old'] == pytest.approx(2 * new_total - 10.0)
+    assert summary['delta'] == pytest.approx(10.0)
+    assert [row['project_id'] for row in summary['top_changes']] == ['sube']
+    assert {row['project_id'] for row in written} == {'sin_total', 'a_cero', 'sube'}
+
+
+def test_reprice_uses_the_project_nesting_mode():
+    data = project('p1', use_nesting=True)
+    expected = VectorCalculationService.calculate_all_project_costs(
+        data, MATERIALS, CUTTING_SERVICE, include_surfaces=False, use_nesting=True, nesting_workers=1
+    )['total_calculated']
+    data['total_calculated'] = expected
+
+    row = RepricingService.reprice_project(RepricingService._calculation_payload(data), MATERIALS, CUTTING_SERVICE)
+
+    assert row['new_total'] == pytest.approx(expected)
+    assert row['delta'] == pytest.approx(0.0)
+
+
+class ReportingFirebase:
+    """Lo mínimo de FirebaseService que usa `run_for_firebase`."""
+
+    def __init__(self, projects):
+        self.projects = projects
+        self.reports = {}
+        self.items = []
+
+    def get_material_catalog(self):
+        return MATERIALS
+
+    def get_cutting_service(self):
+        return CUTTING_SERVICE
+
+    def iter_project_chunks(self, status, chunk_size):
+        yield self.projects
+
+    def create_repricing_report(self, data):
+        self.reports['r1'] = dict(data)
+        return 'r1'
+
+    def add_repricing_report_items(self, report_id, rows):
+        self.items.extend((report_id, row['project_id']) for row in rows)
+
+    def update_repricing_report(self, report_id, data):
+        self.reports[report_id].update(data)
+
+
+@pytest.mark.parametrize('write_report', [True, False])
+def test_run_for_firebase_writes_items_only_with_a_report(write_report):
+    firebase = ReportingFirebase([project('sin_total'), project('sube', total_calculated=1.0)])
+
+    summary = RepricingService.run_for_firebase(firebase, max_workers=1, write_report=write_report)
+
+    if write_report:
+        assert summary['report_id'] == 'r1'
+        assert firebase.reports['r1']['status'] == 'done'
+        assert firebase.items == [('r1', 'sin_total'), ('r1', 'sube')]
+    else:
+        assert summary['report_id'] is None
+        assert firebase.reports == {} and firebase.items == []
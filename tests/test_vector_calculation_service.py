@@ -0,0 +1,154 @@
+"""
+Equivalencia del motor vectorizado con `CalculationService`.
+
+Proyectos aleatorios con semilla fija (reproducibles) que cubren módulos con y sin
+fondo/puertas/cajones, estantes, maderas, herrajes, materiales fuera del catálogo,
+cantidades en 0 y precios finales con descuento.
+"""
+
+import math
+import random
+
+import pytest
+
+from models.material_catalog import MaterialCatalog
+from services.calculation_service import CalculationService
+from services.vector_calculation_service import VectorCalculationService
+
+MATERIALS = [
+    {'id': 'mdf', 'type': 'MDF', 'color': 'Blanco', 'thickness_mm': 18, 'waste_factor': 0.1,
+     'board_price': 45.0, 'board_height_mm': 2440, 'board_width_mm': 1220},
+    {'id': 'mel', 'type': 'Melamina', 'color': 'Roble', 'thickness_mm': 18, 'waste_factor': 0.15,
+     'board_price': 60.0, 'board_height_mm': 2750, 'board_width_mm': 1830, 'grain': True,
+     'edge_banding': {'Puerta': [2, 2], 'Estante': [1, 0]}},
+    {'id': 'fondo', 'type': 'HDF', 'color': 'Blanco', 'thickness_mm': 3, 'waste_factor': 0.05,
+     'board_price': 15.0, 'board_height_mm': 2440, 'board_width_mm': 1220},
+    {'id': 'pino', 'type': 'Pino', 'color': 'Natural', 'thickness_mm': 20,
+     'board_price': 30.0, 'board_height_mm': 3000, 'board_width_mm': 300},
+]
+CUTTING_SERVICE = {'price_per_m2': 3.5, 'waste_factor': 0.1, 'price_per_m_canto': 0.8, 'kerf_mm': 4.0}
+KEYS = [MaterialCatalog.key_for(material) for material in MATERIALS]
+# Material que no está en el catálogo: ambos motores deben ignorarlo igual
+UNKNOWN_KEY = 'Aglomerado_Gris_16'
+
+
+def random_hardware(rng: random.Random):
+    return {'type': rng.choice(['Bisagra', 'Tirador', 'Pata']),
+            'quantity': rng.randint(0, 8), 'price_unit': round(rng.uniform(0.5, 12.0), 2)}
+
+
+def random_module(rng: random.Random, index: int):
+    module = {
+        'nombre': f'Módulo {index + 1}',
+        'alto_mm': rng.choice([0, 300, 720, 900, 2000, rng.randint(100, 2400)]),
+        'ancho_mm': rng.choice([300, 400, 600, 800, rng.randint(100, 1200)]),
+        'profundo_mm': rng.choice([300, 350, 560, rng.randint(100, 700)]),
+        'material': rng.choice(KEYS + [UNKNOWN_KEY]),
+        'material_fondo': rng.choice(KEYS),
+        'material_puerta': rng.choice(KEYS),
+        'tiene_fondo': rng.random() < 0.7,
+        'tiene_puertas': rng.random() < 0.6,
+        'cantidad_puertas': rng.randint(0, 3),
+        'cantidad_estantes': rng.randint(0, 4),
+        'cantidad_divisiones': rng.randint(0, 2),
+        'cantidad_modulos': rng.randint(1, 4),
+        'herrajes': [random_hardware(rng) for _ in range(rng.randint(0, 3))],
+    }
+    if rng.random() < 0.4:
+        module['cajones'] = {
+            'enabled': rng.random() < 0.8,
+            'tipo': rng.choice(['Magic', 'Completo']),
+            'cantidad_cajones': rng.randint(0, 4),
+            'ancho_mm': rng.randint(200, 800),
+            'alto_mm': rng.randint(80, 250),
+            'profundo_mm': rng.randint(250, 550),
+            'material': rng.choice(KEYS),
+            'corredera': {'quantity': rng.randint(1, 4), 'price_unit': round(rng.uniform(3, 20), 2)},
+        }
+    return module
+
+
+def random_project(rng: random.Random):
+    labor = round(rng.uniform(0, 800), 2)
+    return {
+        'name': 'Proyecto aleatorio',
+        'modules': [random_module(rng, index) for index in range(rng.randint(0, 8))],
+        'shelves': [
+            {'ancho_mm': rng.randint(200, 1200), 'profundo_mm': rng.randint(150, 500),
+             'cantidad': rng.randint(0, 6), 'material': rng.choice(KEYS + [UNKNOWN_KEY])}
+            for _ in range(rng.randint(0, 4))
+        ],
+        'woods': [
+            {'ancho_mm': rng.randint(500, 2900), 'profundo_mm': rng.randint(40, 290),
+             'cantidad': rng.randint(0, 6), 'material': rng.choice(KEYS)}
+            for _ in range(rng.randint(0, 4))
+        ],
+        'hardwares': [random_hardware(rng) for _ in range(rng.randint(0, 4))],
+        'labor_cost_project': labor,
+        'extra_complexity': round(rng.uniform(0, 200), 2),
+        # A veces por debajo del total calculado (descuento en el PDF)
+        'final_price': rng.choice([0.0, round(rng.uniform(0, 5000), 2)]),
+    }
+
+
+def assert_equivalent(expected, actual, path='resultado'):
+    if isinstance(expected, dict):
+        assert isinstance(actual, dict), path
+        assert set(actual) == set(expected), path
+        for key in expected:
+            assert_equivalent(expected[key], actual[key], f'{path}[{key!r}]')
+    elif isinstance(expected, (list, tuple)):
+        assert len(actual) == len(expected), path
+        for index, (item_expected, item_actual) in enumerate(zip(expected, actual)):
+            assert_equivalent(item_expected, item_actual, f'{path}[{index}]')
+    elif isinstance(expected, float) or isinstance(actual, float):
+        assert math.isclose(float(actual), float(expected), rel_tol=1e-9, abs_tol=1e-9), path
+    else:
+        assert actual == expected, path
+
+
+CATALOG = MaterialCatalog(MATERIALS)
+
+
+@pytest.mark.parametrize('seed', range(50))
+def test_vector_engine_matches_loop_engine(seed):
+    rng = random.Random(seed)
+    for _ in range(10):
+        project = random_project(rng)
+        expected = CalculationService.calculate_all_project_costs(project, CATALOG, CUTTING_SERVICE)
+        actual = VectorCalculationService.calculate_all_project_costs(project, CATALOG, CUTTING_SERVICE)
+        assert_equivalent(expected, actual)
+
+
+@pytest.mark.parametrize('seed', range(10))
+def test_vector_engine_matches_loop_engine_with_nesting(seed):
+    rng = random.Random(1000 + seed)
+    project = random_project(rng)
+    expected = CalculationService.calculate_all_project_costs(
+        project, CATALOG, CUTTING_SERVICE, use_nesting=True, nesting_workers=1
+    )
+    actual = VectorCalculationService.calculate_all_project_costs(
+        project, CATALOG, CUTTING_SERVICE, use_nesting=True, nesting_workers=1
+    )
+    assert_equivalent(expected, actual)
+
+
+def test_vector_engine_without_surfaces_matches_totals():
+    rng = random.Random(99)
+    for _ in range(20):
+        project = random_project(rng)
+        expected = CalculationService.calculate_all_project_costs(project, CATALOG, CUTTING_SERVICE)
+        actual = VectorCalculationService.calculate_all_project_costs(
+            project, CATALOG, CUTTING_SERVICE, include_surfaces=False
+        )
+        expected.pop('all_surfaces')
+        actual.pop('all_surfaces', None)
+        assert_equivalent(expected, actual)
+
+
+def test_empty_project():
+    project = {'modules': [], 'shelves': [], 'woods': [], 'hardwares': []}
+    assert_equivalent(
+        CalculationService.calculate_all_project_costs(project, CATALOG, CUTTING_SERVICE),
+        VectorCalculationService.calculate_all_project_costs(project, CATALOG, CUTTING_SERVICE),
+    )